@@ -1,23 +1,67 @@
 from flask import Flask
+from flask_migrate import Migrate
 from app.config import Config
 from modelos.models import db
+from servicios.serializacion import ProveedorJSON
 
 app = Flask(__name__)
 app.config.from_object(Config)
+# orjson si está instalado (ver servicios/serializacion.py)
+app.json = ProveedorJSON(app)
 app.json.sort_keys = False
 
 db.init_app(app)
 
+# Esperas y checkouts del pool de la base principal para /metricas/pool
+from servicios.pool import instrumentar_pool
+
+with app.app_context():
+    instrumentar_pool(db.engine)
+
+# Esquema versionado con Alembic (flask db upgrade); ver migrations/
+migrate = Migrate(app, db)
+
+# Cantidad de consultas y tiempo en la base por petición, con detección de N+1
+from servicios.instrumentacion_sql import instrumentar_sql
+
+instrumentar_sql(app)
+
+# Compresión gzip/brotli negociada con Accept-Encoding
+from servicios.compresion import comprimir_respuestas
+
+comprimir_respuestas(app)
+
+# Lecturas de GET/HEAD en la réplica, si hay una configurada (DATABASE_REPLICA_URL)
+from servicios.replicas import rutear_lecturas
+
+rutear_lecturas(app)
+
+# Respuestas guardadas para los reintentos con Idempotency-Key
+from servicios.idempotencia import habilitar_idempotencia
+
+habilitar_idempotencia(app)
+
 # Importar y registrar blueprints
 from rutas.routes_usuarios import usuarios_bp
 from rutas.routes_ejercicios import ejercicios_bp
 from rutas.routes_entrenamientos_realizados import entrenamientos_realizados_bp
 from rutas.routes_rutinas_completas import rutinas_completas_bp
+from rutas.routes_metricas import metricas_bp
+from rutas.routes_sync import sync_bp
 
 app.register_blueprint(usuarios_bp)
 app.register_blueprint(ejercicios_bp)
 app.register_blueprint(entrenamientos_realizados_bp)
 app.register_blueprint(rutinas_completas_bp)
+app.register_blueprint(metricas_bp)
+app.register_blueprint(sync_bp)
+
+# Comandos de mantenimiento (flask estadisticas reconstruir, flask sync purgar)
+from servicios.estadisticas import estadisticas_cli
+from servicios.sincronizacion import sincronizacion_cli
+
+app.cli.add_command(estadisticas_cli)
+app.cli.add_command(sincronizacion_cli)
 
 if __name__ == '__main__':
 
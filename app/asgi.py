@@ -0,0 +1,404 @@
+"""
+Punto de entrada ASGI:
+
+    uvicorn app.asgi:app --workers 4
+
+Las lecturas pesadas (/rutinas/completas, /entrenamientos_realizados y
+/rutinas/estadisticas) se atienden con handlers async sobre el engine asyncpg
+(servicios/lectura_async.py), de modo que un proceso puede tener muchas peticiones de
+clientes lentos en vuelo sin ocupar un hilo por cada una. Devuelven los mismos
+documentos, headers y errores que las rutas sync, y leen de la réplica con la misma
+decisión que ellas (retraso y escrituras propias del usuario; ver servicios/replicas.py).
+Todo lo demás se delega a la app Flask, que corre en el pool de hilos del event loop. La
+compresión negociada con Accept-Encoding sigue la misma configuración que la de Flask
+(servicios/compresion.py).
+
+La contabilidad de SQL por petición (servicios/instrumentacion_sql.py) solo cubre lo que
+pasa por Flask: los handlers async no devuelven X-DB-Queries / X-DB-Time-ms ni se
+verifican contra un presupuesto de `@max_consultas`. Ejecutan las mismas sentencias que
+las rutas sync equivalentes, cuyas consultas sí se cuentan (por ejemplo en
+benchmarks/suite.py con el test client).
+"""
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.exceptions import ClientDisconnected
+from werkzeug.http import parse_accept_header, parse_cookie
+
+# El tamaño de los pools depende del modelo de workers (ver servicios/pool.py) y los
+# engines se crean al importar la app
+os.environ.setdefault('WEB_SERVIDOR', 'asgi')
+
+from app.app import app as flask_app
+from modelos.models import db
+from security import Principal, _cache_principales, is_token_invalidated, verify_token
+from servicios import lectura_async
+from servicios.compresion import Compresor, comprimir, elegir_codificacion, es_comprimible, nivel_compresion
+from servicios.estadisticas import combinar_estadisticas
+from servicios.paginacion import decodificar_cursor, leer_fecha, leer_limite
+from servicios.pool import hilos_puente_asgi
+from servicios.replicas import BIND_REPLICA, COOKIE_ESCRITURA, usa_replica
+from servicios.rutinas_json import leer_ids
+from servicios.streaming import MIMETYPE_NDJSON
+
+
+class Peticion:
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.headers = {}
+        for clave, valor in scope['headers']:
+            clave = clave.decode('latin-1')
+            valor = valor.decode('latin-1')
+            self.headers[clave] = f'{self.headers[clave]},{valor}' if clave in self.headers else valor
+        self.args = dict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+
+    def quiere_ndjson(self):
+        aceptados = parse_accept_header(self.headers.get('accept'), MIMEAccept)
+        return aceptados.best_match(['application/json', MIMETYPE_NDJSON]) == MIMETYPE_NDJSON
+
+
+class Respuesta:
+    """`cuerpo` puede ser bytes/str o un generador async de str (streaming)."""
+
+    def __init__(self, cuerpo, status=200, mimetype='application/json'):
+        self.cuerpo = cuerpo
+        self.status = status
+        self.mimetype = mimetype
+        self.headers = [(b'content-type', mimetype.encode())]
+
+    async def enviar(self, send, codificacion=None):
+        """Envía la respuesta, comprimida con `codificacion` ('br'/'gzip') si corresponde."""
+        config = flask_app.config
+        if es_comprimible(self.mimetype, config):
+            self.headers.append((b'vary', b'Accept-Encoding'))
+        else:
+            codificacion = None
+        nivel = nivel_compresion(codificacion, config)
+
+        if isinstance(self.cuerpo, (str, bytes)):
+            cuerpo = self.cuerpo.encode() if isinstance(self.cuerpo, str) else self.cuerpo
+            if codificacion and len(cuerpo) >= config.get('COMPRESION_UMBRAL', 1024):
+                cuerpo = comprimir(cuerpo, codificacion, nivel)
+                self.headers.append((b'content-encoding', codificacion.encode()))
+            self.headers.append((b'content-length', str(len(cuerpo)).encode()))
+            await send({'type': 'http.response.start', 'status': self.status, 'headers': self.headers})
+            await send({'type': 'http.response.body', 'body': cuerpo})
+            return
+
+        compresor = Compresor(codificacion, nivel) if codificacion else None
+        if compresor:
+            self.headers.append((b'content-encoding', codificacion.encode()))
+        bloque = config.get('COMPRESION_BLOQUE_STREAMING', 8192)
+        pendiente = 0
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': self.headers})
+        async for trozo in self.cuerpo:
+            datos = trozo.encode()
+            if compresor:
+                pendiente += len(datos)
+                datos = compresor.comprimir(datos)
+                if pendiente >= bloque:
+                    datos += compresor.vaciar()
+                    pendiente = 0
+            if datos:
+                await send({'type': 'http.response.body', 'body': datos, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': compresor.terminar() if compresor else b''})
+
+
+def _json(datos, status=200):
+    return Respuesta(flask_app.json.dumps_bytes(datos), status)
+
+
+def _ndjson(conexion, documentos, serializar=True):
+    """
+    Respuesta en streaming con un documento por línea. La conexión se mantiene abierta
+    mientras se envía y se cierra al terminar (o si el cliente corta).
+    """
+    async def generar():
+        try:
+            async for documento in documentos:
+                yield (flask_app.json.dumps(documento) if serializar else documento) + '\n'
+        finally:
+            await conexion.close()
+    return Respuesta(generar(), mimetype=MIMETYPE_NDJSON)
+
+
+# --- Autenticación ---
+
+async def _leer_de_replica(peticion, principal):
+    """Equivalente de `replicas.leer_de_replica` para los handlers async."""
+    cookie = parse_cookie(peticion.headers.get('cookie', '')).get(COOKIE_ESCRITURA)
+
+    def decidir():
+        with flask_app.app_context():
+            return usa_replica(db.engines, principal.id_usuario if principal else None, cookie)
+
+    # El retraso se mide con el engine sync de la réplica y la última escritura del usuario
+    # puede estar en la base principal (psycopg2): se decide fuera del event loop
+    return await asyncio.to_thread(decidir)
+
+
+def requiere_token(handler):
+    """
+    Equivalente async de `security.required_token`; comparte la cache de principales. El
+    handler recibe el engine de sus lecturas, elegido una vez por petición.
+    """
+    async def decorado(peticion):
+        auth_header = peticion.headers.get('authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return _json({'error': 'Token requerido'}, 401)
+        token = auth_header.split(' ')[1]
+        def consultar_revocacion():
+            with flask_app.app_context():
+                return is_token_invalidated(token)
+
+        # El filtro de Bloom responde en memoria, pero sus positivos y la sincronización
+        # periódica consultan el almacén (SQLite o psycopg2): se hace fuera del event loop
+        if await asyncio.to_thread(consultar_revocacion):
+            return _json({'error': 'Token invalidado'}, 401)
+
+        entrada = _cache_principales.obtener(token)
+        if entrada:
+            payload, principal = entrada
+        else:
+            payload = verify_token(token)
+            if not payload:
+                return _json({'error': 'Token inválido o expirado'}, 401)
+            async with lectura_async.obtener_engine().connect() as conexion:
+                usuario = await lectura_async.buscar_usuario(conexion, payload.get('id_usuario'))
+            principal = Principal(*usuario) if usuario else None
+            if principal:
+                _cache_principales.guardar(token, payload, principal)
+
+        hay_replica = BIND_REPLICA in flask_app.config.get('SQLALCHEMY_BINDS', {})
+        replica = hay_replica and await _leer_de_replica(peticion, principal)
+        respuesta = await handler(peticion, payload, principal, lectura_async.obtener_engine(replica))
+        if hay_replica and flask_app.config.get('SQL_HEADERS', True):
+            respuesta.headers.append((b'x-db-lectura', b'replica' if replica else b'principal'))
+        return respuesta
+    return decorado
+
+
+# --- Handlers ---
+
+@requiere_token
+async def obtener_todas_rutinas_completas(peticion, token_payload, principal, engine):
+    user_id = token_payload.get('id_usuario')
+    if 'ids' in peticion.args:
+        try:
+            ids = leer_ids(peticion.args['ids'])
+        except ValueError as e:
+            return _json({'error': 'Parámetros inválidos', 'detalle': str(e)}, 400)
+        async with engine.connect() as conexion:
+            respuesta = Respuesta(await lectura_async.documento_rutinas_por_ids(conexion, ids, user_id))
+        respuesta.headers.append((b'cache-control', b'private, no-cache'))
+        return respuesta
+
+    if peticion.quiere_ndjson():
+        conexion = await engine.connect()
+        documentos = lectura_async.iterar_documentos_rutinas(conexion, user_id)
+        return _ndjson(conexion, documentos, serializar=False)
+
+    async with engine.connect() as conexion:
+        return Respuesta(await lectura_async.documento_rutinas_usuario(conexion, user_id))
+
+
+@requiere_token
+async def obtener_entrenamientos_realizados(peticion, token_payload, principal, engine):
+    user_id_from_token = token_payload.get('id_usuario')
+    try:
+        desde = leer_fecha(peticion.args.get('desde'))
+        hasta = leer_fecha(peticion.args.get('hasta'))
+    except ValueError:
+        return _json({'error': 'Parámetros inválidos', 'detalle': 'Las fechas "desde" y "hasta" deben tener formato YYYY-MM-DD.'}, 400)
+
+    paginado = 'limit' in peticion.args or 'cursor' in peticion.args
+    try:
+        limite = leer_limite(peticion.args.get('limit'))
+        cursor = decodificar_cursor(peticion.args['cursor']) if peticion.args.get('cursor') else None
+    except ValueError as e:
+        return _json({'error': 'Parámetros inválidos', 'detalle': str(e)}, 400)
+
+    if peticion.quiere_ndjson():
+        conexion = await engine.connect()
+        return _ndjson(conexion, lectura_async.iterar_realizados(conexion, user_id_from_token, desde, hasta, cursor))
+
+    async with engine.connect() as conexion:
+        if not paginado:
+            realizados = lectura_async.iterar_realizados(conexion, user_id_from_token, desde, hasta)
+            return _json([realizado async for realizado in realizados])
+
+        realizados, next_cursor = await lectura_async.pagina_realizados(
+            conexion, user_id_from_token, limite, desde, hasta, cursor
+        )
+    return _json({'entrenamientos_realizados': realizados, 'next_cursor': next_cursor})
+
+
+@requiere_token
+async def estadisticas_rutinas(peticion, token_payload, principal, engine):
+    try:
+        if not principal:
+            return _json({'error': 'Usuario no encontrado', 'detalle': 'El usuario asociado al token no existe.'}, 404)
+
+        async with engine.connect() as conexion:
+            rutinas_usuario, stats_ejercicios = await lectura_async.estadisticas_usuario(
+                conexion, token_payload.get('id_usuario')
+            )
+        if not rutinas_usuario:
+            return _json({'mensaje': 'No se encontraron rutinas para este usuario.'})
+
+        resultado_final = combinar_estadisticas(rutinas_usuario, stats_ejercicios)
+        if not any(r['max_peso_levantado'] > 0 for r in resultado_final):
+            return _json({
+                'mensaje': 'No hay estadísticas de peso disponibles.',
+                'detalle': 'Aún no se han registrado entrenamientos con peso para estas rutinas.',
+                'estadisticas': resultado_final
+            })
+        return _json(resultado_final)
+
+    except Exception as e:
+        return _json({"error": "Ocurrió un error al calcular las estadísticas", "detalle": str(e)}, 500)
+
+
+RUTAS_ASYNC = {
+    '/rutinas/completas': obtener_todas_rutinas_completas,
+    '/entrenamientos_realizados': obtener_entrenamientos_realizados,
+    '/rutinas/estadisticas': estadisticas_rutinas,
+}
+
+
+# --- Puente hacia la app Flask ---
+
+class _EntradaASGI(io.RawIOBase):
+    """
+    `wsgi.input` que lee el cuerpo de la petición a medida que llega, pidiendo cada
+    mensaje al event loop desde el hilo de Flask. Un upload grande (por ejemplo la
+    importación de historial) se procesa en streaming, como bajo gunicorn, en lugar de
+    acumularse entero en memoria antes de llamar a la app.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._pendiente = memoryview(b'')
+        self._terminado = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while not self._pendiente and not self._terminado:
+            mensaje = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if mensaje['type'] == 'http.disconnect':
+                raise ClientDisconnected()
+            self._pendiente = memoryview(mensaje.get('body', b''))
+            self._terminado = not mensaje.get('more_body', False)
+        cantidad = min(len(destino), len(self._pendiente))
+        destino[:cantidad] = self._pendiente[:cantidad]
+        self._pendiente = self._pendiente[cantidad:]
+        return cantidad
+
+
+def _environ_wsgi(scope, entrada):
+    servidor = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': servidor[0],
+        'SERVER_PORT': str(servidor[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': entrada,
+        # El cuerpo termina donde termina el stream aunque no haya Content-Length (chunked)
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for clave, valor in Peticion(scope).headers.items():
+        clave = clave.upper().replace('-', '_')
+        if clave not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            clave = f'HTTP_{clave}'
+        environ[clave] = valor
+    return environ
+
+
+async def _delegar_wsgi(scope, receive, send):
+    loop = asyncio.get_running_loop()
+    entrada = io.BufferedReader(_EntradaASGI(receive, loop), buffer_size=64 * 1024)
+
+    def enviar(mensaje):
+        asyncio.run_coroutine_threadsafe(send(mensaje), loop).result()
+
+    def ejecutar():
+        inicio = {}
+
+        def start_response(status, headers, exc_info=None):
+            inicio['type'] = 'http.response.start'
+            inicio['status'] = int(status.split(' ', 1)[0])
+            inicio['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+        resultado = flask_app(_environ_wsgi(scope, entrada), start_response)
+        try:
+            # Las respuestas en streaming de Flask se reenvían trozo a trozo
+            iniciado = False
+            for trozo in resultado:
+                if not trozo:
+                    continue
+                if not iniciado:
+                    enviar(inicio)
+                    iniciado = True
+                enviar({'type': 'http.response.body', 'body': trozo, 'more_body': True})
+            if not iniciado:
+                enviar(inicio)
+            enviar({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(resultado, 'close'):
+                resultado.close()
+
+    await asyncio.to_thread(ejecutar)
+
+
+async def _ciclo_de_vida(receive, send):
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'lifespan.startup':
+            # Las peticiones delegadas a Flask corren en este executor: tantos hilos como
+            # conexiones tiene el pool sync
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=hilos_puente_asgi()))
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensaje['type'] == 'lifespan.shutdown':
+            await lectura_async.cerrar_engine()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _ciclo_de_vida(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    handler = RUTAS_ASYNC.get(scope['path']) if scope['method'] == 'GET' else None
+    if handler is None:
+        return await _delegar_wsgi(scope, receive, send)
+
+    peticion = Peticion(scope)
+    try:
+        respuesta = await handler(peticion)
+    except SQLAlchemyError as e:
+        respuesta = _json({'error': 'Error en la base de datos', 'detalle': str(e)}, 500)
+    except Exception as e:
+        respuesta = _json({'error': 'Error inesperado', 'detalle': str(e)}, 500)
+    await respuesta.enviar(send, elegir_codificacion(peticion.headers.get('accept-encoding')))
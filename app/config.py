@@ -2,53 +2,107 @@ import os
 import re
 import ssl
 import asyncio
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.sql import text
 from dotenv import load_dotenv
 
+from servicios.pool import backend_compartido_por_defecto, opciones_pool
+from servicios.sqlite_local import ruta_sqlite
+
 
 
 class Config:
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_pre_ping': True
-    }
     load_dotenv()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 
+    # Segundos que cada worker conserva el catálogo de ejercicios base en memoria
+    CATALOGO_CACHE_TTL = int(os.getenv('CATALOGO_CACHE_TTL', 300))
+
+    # Contabilidad de SQL por petición (ver servicios/instrumentacion_sql.py)
+    SQL_HEADERS = os.getenv('SQL_HEADERS', 'true').lower() == 'true'
+    SQL_UMBRAL_REPETICIONES = int(os.getenv('SQL_UMBRAL_REPETICIONES', 3))
+    SQL_VERIFICAR_MAX_CONSULTAS = os.getenv('SQL_VERIFICAR_MAX_CONSULTAS', 'false').lower() == 'true'
+
+    # Compresión de respuestas JSON/NDJSON (ver servicios/compresion.py)
+    COMPRESION_HABILITADA = os.getenv('COMPRESION_HABILITADA', 'true').lower() == 'true'
+    COMPRESION_UMBRAL = int(os.getenv('COMPRESION_UMBRAL', 1024))
+    COMPRESION_NIVEL_GZIP = int(os.getenv('COMPRESION_NIVEL_GZIP', 6))
+    COMPRESION_NIVEL_BROTLI = int(os.getenv('COMPRESION_NIVEL_BROTLI', 5))
+    COMPRESION_BLOQUE_STREAMING = int(os.getenv('COMPRESION_BLOQUE_STREAMING', 8192))
+
+    # Sincronización incremental (ver servicios/sincronizacion.py)
+    SYNC_MARGEN_SEGUNDOS = int(os.getenv('SYNC_MARGEN_SEGUNDOS', 60))
+    SYNC_RETENCION_DIAS = int(os.getenv('SYNC_RETENCION_DIAS', 90))
+
+    # Importación masiva de historial (ver servicios/importacion.py)
+    IMPORTACION_LOTE = int(os.getenv('IMPORTACION_LOTE', 5000))
+    IMPORTACION_MAX_ERRORES = int(os.getenv('IMPORTACION_MAX_ERRORES', 1000))
+
     # 👇 Flask-SQLAlchemy necesita esta URI
     SQLALCHEMY_DATABASE_URI = re.sub(
         r'^postgresql:',
         'postgresql+psycopg2:',
         os.getenv("DATABASE_URL")
     )
+    # Tamaño del pool por worker desde DB_POOL_SIZE/DB_MAX_OVERFLOW/DB_POOL_RECYCLE/DB_POOL_TIMEOUT
+    # o derivado del modelo de workers (WSGI o ASGI), solo si la URL usa un QueuePool; ver
+    # servicios/pool.py
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True,
+        **opciones_pool(SQLALCHEMY_DATABASE_URI)
+    }
+
+    # Réplica de lectura opcional para GET/HEAD (ver servicios/replicas.py)
+    SQLALCHEMY_BINDS = {
+        'replica': re.sub(r'^postgresql:', 'postgresql+psycopg2:', os.getenv('DATABASE_REPLICA_URL'))
+    } if os.getenv('DATABASE_REPLICA_URL') else {}
+    REPLICA_RETRASO_MAXIMO_SEGUNDOS = float(os.getenv('REPLICA_RETRASO_MAXIMO_SEGUNDOS', 5))
+    REPLICA_VENTANA_ESCRITURA_SEGUNDOS = float(os.getenv('REPLICA_VENTANA_ESCRITURA_SEGUNDOS',
+                                                         REPLICA_RETRASO_MAXIMO_SEGUNDOS))
+    REPLICA_INTERVALO_VERIFICACION = float(os.getenv('REPLICA_INTERVALO_VERIFICACION', 5))
+
+    # Reintentos seguros con Idempotency-Key (ver servicios/idempotencia.py)
+    IDEMPOTENCIA_BACKEND = os.getenv('IDEMPOTENCIA_BACKEND', backend_compartido_por_defecto(SQLALCHEMY_DATABASE_URI))
+    IDEMPOTENCIA_SQLITE_PATH = ruta_sqlite('IDEMPOTENCIA_SQLITE_PATH', 'gymapp_idempotencia.sqlite3')
+    IDEMPOTENCIA_TTL = int(os.getenv('IDEMPOTENCIA_TTL', 86400))
+    IDEMPOTENCIA_ESPERA = float(os.getenv('IDEMPOTENCIA_ESPERA', 10.0))
+    IDEMPOTENCIA_TIMEOUT_RESERVA = int(os.getenv('IDEMPOTENCIA_TIMEOUT_RESERVA', 60))
+    IDEMPOTENCIA_INTERVALO_PURGA = int(os.getenv('IDEMPOTENCIA_INTERVALO_PURGA', 3600))
 
     @staticmethod
-    async def async_main() -> None:
-        db_url = os.getenv('DATABASE_URL')
+    def crear_engine_async(db_url=None, **opciones):
+        """
+        Crea el engine async (asyncpg) a partir de DATABASE_URL. Se conecta con SSL
+        verificado salvo que la URL indique `sslmode=disable`; el resto de los parámetros
+        de la URL (ej: `host=` para sockets locales) se conservan.
+        """
+        url = make_url(db_url or os.getenv('DATABASE_URL'))
+        if url.get_backend_name() == 'sqlite':
+            # Solo para desarrollo local; requiere el paquete aiosqlite
+            return create_async_engine(url.set(drivername='sqlite+aiosqlite'), **opciones)
 
-        # Reemplazar driver para async
-        db_url = re.sub(r'^postgresql:', 'postgresql+asyncpg:', db_url)
+        # Reemplazar driver para async y limpiar parámetros que asyncpg no entiende (ej: ?sslmode=require)
+        sslmode = url.query.get('sslmode')
+        url = url.set(drivername='postgresql+asyncpg').difference_update_query(['sslmode'])
 
-        # Limpiar parámetros extra (ej: ?sslmode=require)
-        clean_url = re.sub(r'\?(.*)', '', db_url)
+        if sslmode != 'disable':
+            # Crear contexto SSL
+            ssl_ctx = ssl.create_default_context()
+            ssl_ctx.check_hostname = True
+            ssl_ctx.verify_mode = ssl.CERT_REQUIRED
+            opciones.setdefault('connect_args', {'ssl': ssl_ctx})
 
-        # Crear contexto SSL
-        ssl_ctx = ssl.create_default_context()
-        ssl_ctx.check_hostname = True
-        ssl_ctx.verify_mode = ssl.CERT_REQUIRED
+        return create_async_engine(url, **opciones)
 
+    @staticmethod
+    async def async_main() -> None:
         # Engine async
-        engine = create_async_engine(
-            clean_url,
-            connect_args={"ssl": ssl_ctx},
-            echo=True
-        )
+        engine = Config.crear_engine_async(echo=True)
 
         async with engine.connect() as conn:
             result = await conn.execute(text("select 'hello world'"))
             print(result.fetchall())
 
         await engine.dispose()
-
-
@@ -0,0 +1,189 @@
+"""
+Generador de datos sintéticos para los benchmarks.
+
+Crea usuarios con sus rutinas (Rutina -> Ejercicio -> Serie) y años de historial de
+entrenamientos (Entrenamiento -> EntrenamientoRealizado -> SerieRealizada) con una
+progresión de cargas realista: cada ejercicio parte de un peso propio, sube de a poco
+con el tiempo y tiene ruido sesión a sesión, redondeado a discos de 2.5 kg.
+
+El contenido depende solo de la semilla; los nombres y emails llevan además una
+etiqueta de corrida para poder generar varias veces sobre la misma base. Las filas se
+insertan por lotes con Core y al final se reconstruye `estadisticas_ejercicios`.
+Debe ejecutarse dentro de un app context.
+"""
+import random
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+from sqlalchemy import insert, select
+
+from modelos.models import (db, Ejercicio, EjercicioBase, Entrenamiento, EntrenamientoRealizado, NivelRutina, Rutina,
+                            Serie, SerieRealizada, Usuario)
+from servicios.estadisticas import reconstruir_estadisticas
+from servicios.insercion import insertar_con_returning
+
+Escala = namedtuple('Escala', ['usuarios', 'rutinas_por_usuario', 'ejercicios_por_rutina', 'series_por_ejercicio',
+                               'anios', 'sesiones_por_semana'])
+
+ESCALAS = {
+    'chica': Escala(5, 3, 5, 3, 1, 3),
+    'mediana': Escala(20, 4, 6, 4, 2, 3),
+    'grande': Escala(100, 5, 8, 4, 3, 4),
+}
+
+CATALOGO = [
+    ('Press de banca', 'Empuje horizontal con barra'), ('Sentadilla', 'Sentadilla trasera con barra'),
+    ('Peso muerto', 'Peso muerto convencional'), ('Press militar', 'Press de hombros de pie'),
+    ('Dominadas', 'Tracción vertical con peso corporal'), ('Remo con barra', 'Tracción horizontal'),
+    ('Zancadas', 'Zancadas con mancuernas'), ('Hip thrust', 'Empuje de cadera con barra'),
+    ('Curl de bíceps', 'Curl con barra recta'), ('Extensión de tríceps', 'Extensión en polea alta'),
+    ('Prensa de piernas', 'Prensa inclinada a 45 grados'), ('Jalón al pecho', 'Tracción vertical en polea'),
+    ('Press inclinado', 'Press inclinado con mancuernas'), ('Elevaciones laterales', 'Elevaciones con mancuernas'),
+    ('Curl femoral', 'Curl femoral acostado'), ('Extensión de cuádriceps', 'Extensión en máquina'),
+    ('Fondos', 'Fondos en paralelas'), ('Remo con mancuerna', 'Remo a una mano'),
+    ('Gemelos de pie', 'Elevación de talones'), ('Face pull', 'Tracción a la cara en polea'),
+]
+
+NIVELES = ['Principiante', 'Intermedio', 'Avanzado']
+
+DatosSinteticos = namedtuple('DatosSinteticos', [
+    'usuarios',             # ids de usuarios, el primero es el de historial más largo
+    'rutinas',              # usuario_id -> [ids de rutinas]
+    'ejercicios',           # rutina_id -> [ids de ejercicios]
+    'realizados',           # usuario_id -> [ids de entrenamientos realizados]
+    'ejercicios_base',      # ids del catálogo
+    'nivel_id',
+    'etiqueta',
+])
+
+LOTE = 5000
+
+
+def _por_lotes(filas, tamanio=LOTE):
+    for inicio in range(0, len(filas), tamanio):
+        yield filas[inicio:inicio + tamanio]
+
+
+def _insertar_ids(modelo, columna_id, filas):
+    ids = []
+    for lote in _por_lotes(filas):
+        ids.extend(insertar_con_returning(modelo, columna_id, lote))
+    return ids
+
+
+def _catalogo():
+    existentes = dict(db.session.execute(select(EjercicioBase.nombre, EjercicioBase.id_ejercicios_base)).all())
+    faltantes = [{'nombre': nombre, 'descripcion': descripcion} for nombre, descripcion in CATALOGO
+                 if nombre not in existentes]
+    if faltantes:
+        db.session.execute(insert(EjercicioBase), faltantes)
+    return db.session.scalars(
+        select(EjercicioBase.id_ejercicios_base).where(EjercicioBase.nombre.in_([n for n, _ in CATALOGO]))
+        .order_by(EjercicioBase.id_ejercicios_base)
+    ).all()
+
+
+def _nivel():
+    existentes = set(db.session.scalars(select(NivelRutina.nivel)).all())
+    faltantes = [{'nivel': nivel} for nivel in NIVELES if nivel not in existentes]
+    if faltantes:
+        db.session.execute(insert(NivelRutina), faltantes)
+    return db.session.scalar(select(NivelRutina.id_nivel_rutinas).where(NivelRutina.nivel == NIVELES[0]))
+
+
+def _redondear(peso):
+    return max(2.5, round(peso / 2.5) * 2.5)
+
+
+def generar_datos(escala=ESCALAS['chica'], semilla=42, hoy=None):
+    """Genera el conjunto de datos completo y devuelve los ids en un `DatosSinteticos`."""
+    azar = random.Random(semilla)
+    hoy = hoy or date.today()
+    etiqueta = f'{semilla}-{time.time_ns():x}'
+    ids_base = _catalogo()
+    nivel_id = _nivel()
+
+    usuarios = _insertar_ids(Usuario, Usuario.id_usuarios, [{
+        'nombre': f'Usuario {i}',
+        'email': f'bench-{etiqueta}-{i}@gym.local',
+        'auth_provider': 'local',
+    } for i in range(escala.usuarios)])
+
+    # --- Rutinas, ejercicios y series planificadas ---
+    filas_rutinas = [{
+        'nombre': f'Rutina {etiqueta} {u}-{r}',
+        'descripcion': f'Rutina {r + 1} del usuario {u}',
+        'usuarios_id': usuario_id,
+        'nivel_rutinas_id': nivel_id,
+    } for u, usuario_id in enumerate(usuarios) for r in range(escala.rutinas_por_usuario)]
+    ids_rutinas = _insertar_ids(Rutina, Rutina.id_rutinas, filas_rutinas)
+
+    filas_ejercicios = []
+    for rutina_id in ids_rutinas:
+        for base_id in azar.sample(ids_base, min(escala.ejercicios_por_rutina, len(ids_base))):
+            filas_ejercicios.append({'rutinas_id': rutina_id, 'ejercicios_base_id': base_id})
+    ids_ejercicios = _insertar_ids(Ejercicio, Ejercicio.id_ejercicios, filas_ejercicios)
+
+    rutinas = {usuario_id: [] for usuario_id in usuarios}
+    for fila, rutina_id in zip(filas_rutinas, ids_rutinas):
+        rutinas[fila['usuarios_id']].append(rutina_id)
+    ejercicios = {rutina_id: [] for rutina_id in ids_rutinas}
+    peso_inicial = {}
+    filas_series = []
+    for fila, ejercicio_id in zip(filas_ejercicios, ids_ejercicios):
+        ejercicios[fila['rutinas_id']].append(ejercicio_id)
+        peso_inicial[ejercicio_id] = azar.uniform(10, 80)
+        for _ in range(escala.series_por_ejercicio):
+            filas_series.append({'ejercicios_id': ejercicio_id, 'repeticiones': azar.choice([6, 8, 10, 12]),
+                                 'peso_kg': _redondear(peso_inicial[ejercicio_id])})
+    for lote in _por_lotes(filas_series):
+        db.session.execute(insert(Serie), lote)
+
+    # --- Historial de entrenamientos ---
+    sesiones = escala.anios * 52 * escala.sesiones_por_semana
+    filas_entrenamientos = []
+    for u, usuario_id in enumerate(usuarios):
+        # El primer usuario tiene el historial completo; el resto, historiales más cortos
+        sesiones_usuario = sesiones if u == 0 else azar.randint(sesiones // 4, sesiones)
+        for s in range(sesiones_usuario):
+            dias_atras = int((sesiones_usuario - s) * 7 / escala.sesiones_por_semana)
+            filas_entrenamientos.append({
+                'fecha': hoy - timedelta(days=dias_atras),
+                'usuarios_id': usuario_id,
+                'rutinas_id': rutinas[usuario_id][s % len(rutinas[usuario_id])],
+            })
+    ids_entrenamientos = _insertar_ids(Entrenamiento, Entrenamiento.id_entrenamientos, filas_entrenamientos)
+
+    filas_realizados = []
+    avance_por_realizado = []
+    for fila, entrenamiento_id in zip(filas_entrenamientos, ids_entrenamientos):
+        # Avance de 0 a 1 a lo largo del historial completo
+        avance = 1 - (hoy - fila['fecha']).days / (escala.anios * 365)
+        for ejercicio_id in ejercicios[fila['rutinas_id']]:
+            filas_realizados.append({'entrenamientos_id': entrenamiento_id, 'ejercicios_id': ejercicio_id})
+            avance_por_realizado.append(avance)
+    ids_realizados = _insertar_ids(EntrenamientoRealizado, EntrenamientoRealizado.id_entrenamientos_realizados,
+                                   filas_realizados)
+
+    realizados = {usuario_id: [] for usuario_id in usuarios}
+    filas_series_realizadas = []
+    for fila, realizado_id, avance in zip(filas_realizados, ids_realizados, avance_por_realizado):
+        base = peso_inicial[fila['ejercicios_id']] * (1 + 0.5 * avance)
+        for _ in range(escala.series_por_ejercicio):
+            filas_series_realizadas.append({
+                'entrenamientos_realizados_id': realizado_id,
+                'repeticiones': azar.randint(5, 12),
+                'peso_kg': _redondear(base * azar.uniform(0.9, 1.05)),
+            })
+    usuario_de_entrenamiento = dict(zip(ids_entrenamientos, (f['usuarios_id'] for f in filas_entrenamientos)))
+    for fila, realizado_id in zip(filas_realizados, ids_realizados):
+        realizados[usuario_de_entrenamiento[fila['entrenamientos_id']]].append(realizado_id)
+    for lote in _por_lotes(filas_series_realizadas):
+        db.session.execute(insert(SerieRealizada), lote)
+
+    for usuario_id in usuarios:
+        reconstruir_estadisticas(usuario_id)
+    db.session.commit()
+
+    return DatosSinteticos(usuarios, rutinas, ejercicios, realizados, ids_base, nivel_id, etiqueta)
@@ -0,0 +1,94 @@
+"""
+Servidor local que reemplaza al endpoint de certificados de Google en pruebas.
+
+Genera un par de claves RSA, publica la clave pública en el formato de
+https://www.googleapis.com/oauth2/v1/certs (`{kid: PEM}`) con `Cache-Control: max-age`
+y firma ID tokens con los claims que se le pidan. Para usarlo, exportar
+GOOGLE_CERTS_URL=<servidor.url> antes de importar la app:
+
+    servidor = ServidorCertificados().iniciar()
+    os.environ['GOOGLE_CERTS_URL'] = servidor.url
+    token = servidor.firmar({'aud': 'mi-client-id', 'email': 'a@b.com', 'sub': '123'})
+
+Ejecutado como script queda sirviendo hasta Ctrl+C:
+
+    python -m benchmarks.servidor_certificados --puerto 8085
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rsa
+from google.auth import crypt, jwt
+
+
+class ServidorCertificados:
+
+    def __init__(self, puerto=0, max_age=3600, kid='local-1'):
+        self.max_age = max_age
+        self.kid = kid
+        self.descargas = 0
+        publica, privada = rsa.newkeys(2048)
+        self._certificados = {kid: publica.save_pkcs1().decode()}
+        self._firmante = crypt.RSASigner.from_string(privada.save_pkcs1().decode(), key_id=kid)
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', puerto), self._manejador())
+
+    def _manejador(self):
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                servidor.descargas += 1
+                cuerpo = json.dumps(servidor._certificados).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Cache-Control', f'public, max-age={servidor.max_age}')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        return Manejador
+
+    @property
+    def url(self):
+        host, puerto = self._servidor.server_address[:2]
+        return f'http://{host}:{puerto}/oauth2/v1/certs'
+
+    def iniciar(self):
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+
+    def firmar(self, claims):
+        """Devuelve un ID token firmado; completa `iss`, `iat` y `exp` si no vienen."""
+        ahora = int(time.time())
+        payload = {'iss': 'https://accounts.google.com', 'iat': ahora, 'exp': ahora + 3600, **claims}
+        return jwt.encode(self._firmante, payload).decode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor local de certificados de Google para pruebas')
+    parser.add_argument('--puerto', type=int, default=8085)
+    parser.add_argument('--max-age', type=int, default=3600)
+    parser.add_argument('--aud', help='Si se indica, imprime un ID token de ejemplo para ese client id')
+    args = parser.parse_args()
+
+    servidor = ServidorCertificados(args.puerto, args.max_age)
+    print(f'GOOGLE_CERTS_URL={servidor.url}')
+    if args.aud:
+        print(servidor.firmar({'aud': args.aud, 'email': 'prueba@ejemplo.com', 'name': 'Prueba', 'sub': '1'}))
+    try:
+        servidor._servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.detener()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,397 @@
+"""
+Suite de carga y latencia de todos los endpoints.
+
+Genera datos sintéticos (benchmarks/datos.py), recorre cada ruta de los blueprints con
+el test client de Flask o contra un servidor local (gunicorn/uvicorn) y reporta, por
+escenario, p50/p95/p99, throughput y consultas SQL por petición (header X-DB-Queries).
+Los resultados pueden guardarse como línea de base y compararse en corridas siguientes.
+
+Uso:
+    python -m benchmarks.suite --escala chica --repeticiones 30
+    python -m benchmarks.suite --guardar-base benchmarks/linea_base.json
+    python -m benchmarks.suite --comparar benchmarks/linea_base.json --tolerancia 0.25
+
+    # Contra un servidor local que use la misma DATABASE_URL y JWT_SECRET_KEY:
+    gunicorn -w 4 'app.app:app' &
+    python -m benchmarks.suite --url http://127.0.0.1:8000 --concurrencia 8
+
+Si no se define DATABASE_URL se usa una base SQLite temporal. Las tablas se crean con
+`db.create_all()` y se insertan datos, por lo que nunca debe apuntarse a producción.
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+if not os.getenv('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-de-al-menos-32-bytes')
+os.environ.setdefault('GOOGLE_CLIENT_ID', 'benchmark-client-id')
+# Los datos recién generados caerían dentro del margen y el sync incremental los reenviaría todos
+os.environ.setdefault('SYNC_MARGEN_SEGUNDOS', '0')
+
+from benchmarks.servidor_certificados import ServidorCertificados
+
+# El verificador de Google lee GOOGLE_CERTS_URL al importarse: el servidor local debe
+# estar levantado antes de importar la app
+_certificados = None
+if 'GOOGLE_CERTS_URL' not in os.environ:
+    _certificados = ServidorCertificados().iniciar()
+    os.environ['GOOGLE_CERTS_URL'] = _certificados.url
+
+from app.app import app
+from benchmarks.datos import ESCALAS, generar_datos
+from modelos.models import db
+from security import create_token
+
+Escenario = namedtuple('Escenario', ['nombre', 'metodo', 'ruta', 'cuerpo', 'estado', 'preparar', 'headers'])
+
+
+def escenario(nombre, metodo, ruta, cuerpo=None, estado=200, preparar=None, headers=None):
+    """`ruta`, `cuerpo` y `headers` pueden ser funciones (ctx, i, prep) evaluadas en cada iteración."""
+    return Escenario(nombre, metodo, ruta, cuerpo, estado, preparar, headers)
+
+
+def _separar_cuerpo(cuerpo):
+    """(datos, json): un cuerpo en bytes (ej: el CSV de la importación) se envía tal cual."""
+    return (cuerpo, None) if isinstance(cuerpo, bytes) else (None, cuerpo)
+
+
+class ClienteFlask:
+
+    def __init__(self):
+        self._cliente = app.test_client()
+
+    def pedir(self, metodo, ruta, json=None, headers=None):
+        datos, json = _separar_cuerpo(json)
+        respuesta = self._cliente.open(ruta, method=metodo, json=json, data=datos, headers=headers)
+        respuesta.get_data()
+        return respuesta.status_code, respuesta.headers, respuesta.get_json(silent=True)
+
+
+class ClienteHTTP:
+
+    def __init__(self, url):
+        import requests
+        self.url = url.rstrip('/')
+        self._local = threading.local()
+        self._requests = requests
+
+    def pedir(self, metodo, ruta, json=None, headers=None):
+        if not hasattr(self._local, 'sesion'):
+            self._local.sesion = self._requests.Session()
+        datos, json = _separar_cuerpo(json)
+        respuesta = self._local.sesion.request(metodo, self.url + ruta, json=json, data=datos, headers=headers)
+        es_json = respuesta.headers.get('Content-Type', '').startswith('application/json')
+        return respuesta.status_code, respuesta.headers, respuesta.json() if es_json else None
+
+
+class Contexto:
+    """Datos generados, tokens y helpers que usan los escenarios."""
+
+    def __init__(self, datos, cliente):
+        self.datos = datos
+        self.cliente = cliente
+        self.usuario = datos.usuarios[0]
+        self.rutinas = datos.rutinas[self.usuario]
+        self.rutina = self.rutinas[0]
+        self.ejercicio = datos.ejercicios[self.rutina][0]
+        self.realizado = datos.realizados[self.usuario][-1]
+        self.auth = self.headers_de(self.usuario)
+
+    def headers_de(self, usuario_id):
+        token = create_token(usuario_id, f'usuario-{usuario_id}@gym.local', 'local')
+        return {'Authorization': f'Bearer {token}'}
+
+    def cuerpo_rutina(self, i, ejercicios=5, series=3):
+        return {
+            'nombre': f'Bench {self.datos.etiqueta} {time.time_ns()} #{i}',
+            'nivel_rutinas_id': self.datos.nivel_id,
+            'ejercicios': [{
+                'ejercicios_base_id': self.datos.ejercicios_base[j % len(self.datos.ejercicios_base)],
+                'series': [{'repeticiones': 10, 'peso_kg': 20.0 + k} for k in range(series)]
+            } for j in range(ejercicios)]
+        }
+
+    def cuerpo_entrenamiento(self, i):
+        return {
+            'fecha': time.strftime('%Y-%m-%d'),
+            'rutinas_id': self.rutina,
+            'ejercicios': [{
+                'ejercicios_id': ejercicio_id,
+                'series': [{'repeticiones': 8, 'peso_kg': 40.0 + k} for k in range(3)]
+            } for ejercicio_id in self.datos.ejercicios[self.rutina]]
+        }
+
+
+def _crear_rutina(ctx, i):
+    estado, _, cuerpo = ctx.cliente.pedir('POST', '/rutinas/completas', json=ctx.cuerpo_rutina(i), headers=ctx.auth)
+    return {'rutina': cuerpo['rutina']['id']}
+
+
+def _etag_rutina(ctx, i):
+    _, headers, _ = ctx.cliente.pedir('GET', f'/rutinas/completas/{ctx.rutina}', headers=ctx.auth)
+    return {'etag': headers.get('ETag')}
+
+
+def _etag_catalogo(ctx, i):
+    _, headers, _ = ctx.cliente.pedir('GET', '/ejercicios-base', headers=ctx.auth)
+    return {'etag': headers.get('ETag')}
+
+
+def _cursor_sync(ctx, i):
+    _, _, cuerpo = ctx.cliente.pedir('GET', '/sync', headers=ctx.auth)
+    return {'cursor': cuerpo['cursor']}
+
+
+def _csv_importacion(ctx, i):
+    # Se importa en otro usuario para no cambiar lo que listan los escenarios de ctx.usuario
+    usuario = ctx.datos.usuarios[-1]
+    auth = ctx.headers_de(usuario)
+    rutina = ctx.datos.rutinas[usuario][0]
+    _, _, documento = ctx.cliente.pedir('GET', f'/rutinas/completas/{rutina}', headers=auth)
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow(['fecha', 'rutina', 'ejercicio', 'repeticiones', 'peso_kg', 'sesion'])
+    for dia in range(1, 31):
+        for ejercicio in documento['ejercicios']:
+            escritor.writerows([f'2000-01-{dia:02d}', rutina, ejercicio['nombre'], 8, 40.0 + k, i] for k in range(3))
+    return {'headers': {**auth, 'Content-Type': 'text/csv'}, 'cuerpo': buffer.getvalue().encode()}
+
+
+def _token_nuevo(ctx, i):
+    # Dos tokens con el mismo payload emitidos en el mismo segundo son idénticos
+    token = create_token(ctx.usuario, f'logout-{i}@gym.local', 'local')
+    return {'headers': {'Authorization': f'Bearer {token}'}}
+
+
+def _id_token_google(ctx, i):
+    return {'token': _certificados.firmar({
+        'aud': os.environ['GOOGLE_CLIENT_ID'], 'email': f'google-{ctx.datos.etiqueta}-{i}@gym.local',
+        'name': f'Google {i}', 'sub': f'{ctx.datos.etiqueta}-{i}'
+    })}
+
+
+NDJSON = {'Accept': 'application/x-ndjson'}
+
+ESCENARIOS = [
+    # --- usuarios ---
+    escenario('usuarios.obtener', 'GET', lambda c, i, p: f'/usuarios/{c.usuario}'),
+    escenario('usuarios.google_login', 'POST', '/usuarios/google-login',
+              cuerpo=lambda c, i, p: {'token': p['token']}, preparar=_id_token_google, headers={}),
+    escenario('usuarios.logout', 'POST', '/usuarios/logout', preparar=_token_nuevo,
+              headers=lambda c, i, p: p['headers']),
+    escenario('usuarios.exportar_csv', 'GET', lambda c, i, p: f'/usuarios/{c.usuario}/export'),
+    escenario('usuarios.exportar_ndjson', 'GET', lambda c, i, p: f'/usuarios/{c.usuario}/export?formato=ndjson'),
+    # --- ejercicios ---
+    escenario('ejercicios.crear', 'POST', '/ejercicios', cuerpo=lambda c, i, p: {'nombre': f'Ejercicio propio {i}'},
+              estado=201),
+    escenario('ejercicios.obtener', 'GET', lambda c, i, p: f'/ejercicios/{c.ejercicio}'),
+    escenario('ejercicios.progresion', 'GET', lambda c, i, p: f'/ejercicios/{c.ejercicio}/progresion'),
+    escenario('ejercicios.catalogo', 'GET', '/ejercicios-base'),
+    escenario('ejercicios.catalogo_304', 'GET', '/ejercicios-base', estado=304, preparar=_etag_catalogo,
+              headers=lambda c, i, p: {**c.auth, 'If-None-Match': p['etag']}),
+    # --- entrenamientos realizados ---
+    escenario('entrenamientos.crear', 'POST', '/entrenamientos_realizados',
+              cuerpo=lambda c, i, p: c.cuerpo_entrenamiento(i), estado=201),
+    escenario('entrenamientos.listar', 'GET', '/entrenamientos_realizados'),
+    escenario('entrenamientos.pagina', 'GET', '/entrenamientos_realizados?limit=20'),
+    escenario('entrenamientos.ndjson', 'GET', '/entrenamientos_realizados', headers=lambda c, i, p: {**c.auth, **NDJSON}),
+    escenario('entrenamientos.obtener', 'GET', lambda c, i, p: f'/entrenamientos_realizados/{c.realizado}'),
+    escenario('entrenamientos.importar', 'POST', '/entrenamientos_realizados/importar',
+              cuerpo=lambda c, i, p: p['cuerpo'], preparar=_csv_importacion, headers=lambda c, i, p: p['headers']),
+    # --- rutinas completas ---
+    escenario('rutinas.crear', 'POST', '/rutinas/completas', cuerpo=lambda c, i, p: c.cuerpo_rutina(i), estado=201),
+    escenario('rutinas.obtener', 'GET', lambda c, i, p: f'/rutinas/completas/{c.rutina}'),
+    escenario('rutinas.obtener_304', 'GET', lambda c, i, p: f'/rutinas/completas/{c.rutina}', estado=304,
+              preparar=_etag_rutina, headers=lambda c, i, p: {**c.auth, 'If-None-Match': p['etag']}),
+    escenario('rutinas.varias', 'GET', lambda c, i, p: f'/rutinas/completas?ids={",".join(map(str, c.rutinas))}'),
+    escenario('rutinas.listar', 'GET', '/rutinas/completas'),
+    escenario('rutinas.listar_ndjson', 'GET', '/rutinas/completas', headers=lambda c, i, p: {**c.auth, **NDJSON}),
+    escenario('rutinas.de_usuario', 'GET', lambda c, i, p: f'/rutinas/completas/usuario/{c.usuario}'),
+    escenario('rutinas.entrenamientos', 'GET', lambda c, i, p: f'/rutinas/{c.rutina}/entrenamientos-realizados'),
+    escenario('rutinas.estadisticas', 'GET', '/rutinas/estadisticas'),
+    escenario('rutinas.eliminar', 'DELETE', lambda c, i, p: f'/rutinas/completas/{p["rutina"]}',
+              preparar=_crear_rutina),
+    # --- sincronización ---
+    escenario('sync.completo', 'GET', '/sync'),
+    escenario('sync.incremental', 'GET', lambda c, i, p: f'/sync?since={p["cursor"]}', preparar=_cursor_sync),
+    # --- métricas ---
+    escenario('metricas.pool', 'GET', '/metricas/pool'),
+]
+
+
+def _valor(campo, ctx, i, prep):
+    return campo(ctx, i, prep) if callable(campo) else campo
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano sobre una lista ordenada."""
+    if not valores:
+        return 0.0
+    return valores[max(0, min(len(valores) - 1, int(round(p / 100 * len(valores) + 0.5)) - 1))]
+
+
+def medir(ctx, esc, repeticiones, concurrencia):
+    # La preparación (crear recursos, obtener ETags, tokens) queda fuera de la medición
+    preparados = [esc.preparar(ctx, i) if esc.preparar else {} for i in range(repeticiones)]
+    latencias = []
+    consultas = []
+    errores = []
+    endpoints = set()
+
+    def ejecutar(i):
+        prep = preparados[i]
+        headers = _valor(esc.headers, ctx, i, prep)
+        ruta = _valor(esc.ruta, ctx, i, prep)
+        cuerpo = _valor(esc.cuerpo, ctx, i, prep)
+        endpoints.add((esc.metodo, _endpoint(esc.metodo, ruta)))
+        inicio = time.perf_counter()
+        estado, resp_headers, cuerpo = ctx.cliente.pedir(
+            esc.metodo, ruta, json=cuerpo, headers=ctx.auth if headers is None else headers
+        )
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        if estado != esc.estado:
+            errores.append(f'{estado}: {cuerpo}')
+        if 'X-DB-Queries' in resp_headers:
+            consultas.append(int(resp_headers['X-DB-Queries']))
+
+    inicio = time.perf_counter()
+    if concurrencia > 1:
+        with ThreadPoolExecutor(concurrencia) as ejecutor:
+            list(ejecutor.map(ejecutar, range(repeticiones)))
+    else:
+        for i in range(repeticiones):
+            ejecutar(i)
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'n': repeticiones,
+        'p50_ms': round(percentil(latencias, 50), 3),
+        'p95_ms': round(percentil(latencias, 95), 3),
+        'p99_ms': round(percentil(latencias, 99), 3),
+        'rps': round(repeticiones / total, 1) if total else 0,
+        'consultas': round(sum(consultas) / len(consultas), 2) if consultas else None,
+        'errores': len(errores),
+        'primer_error': errores[0][:200] if errores else None,
+    }, endpoints
+
+
+def comparar(resultados, base, tolerancia, piso_ms):
+    """
+    Imprime la comparación contra la línea de base y devuelve los escenarios con
+    regresión: p95 más de `tolerancia` peor (y más de `piso_ms` en absoluto) o más consultas.
+    """
+    regresiones = []
+    print(f'\n{"escenario":<28} {"p95 base":>9} {"p95 hoy":>9} {"delta":>8} {"cons. base":>10} {"cons. hoy":>9}')
+    for nombre, actual in resultados.items():
+        anterior = base.get(nombre)
+        if not anterior:
+            print(f'{nombre:<28} {"-":>9} {actual["p95_ms"]:>9.2f} {"nuevo":>8}')
+            continue
+        delta = (actual['p95_ms'] - anterior['p95_ms']) / anterior['p95_ms'] if anterior['p95_ms'] else 0
+        mas_lento = delta > tolerancia and actual['p95_ms'] - anterior['p95_ms'] > piso_ms
+        mas_consultas = (actual['consultas'] or 0) > (anterior['consultas'] or 0)
+        marca = '  REGRESIÓN' if mas_lento or mas_consultas else ''
+        if marca:
+            regresiones.append(nombre)
+        print(f'{nombre:<28} {anterior["p95_ms"]:>9.2f} {actual["p95_ms"]:>9.2f} {delta:>+8.0%} '
+              f'{str(anterior["consultas"]):>10} {str(actual["consultas"]):>9}{marca}')
+    return regresiones
+
+
+def _endpoint(metodo, ruta):
+    try:
+        return app.url_map.bind('localhost').match(ruta.split('?')[0], method=metodo)[0]
+    except Exception:
+        return None
+
+
+def rutas_sin_escenario(cubiertos):
+    """Reglas (método, endpoint) de la app que ningún escenario ejercitó."""
+    return sorted(f'{metodo} {regla.rule}' for regla in app.url_map.iter_rules() if regla.endpoint != 'static'
+                  for metodo in regla.methods - {'HEAD', 'OPTIONS'} if (metodo, regla.endpoint) not in cubiertos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de todos los endpoints con datos sintéticos')
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default='chica')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    parser.add_argument('--concurrencia', type=int, default=1)
+    parser.add_argument('--url', help='Servidor local a medir en lugar del test client de Flask')
+    parser.add_argument('--solo', help='Prefijo de escenarios a ejecutar (ej: rutinas.)')
+    parser.add_argument('--guardar-base', metavar='ARCHIVO', help='Guardar los resultados como línea de base')
+    parser.add_argument('--comparar', metavar='ARCHIVO', help='Comparar contra una línea de base guardada')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='Empeoramiento de p95 tolerado (0.25 = 25%%)')
+    parser.add_argument('--piso-ms', type=float, default=1.0, help='Diferencia absoluta de p95 ignorada')
+    parser.add_argument('--avisos', action='store_true', help='Mostrar los warnings de la app (ej: N+1)')
+    args = parser.parse_args()
+
+    if not args.avisos:
+        app.logger.setLevel(logging.ERROR)
+
+    escenarios = [e for e in ESCENARIOS if not args.solo or e.nombre.startswith(args.solo)]
+    if args.url:
+        # Un servidor externo no conoce el servidor de certificados de esta corrida
+        escenarios = [e for e in escenarios if e.nombre != 'usuarios.google_login']
+
+    with app.app_context():
+        db.create_all()
+        inicio = time.perf_counter()
+        datos = generar_datos(ESCALAS[args.escala], args.semilla)
+        print(f'Base de datos: {db.engine.url.render_as_string(hide_password=True)}')
+        print(f'Datos "{args.escala}" generados en {time.perf_counter() - inicio:.1f}s '
+              f'({len(datos.usuarios)} usuarios, {sum(len(r) for r in datos.realizados.values())} ejercicios realizados)')
+
+        cliente = ClienteHTTP(args.url) if args.url else ClienteFlask()
+        ctx = Contexto(datos, cliente)
+
+        print(f'\n{"escenario":<28} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"req/s":>8} {"consultas":>9}')
+        resultados = {}
+        cubiertos = set()
+        for esc in escenarios:
+            r, endpoints = medir(ctx, esc, args.repeticiones, args.concurrencia)
+            cubiertos |= endpoints
+            resultados[esc.nombre] = r
+            error = f'  {r["errores"]} errores, ej: {r["primer_error"]}' if r['errores'] else ''
+            print(f'{esc.nombre:<28} {r["p50_ms"]:>8.2f} {r["p95_ms"]:>8.2f} {r["p99_ms"]:>8.2f} '
+                  f'{r["rps"]:>8.1f} {str(r["consultas"]):>9}{error}')
+
+        if not args.solo:
+            for regla in rutas_sin_escenario(cubiertos):
+                print(f'Aviso: ruta sin escenario: {regla}', file=sys.stderr)
+
+    codigo = 1 if any(r['errores'] for r in resultados.values()) else 0
+
+    if args.guardar_base:
+        with open(args.guardar_base, 'w') as archivo:
+            json.dump({'escala': args.escala, 'resultados': resultados}, archivo, indent=2, ensure_ascii=False)
+        print(f'\nLínea de base guardada en {args.guardar_base}')
+
+    if args.comparar:
+        with open(args.comparar) as archivo:
+            base = json.load(archivo)
+        if base.get('escala') != args.escala:
+            print(f'Aviso: la línea de base es de escala "{base.get("escala")}"', file=sys.stderr)
+        regresiones = comparar(resultados, base['resultados'], args.tolerancia, args.piso_ms)
+        if regresiones:
+            print(f'\nRegresiones: {", ".join(regresiones)}')
+            codigo = 1
+
+    if _certificados:
+        _certificados.detener()
+    return codigo
+
+
+if __name__ == '__main__':
+    sys.exit(main())
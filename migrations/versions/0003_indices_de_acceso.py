@@ -0,0 +1,51 @@
+"""indices de acceso
+
+Índices para los caminos de lectura calientes: el historial por usuario y por rutina
+ordenado por fecha y las claves foráneas de los joins (Postgres no las indexa solo).
+En Postgres se crean con CONCURRENTLY, fuera de la transacción de la migración, para
+no bloquear las escrituras sobre tablas grandes.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 20:26:39.085352
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+INDICES = [
+    ('ix_entrenamientos_usuarios_id_fecha', 'entrenamientos',
+     ['usuarios_id', sa.text('fecha DESC'), sa.text('id_entrenamientos DESC')]),
+    ('ix_entrenamientos_rutinas_id_fecha', 'entrenamientos', ['rutinas_id', sa.text('fecha DESC')]),
+    ('ix_entrenamientos_realizados_entrenamientos_id', 'entrenamientos_realizados', ['entrenamientos_id']),
+    ('ix_entrenamientos_realizados_ejercicios_id', 'entrenamientos_realizados', ['ejercicios_id']),
+    ('ix_series_realizadas_entrenamientos_realizados_id', 'series_realizadas', ['entrenamientos_realizados_id']),
+    ('ix_rutinas_usuarios_id_nombre', 'rutinas', ['usuarios_id', 'nombre']),
+    ('ix_rutinas_nivel_rutinas_id', 'rutinas', ['nivel_rutinas_id']),
+    ('ix_ejercicios_rutinas_id', 'ejercicios', ['rutinas_id']),
+    ('ix_ejercicios_ejercicios_base_id', 'ejercicios', ['ejercicios_base_id']),
+    ('ix_series_ejercicios_id', 'series', ['ejercicios_id']),
+    ('ix_estadisticas_ejercicios_rutinas_id', 'estadisticas_ejercicios', ['rutinas_id']),
+    ('ix_estadisticas_ejercicios_ejercicios_id', 'estadisticas_ejercicios', ['ejercicios_id']),
+    ('ix_ejercicios_usuario_usuarios_id', 'ejercicios_usuario', ['usuarios_id']),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for nombre, tabla, columnas in INDICES:
+            op.create_index(nombre, tabla, columnas, unique=False, if_not_exists=True,
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for nombre, tabla, _ in reversed(INDICES):
+            op.drop_index(nombre, table_name=tabla, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,81 @@
+"""sincronizacion incremental
+
+Agrega `actualizado_en` a rutinas, entrenamientos y ejercicios_usuario y la tabla
+`eliminaciones` (tombstones) para GET /sync. Las filas existentes quedan con la hora de
+la migración, de modo que el primer sync incremental de cada cliente las reenvía.
+
+En Postgres la columna se agrega con un default no volátil (sin reescribir la tabla) que
+luego se quita, y los índices se crean con CONCURRENTLY como en 0003. SQLite no admite
+ADD COLUMN con default CURRENT_TIMESTAMP: se agrega nula, se completa y se recrea.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 20:40:05.860304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+TABLAS = ['rutinas', 'entrenamientos', 'ejercicios_usuario']
+
+INDICES = [
+    ('ix_rutinas_usuarios_id_actualizado_en', 'rutinas', ['usuarios_id', 'actualizado_en']),
+    ('ix_entrenamientos_usuarios_id_actualizado_en', 'entrenamientos', ['usuarios_id', 'actualizado_en']),
+    ('ix_ejercicios_usuario_usuarios_id_actualizado_en', 'ejercicios_usuario', ['usuarios_id', 'actualizado_en']),
+]
+
+
+def upgrade():
+    op.create_table('eliminaciones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('usuarios_id', sa.Integer(), nullable=False),
+    sa.Column('tabla', sa.String(length=50), nullable=False),
+    sa.Column('id_registro', sa.Integer(), nullable=False),
+    sa.Column('eliminado_en', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['usuarios_id'], ['usuarios.id_usuarios'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('eliminaciones', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_eliminaciones_eliminado_en'), ['eliminado_en'], unique=False)
+        batch_op.create_index('ix_eliminaciones_usuarios_id_eliminado_en', ['usuarios_id', 'eliminado_en'], unique=False)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        for tabla in TABLAS:
+            op.add_column(tabla, sa.Column('actualizado_en', sa.DateTime(), nullable=False,
+                                           server_default=sa.text("timezone('utc', now())")))
+            op.alter_column(tabla, 'actualizado_en', server_default=None)
+    else:
+        for tabla in TABLAS:
+            with op.batch_alter_table(tabla, schema=None) as batch_op:
+                batch_op.add_column(sa.Column('actualizado_en', sa.DateTime(), nullable=True))
+            op.execute(f'UPDATE {tabla} SET actualizado_en = CURRENT_TIMESTAMP')
+            with op.batch_alter_table(tabla, schema=None) as batch_op:
+                batch_op.alter_column('actualizado_en', existing_type=sa.DateTime(), nullable=False)
+
+    with op.get_context().autocommit_block():
+        for nombre, tabla, columnas in INDICES:
+            op.create_index(nombre, tabla, columnas, unique=False, if_not_exists=True,
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for nombre, tabla, _ in reversed(INDICES):
+            op.drop_index(nombre, table_name=tabla, if_exists=True, postgresql_concurrently=True)
+
+    for tabla in reversed(TABLAS):
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.drop_column('actualizado_en')
+
+    with op.batch_alter_table('eliminaciones', schema=None) as batch_op:
+        batch_op.drop_index('ix_eliminaciones_usuarios_id_eliminado_en')
+        batch_op.drop_index(batch_op.f('ix_eliminaciones_eliminado_en'))
+
+    op.drop_table('eliminaciones')
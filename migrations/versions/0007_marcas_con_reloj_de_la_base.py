@@ -0,0 +1,49 @@
+"""marcas con reloj de la base
+
+`actualizado_en` y `eliminado_en` pasan a tomar su valor de la base (hora UTC sin zona)
+en lugar de la hora del host de la app, igual que el cursor de GET /sync. Solo cambia el
+default de las columnas: en Postgres es un cambio de catálogo, en SQLite se recrea cada
+tabla.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 23:58:12.417093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+COLUMNAS = [
+    ('rutinas', 'actualizado_en'),
+    ('entrenamientos', 'actualizado_en'),
+    ('ejercicios_usuario', 'actualizado_en'),
+    ('eliminaciones', 'eliminado_en'),
+]
+
+# Lo mismo que compila `ahora_utc` en modelos/models.py
+AHORA_UTC = {
+    'postgresql': "timezone('utc', now())",
+    'sqlite': "(strftime('%Y-%m-%d %H:%M:%f000', 'now'))",
+}
+
+
+def _cambiar_default(default):
+    for tabla, columna in COLUMNAS:
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.alter_column(columna, existing_type=sa.DateTime(), existing_nullable=False,
+                                  server_default=default)
+
+
+def upgrade():
+    _cambiar_default(sa.text(AHORA_UTC[op.get_bind().dialect.name]))
+
+
+def downgrade():
+    _cambiar_default(None)
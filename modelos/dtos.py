@@ -0,0 +1,121 @@
+"""
+Objetos de respuesta (DTOs) de las rutinas y los historiales de entrenamiento.
+
+Son dataclasses con `__slots__`: se construyen más rápido y ocupan menos memoria que
+los dicts equivalentes, y el proveedor JSON (servicios/serializacion.py) los serializa
+directamente. Los nombres y el orden de los campos son las claves del JSON, así que
+no deben renombrarse sin versionar la API.
+"""
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class SerieDTO:
+    id: int
+    repeticiones: int
+    peso_kg: float
+
+    @classmethod
+    def desde_serie(cls, serie):
+        return cls(serie.id_series, serie.repeticiones, serie.peso_kg)
+
+    @classmethod
+    def desde_serie_realizada(cls, serie):
+        return cls(serie.id_series_realizadas, serie.repeticiones, serie.peso_kg)
+
+
+# --- Rutinas completas ---
+
+@dataclass(slots=True)
+class EjercicioRutinaDTO:
+    id: int
+    ejercicios_base_id: int
+    nombre: str
+    descripcion: str
+    video_url: str
+    series: list
+
+    @classmethod
+    def desde_modelo(cls, ejercicio):
+        base = ejercicio.ejercicio_base
+        return cls(ejercicio.id_ejercicios, ejercicio.ejercicios_base_id, base.nombre, base.descripcion,
+                   base.video_url, [SerieDTO.desde_serie(s) for s in ejercicio.series])
+
+
+@dataclass(slots=True)
+class RutinaDTO:
+    id: int
+    nombre: str
+    descripcion: str
+    usuarios_id: int
+    nivel_rutinas_id: int
+    ejercicios: list
+
+    @classmethod
+    def desde_modelo(cls, rutina):
+        """Rutina con sus ejercicios y series; las relaciones deben venir ya cargadas."""
+        return cls(rutina.id_rutinas, rutina.nombre, rutina.descripcion, rutina.usuarios_id,
+                   rutina.nivel_rutinas_id, [EjercicioRutinaDTO.desde_modelo(e) for e in rutina.ejercicios])
+
+
+# --- Historial de ejercicios realizados (/entrenamientos_realizados) ---
+
+@dataclass(slots=True)
+class EjercicioResumenDTO:
+    id: int
+    nombre: str
+
+
+@dataclass(slots=True)
+class EjercicioRealizadoDTO:
+    id_entrenamientos_realizados: int
+    entrenamientos_id: int
+    fecha_entrenamiento: str
+    ejercicio: EjercicioResumenDTO
+    series_realizadas: list
+
+    @classmethod
+    def desde_modelo(cls, realizado, fecha):
+        ejercicio = realizado.ejercicio
+        return cls(realizado.id_entrenamientos_realizados, realizado.entrenamientos_id, fecha.isoformat(),
+                   EjercicioResumenDTO(ejercicio.id_ejercicios, ejercicio.ejercicio_base.nombre),
+                   [SerieDTO.desde_serie_realizada(s) for s in realizado.series_realizadas])
+
+
+# --- Entrenamientos de una rutina (/rutinas/<id>/entrenamientos-realizados) ---
+
+@dataclass(slots=True)
+class SerieSesionDTO:
+    id_series_realizadas: int
+    repeticiones: int
+    peso_kg: float
+
+
+@dataclass(slots=True)
+class EjercicioSesionDTO:
+    id_ejercicio: int
+    nombre: str
+
+
+@dataclass(slots=True)
+class RealizadoSesionDTO:
+    id_entrenamiento_realizado: int
+    ejercicio: EjercicioSesionDTO
+    series_realizadas: list
+
+
+@dataclass(slots=True)
+class SesionDTO:
+    id_entrenamiento: int
+    fecha: str
+    ejercicios_realizados: list
+
+    @classmethod
+    def desde_modelo(cls, entrenamiento):
+        return cls(entrenamiento.id_entrenamientos, entrenamiento.fecha.isoformat(), [
+            RealizadoSesionDTO(
+                r.id_entrenamientos_realizados,
+                EjercicioSesionDTO(r.ejercicio.id_ejercicios, r.ejercicio.ejercicio_base.nombre),
+                [SerieSesionDTO(s.id_series_realizadas, s.repeticiones, s.peso_kg) for s in r.series_realizadas]
+            ) for r in entrenamiento.realizados
+        ])
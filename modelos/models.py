@@ -1,7 +1,35 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import DateTime, event, insert, or_, select, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
 
-db = SQLAlchemy()
+from servicios.replicas import SesionRuteada
+
+# Las lecturas de GET/HEAD pueden ir a una réplica (ver servicios/replicas.py)
+db = SQLAlchemy(session_options={'class_': SesionRuteada})
+
+
+class ahora_utc(FunctionElement):
+    """
+    Hora UTC (sin zona) del reloj de la base. Marca `actualizado_en` y `eliminado_en`
+    para que las filas y el cursor de GET /sync salgan del mismo reloj, sin depender
+    de la hora de cada host de la app.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(ahora_utc, 'postgresql')
+def _ahora_utc_postgresql(elemento, compilador, **kw):
+    return "timezone('utc', now())"
+
+
+@compiles(ahora_utc, 'sqlite')
+def _ahora_utc_sqlite(elemento, compilador, **kw):
+    # Mismo formato de texto (microsegundos) que guarda el tipo DateTime de SQLAlchemy
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
 
 
 class Usuario(db.Model):
@@ -28,7 +56,13 @@ class EjercicioUsuario(db.Model):
     nombre = db.Column(db.String(255), nullable=False)
     descripcion = db.Column(db.Text)
     video_url = db.Column(db.Text)
-    usuarios_id = db.Column(db.Integer, db.ForeignKey("usuarios.id_usuarios"), nullable=False)
+    usuarios_id = db.Column(db.Integer, db.ForeignKey("usuarios.id_usuarios"), nullable=False, index=True)
+    # Última modificación, para la sincronización incremental (ver servicios/sincronizacion.py)
+    actualizado_en = db.Column(db.DateTime, nullable=False, server_default=ahora_utc(), onupdate=ahora_utc())
+
+    __table_args__ = (
+        db.Index('ix_ejercicios_usuario_usuarios_id_actualizado_en', 'usuarios_id', 'actualizado_en'),
+    )
 
     # Relación inversa
     usuario = db.relationship("Usuario", back_populates="ejercicios_usuario")
@@ -36,12 +70,21 @@ class EjercicioUsuario(db.Model):
 
 class Rutina(db.Model):
     __tablename__ = 'rutinas'
+    # Rutinas del usuario ordenadas por nombre, y las modificadas desde un momento dado
+    __table_args__ = (
+        db.Index('ix_rutinas_usuarios_id_nombre', 'usuarios_id', 'nombre'),
+        db.Index('ix_rutinas_usuarios_id_actualizado_en', 'usuarios_id', 'actualizado_en'),
+    )
     id_rutinas = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False, unique=True)
     descripcion = db.Column(db.String(500))
     usuarios_id = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuarios', ondelete='CASCADE'), nullable=False)
     nivel_rutinas_id = db.Column(db.Integer, db.ForeignKey('nivel_rutinas.id_nivel_rutinas', ondelete='RESTRICT'),
-                                 nullable=False)
+                                 nullable=False, index=True)
+    # Se incrementa cada vez que cambia la rutina, sus ejercicios o sus series (ver _versionar_rutinas)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Se actualiza junto con `version` (el UPDATE de incrementar_version_rutinas dispara el onupdate)
+    actualizado_en = db.Column(db.DateTime, nullable=False, server_default=ahora_utc(), onupdate=ahora_utc())
 
     ejercicios = db.relationship('Ejercicio', backref='rutina', cascade="all, delete-orphan")
     entrenamientos = db.relationship('Entrenamiento', backref='rutina', cascade="all, delete-orphan")
@@ -69,8 +112,9 @@ class Ejercicio(db.Model):
     __tablename__ = 'ejercicios'
     id_ejercicios = db.Column(db.Integer, primary_key=True, autoincrement=True)
     ejercicios_base_id = db.Column(db.Integer, db.ForeignKey('ejercicios_base.id_ejercicios_base', ondelete='CASCADE'),
-                                   nullable=False)
-    rutinas_id = db.Column(db.Integer, db.ForeignKey('rutinas.id_rutinas', ondelete='CASCADE'), nullable=False)
+                                   nullable=False, index=True)
+    rutinas_id = db.Column(db.Integer, db.ForeignKey('rutinas.id_rutinas', ondelete='CASCADE'), nullable=False,
+                           index=True)
 
     series = db.relationship('Serie', backref='ejercicio', cascade="all, delete-orphan")
 
@@ -81,6 +125,15 @@ class Entrenamiento(db.Model):
     fecha = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     usuarios_id = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuarios', ondelete='CASCADE'), nullable=False)
     rutinas_id = db.Column(db.Integer, db.ForeignKey('rutinas.id_rutinas', ondelete='RESTRICT'), nullable=False)
+    actualizado_en = db.Column(db.DateTime, nullable=False, server_default=ahora_utc(), onupdate=ahora_utc())
+
+    # Historial del usuario (y de una rutina) de la sesión más reciente a la más antigua,
+    # con el id como desempate de la paginación por keyset
+    __table_args__ = (
+        db.Index('ix_entrenamientos_usuarios_id_fecha', usuarios_id, fecha.desc(), id_entrenamientos.desc()),
+        db.Index('ix_entrenamientos_rutinas_id_fecha', rutinas_id, fecha.desc()),
+        db.Index('ix_entrenamientos_usuarios_id_actualizado_en', usuarios_id, actualizado_en),
+    )
 
     realizados = db.relationship('EntrenamientoRealizado', backref='entrenamiento', cascade="all, delete-orphan")
 
@@ -89,8 +142,9 @@ class EntrenamientoRealizado(db.Model):
     __tablename__ = 'entrenamientos_realizados'
     id_entrenamientos_realizados = db.Column(db.Integer, primary_key=True)
     entrenamientos_id = db.Column(db.Integer, db.ForeignKey('entrenamientos.id_entrenamientos', ondelete='CASCADE'),
-                                  nullable=False)
-    ejercicios_id = db.Column(db.Integer, db.ForeignKey('ejercicios.id_ejercicios', ondelete='CASCADE'), nullable=False)
+                                  nullable=False, index=True)
+    ejercicios_id = db.Column(db.Integer, db.ForeignKey('ejercicios.id_ejercicios', ondelete='CASCADE'), nullable=False,
+                              index=True)
 
     series_realizadas = db.relationship('SerieRealizada', backref='entrenamiento_realizado',
                                         cascade="all, delete-orphan")
@@ -103,7 +157,8 @@ class Serie(db.Model):
     id_series = db.Column(db.Integer, primary_key=True)
     repeticiones = db.Column(db.Integer, nullable=False)
     peso_kg = db.Column(db.Float, nullable=False)
-    ejercicios_id = db.Column(db.Integer, db.ForeignKey('ejercicios.id_ejercicios', ondelete='CASCADE'), nullable=False)
+    ejercicios_id = db.Column(db.Integer, db.ForeignKey('ejercicios.id_ejercicios', ondelete='CASCADE'), nullable=False,
+                              index=True)
 
 
 class SerieRealizada(db.Model):
@@ -111,6 +166,146 @@ class SerieRealizada(db.Model):
     id_series_realizadas = db.Column(db.Integer, primary_key=True)
     entrenamientos_realizados_id = db.Column(db.Integer,
                                              db.ForeignKey('entrenamientos_realizados.id_entrenamientos_realizados',
-                                                           ondelete='CASCADE'), nullable=False)
+                                                           ondelete='CASCADE'), nullable=False, index=True)
     repeticiones = db.Column(db.Integer, nullable=False)
     peso_kg = db.Column(db.Float, nullable=False)
+
+
+class EstadisticaEjercicio(db.Model):
+    """
+    Acumulado de series realizadas por (usuario, rutina, ejercicio). Se actualiza en la
+    misma transacción que registra el entrenamiento; ver servicios/estadisticas.py.
+    """
+    __tablename__ = 'estadisticas_ejercicios'
+    usuarios_id = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuarios', ondelete='CASCADE'), primary_key=True)
+    # La clave primaria cubre las búsquedas por usuario; estos índices, los borrados en cascada
+    rutinas_id = db.Column(db.Integer, db.ForeignKey('rutinas.id_rutinas', ondelete='CASCADE'), primary_key=True,
+                           index=True)
+    ejercicios_id = db.Column(db.Integer, db.ForeignKey('ejercicios.id_ejercicios', ondelete='CASCADE'),
+                              primary_key=True, index=True)
+    cantidad_series = db.Column(db.Integer, nullable=False, default=0)
+    suma_peso_kg = db.Column(db.Float, nullable=False, default=0)
+    max_peso_kg = db.Column(db.Float, nullable=False, default=0)
+
+
+class TokenRevocado(db.Model):
+    """
+    Tokens revocados (por hash SHA-256) hasta su `exp` (epoch). Solo se usa con
+    REVOCACION_BACKEND=db; ver servicios/revocacion.py.
+    """
+    __tablename__ = 'tokens_revocados'
+    id = db.Column(db.Integer, primary_key=True)
+    clave = db.Column(db.String(64), nullable=False, unique=True)
+    exp = db.Column(db.BigInteger, nullable=False, index=True)
+
+
+class RespuestaIdempotente(db.Model):
+    """
+    Primera respuesta de cada `Idempotency-Key` (por hash SHA-256) hasta su `exp` (epoch).
+    `status` es nulo mientras la petición original está en curso. Solo se usa con
+    IDEMPOTENCIA_BACKEND=db (por defecto con Postgres); ver servicios/idempotencia.py.
+    """
+    __tablename__ = 'respuestas_idempotentes'
+    clave = db.Column(db.String(64), primary_key=True)
+    huella = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.Integer, nullable=True)
+    mimetype = db.Column(db.String(100), nullable=True)
+    cuerpo = db.Column(db.LargeBinary, nullable=True)
+    exp = db.Column(db.BigInteger, nullable=False, index=True)
+
+
+class UltimaEscritura(db.Model):
+    """
+    Momento (epoch) de la última escritura de cada usuario, para que sus lecturas no vayan
+    a la réplica antes de que la tenga. Sin clave foránea: la baja de un usuario también
+    se registra. Solo se usa con REPLICA_ESCRITURAS_BACKEND=db (por defecto con Postgres);
+    ver servicios/escrituras.py.
+    """
+    __tablename__ = 'ultimas_escrituras'
+    usuarios_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    momento = db.Column(db.Float, nullable=False)
+
+
+class Eliminacion(db.Model):
+    """
+    Registro ("tombstone") de una rutina, entrenamiento o ejercicio de usuario eliminado,
+    para informarlo en la sincronización incremental. Se purga con `flask sync purgar`.
+    """
+    __tablename__ = 'eliminaciones'
+    id = db.Column(db.Integer, primary_key=True)
+    usuarios_id = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuarios', ondelete='CASCADE'), nullable=False)
+    tabla = db.Column(db.String(50), nullable=False)
+    id_registro = db.Column(db.Integer, nullable=False)
+    eliminado_en = db.Column(db.DateTime, nullable=False, server_default=ahora_utc(), index=True)
+
+    __table_args__ = (
+        db.Index('ix_eliminaciones_usuarios_id_eliminado_en', 'usuarios_id', 'eliminado_en'),
+    )
+
+
+# Modelos sincronizados cuyo borrado se registra en `eliminaciones`, con su columna id
+_SINCRONIZADOS = {
+    Rutina: 'id_rutinas',
+    Entrenamiento: 'id_entrenamientos',
+    EjercicioUsuario: 'id_ejercicios_usuario',
+}
+
+
+@event.listens_for(Session, 'before_flush')
+def _registrar_eliminaciones(session, flush_context, instances):
+    """
+    Agrega una `Eliminacion` por cada Rutina, Entrenamiento o EjercicioUsuario borrado en
+    el flush (incluidos los borrados en cascada desde la rutina). Los borrados por lotes
+    con Core deben insertar sus propias filas en `eliminaciones`.
+    """
+    filas = [
+        {'usuarios_id': obj.usuarios_id, 'tabla': obj.__tablename__, 'id_registro': getattr(obj, _SINCRONIZADOS[type(obj)])}
+        for obj in session.deleted if type(obj) in _SINCRONIZADOS
+    ]
+    if filas:
+        # Una sola sentencia aunque el borrado de una rutina arrastre cientos de entrenamientos
+        session.execute(insert(Eliminacion), filas)
+
+
+@event.listens_for(Session, 'before_flush')
+def _versionar_rutinas(session, flush_context, instances):
+    """
+    Incrementa `Rutina.version` en el mismo flush en que cambia la rutina o cualquiera
+    de sus Ejercicio/Serie. Las rutinas nuevas o eliminadas no se versionan.
+    Las escrituras por lotes con Core deben llamar a `incrementar_version_rutinas`.
+    """
+    eliminadas = {obj.id_rutinas for obj in session.deleted if isinstance(obj, Rutina)}
+    cambiados = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if session.is_modified(obj, include_collections=False)
+    ]
+
+    ids_rutinas, ids_ejercicios = set(), set()
+    for obj in cambiados:
+        if isinstance(obj, Rutina):
+            ids_rutinas.add(obj.id_rutinas)
+        elif isinstance(obj, Ejercicio):
+            ids_rutinas.add(obj.rutinas_id if obj.rutinas_id is not None else getattr(obj.rutina, 'id_rutinas', None))
+        elif isinstance(obj, Serie):
+            if obj.ejercicios_id is not None:
+                ids_ejercicios.add(obj.ejercicios_id)
+            elif obj.ejercicio is not None:
+                ids_rutinas.add(obj.ejercicio.rutinas_id)
+
+    ids_rutinas -= eliminadas | {None}
+    if ids_rutinas or ids_ejercicios:
+        incrementar_version_rutinas(session, ids_rutinas, ids_ejercicios, excluir=eliminadas)
+
+
+def incrementar_version_rutinas(session, ids_rutinas=(), ids_ejercicios=(), excluir=()):
+    """Incrementa en una sola sentencia la versión de las rutinas indicadas o dueñas de `ids_ejercicios`."""
+    condiciones = []
+    if ids_rutinas:
+        condiciones.append(Rutina.id_rutinas.in_(ids_rutinas))
+    if ids_ejercicios:
+        condiciones.append(Rutina.id_rutinas.in_(
+            select(Ejercicio.rutinas_id).where(Ejercicio.id_ejercicios.in_(ids_ejercicios))
+        ))
+    sentencia = update(Rutina).where(or_(*condiciones)).values(version=Rutina.version + 1)
+    if excluir:
+        sentencia = sentencia.where(Rutina.id_rutinas.notin_(excluir))
+    session.execute(sentencia, execution_options={'synchronize_session': False})
@@ -1,9 +1,14 @@
-from flask import Blueprint, request, jsonify
-from modelos.models import db, Ejercicio, EjercicioBase, EjercicioUsuario, Usuario
+import hashlib
+
+from flask import Blueprint, Response, current_app, g, request, jsonify
+from modelos.models import db, Ejercicio, EjercicioUsuario, Rutina
 from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.exceptions import NotFound
 
 from security import required_token
+from servicios.cache_catalogo import catalogo_base
+from servicios.instrumentacion_sql import max_consultas
+from servicios.progresion import MAX_PUNTOS_LIMITE, MAX_PUNTOS_POR_DEFECTO, lttb, progresion_por_sesion
 
 ejercicios_bp = Blueprint('ejercicios_bp', __name__)
 
@@ -23,7 +28,8 @@ def crear_ejercicio(token_payload):
             return jsonify({'error': 'Campo requerido', 'detalle': 'El campo "nombre" no puede estar vacío.'}), 400
 
         user_id = token_payload.get('id_usuario')
-        usuario = Usuario.query.get(user_id)
+        # Usuario ya resuelto (y cacheado) por required_token
+        usuario = g.principal
 
         if not usuario:
             return jsonify({
@@ -40,7 +46,7 @@ def crear_ejercicio(token_payload):
             nombre=nombre,
             descripcion=descripcion,
             video_url=video_url,
-            usuarios_id=usuario.id_usuarios
+            usuarios_id=usuario.id_usuario
         )
         db.session.add(ejercicio_usuario)
         db.session.commit()
@@ -71,9 +77,11 @@ def crear_ejercicio(token_payload):
 
 
 @ejercicios_bp.route('/ejercicios/<int:id>', methods=['GET'])
+@max_consultas(1)
 def obtener_ejercicio(id):
     try:
-        ejercicio = Ejercicio.query.get_or_404(id)
+        ejercicio = Ejercicio.query.options(db.joinedload(Ejercicio.ejercicio_base))\
+            .filter_by(id_ejercicios=id).first_or_404()
         return jsonify({
             'id_ejercicios': ejercicio.id_ejercicios,
             'ejercicios_base_id': ejercicio.ejercicios_base_id,
@@ -98,17 +106,77 @@ def obtener_ejercicio(id):
             'detalle': str(e)
         }), 500
 
+@ejercicios_bp.route('/ejercicios/<int:id>/progresion', methods=['GET'])
+@max_consultas(3)
+@required_token
+def obtener_progresion(id, token_payload):
+    """
+    Devuelve la progresión por sesión (serie más pesada, 1RM estimado y volumen) de un ejercicio
+    del usuario, lista para graficar. Con `max_points` (por defecto 200) se limita la cantidad de
+    puntos: las historias más largas se reducen en el servidor con LTTB sobre el 1RM estimado.
+    """
+    try:
+        try:
+            max_puntos = int(request.args.get('max_points', MAX_PUNTOS_POR_DEFECTO))
+        except ValueError:
+            max_puntos = 0
+        if not 3 <= max_puntos <= MAX_PUNTOS_LIMITE:
+            return jsonify({
+                'error': 'Parámetros inválidos',
+                'detalle': f'max_points debe ser un entero entre 3 y {MAX_PUNTOS_LIMITE}.'
+            }), 400
+
+        # --- Validación de Existencia y Propiedad en una consulta ---
+        usuario_rutina = db.session.query(Rutina.usuarios_id)\
+            .join(Ejercicio, Ejercicio.rutinas_id == Rutina.id_rutinas)\
+            .filter(Ejercicio.id_ejercicios == id).scalar()
+        if usuario_rutina is None:
+            return jsonify({
+                'error': 'Ejercicio no encontrado',
+                'detalle': f'No existe un ejercicio con ID {id}'
+            }), 404
+        if usuario_rutina != token_payload.get('id_usuario'):
+            return jsonify({'error': 'No autorizado para ver este ejercicio.'}), 403
+
+        sesiones = progresion_por_sesion(usuario_rutina, id)
+        puntos = lttb(sesiones, max_puntos, 'e1rm_kg')
+        for punto in puntos:
+            punto.pop('_x')
+
+        return jsonify({
+            'ejercicio_id': id,
+            'total_sesiones': len(sesiones),
+            'muestreado': len(puntos) < len(sesiones),
+            'puntos': puntos
+        })
+
+    except SQLAlchemyError as e:
+        return jsonify({
+            'error': 'Error en la base de datos',
+            'detalle': str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            'error': 'Error inesperado',
+            'detalle': str(e)
+        }), 500
+
 @ejercicios_bp.route('/ejercicios-base', methods=['GET'])
+@max_consultas(4)
 @required_token
 def obtener_ejercicios_base(token_payload):
     """
     Obtiene un catálogo completo de ejercicios:
     1. Los ejercicios base disponibles para todos.
     2. Los ejercicios personalizados creados por el usuario.
+
+    El catálogo base se sirve desde la cache del worker y la respuesta lleva un ETag:
+    si coincide con `If-None-Match` se responde 304 sin cuerpo.
     """
     try:
         user_id = token_payload.get('id_usuario')
-        usuario = Usuario.query.get(user_id)
+        # Usuario ya resuelto (y cacheado) por required_token
+        usuario = g.principal
 
         if not usuario:
             return jsonify({
@@ -116,30 +184,30 @@ def obtener_ejercicios_base(token_payload):
                 'detalle': f'No se ha encontrado un usuario con el ID {user_id} asociado al token.'
             }), 404
         
-        ejercicios_usuario = EjercicioUsuario.query.filter_by(usuarios_id=usuario.id_usuarios).all()
-        
-        ejercicios_base = EjercicioBase.query.all()
-
-        catalogo_unificado = []
-
-        for e in ejercicios_usuario:
-            catalogo_unificado.append({
-                'id': e.id_ejercicios_usuario,
-                'nombre': e.nombre,
-                'descripcion': e.descripcion,
-                'video_url': e.video_url,
-            })
-
-        # Añadir ejercicios base
-        for e in ejercicios_base:
-            catalogo_unificado.append({
-                'id': e.id_ejercicios_base,
-                'nombre': e.nombre,
-                'descripcion': e.descripcion,
-                'video_url': e.video_url,
-            })
-
-        return jsonify(catalogo_unificado)
+        ejercicios_usuario = EjercicioUsuario.query.filter_by(usuarios_id=usuario.id_usuario)\
+            .order_by(EjercicioUsuario.id_ejercicios_usuario).all()
+
+        # Los ejercicios base salen de la cache del worker, ya serializados
+        fragmento_base, etag_base, cuerpo_base = catalogo_base.obtener()
+
+        fragmentos = [current_app.json.dumps({
+            'id': e.id_ejercicios_usuario,
+            'nombre': e.nombre,
+            'descripcion': e.descripcion,
+            'video_url': e.video_url,
+        }) for e in ejercicios_usuario]
+        # --- Conditional GET: el ETag cubre el catálogo base y los ejercicios del usuario ---
+        etag = hashlib.sha1(f'{etag_base}:{",".join(fragmentos)}'.encode()).hexdigest()
+
+        if not fragmentos:
+            # Sin ejercicios propios la respuesta es el catálogo tal cual, ya comprimido
+            respuesta = cuerpo_base.respuesta()
+        else:
+            if fragmento_base:
+                fragmentos.append(fragmento_base)
+            respuesta = Response('[' + ','.join(fragmentos) + ']', mimetype='application/json')
+        respuesta.set_etag(etag)
+        return respuesta.make_conditional(request)
 
     except SQLAlchemyError as e:
         return jsonify({
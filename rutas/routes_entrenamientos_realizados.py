@@ -1,16 +1,29 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy import insert, tuple_
 from sqlalchemy.exc import SQLAlchemyError
+from collections import defaultdict
 from datetime import datetime
 
 # Se importan los modelos necesarios para las nuevas validaciones
 from modelos.models import db, EntrenamientoRealizado, Entrenamiento, Ejercicio, SerieRealizada, Rutina
+from modelos.dtos import EjercicioRealizadoDTO, SerieDTO
 from security import required_token
+from servicios.estadisticas import acumular_series
+from servicios.importacion import FORMATOS, Importador, leer_csv, leer_ndjson
+from servicios.idempotencia import idempotente
+from servicios.insercion import insertar_con_returning
+from servicios.instrumentacion_sql import max_consultas
+from servicios.paginacion import codificar_cursor, decodificar_cursor, leer_fecha, leer_limite
+from servicios.streaming import TAMANIO_LOTE, quiere_ndjson, respuesta_ndjson
 
 entrenamientos_realizados_bp = Blueprint('entrenamientos_realizados_bp', __name__)
 
 
 @entrenamientos_realizados_bp.route('/entrenamientos_realizados', methods=['POST'])
+# +2 del registro de Idempotency-Key con IDEMPOTENCIA_BACKEND=db (ver servicios/idempotencia.py)
+@max_consultas(8)
 @required_token
+@idempotente
 def crear_entrenamiento_realizados(token_payload):
     data = request.json
     if not data:
@@ -28,28 +41,19 @@ def crear_entrenamiento_realizados(token_payload):
     if missing_fields:
         return jsonify({'error': f'Faltan campos requeridos: {", ".join(missing_fields)}'}), 400
 
-    # 2. Validación de tipos, formatos y existencia
+    # 2. Validación de tipos y formatos
     try:
-        datetime.fromisoformat(data['fecha'].split('T')[0])
-    except (ValueError, TypeError):
+        fecha = datetime.fromisoformat(data['fecha'].split('T')[0]).date()
+    except (ValueError, TypeError, AttributeError):
         return jsonify({'error': 'El formato de fecha es inválido. Use YYYY-MM-DD.'}), 400
 
     if not isinstance(data['rutinas_id'], int):
         return jsonify({'error': 'El campo "rutinas_id" debe ser un entero.'}), 400
 
-    # Validar que la rutina exista y que pertenezca al usuario autenticado
-    rutina = Rutina.query.get(data['rutinas_id'])
-    if not rutina:
-        return jsonify({'error': 'Rutina no encontrada', 'detalle': f"La rutina con id {data['rutinas_id']} no existe."}), 404
-
-    # --- Validación de Propiedad ---
-    if rutina.usuarios_id != user_id_from_token:
-        return jsonify({'error': 'Acción no permitida', 'detalle': 'No puedes registrar un entrenamiento para una rutina que no te pertenece.'}), 403
-
     if not isinstance(data['ejercicios'], list) or not data['ejercicios']:
         return jsonify({'error': 'El campo "ejercicios" debe ser una lista no vacía.'}), 400
 
-    # 3. Validación de ejercicios y su pertenencia a la rutina
+    # 3. Validación estructural de ejercicios y series (sin consultas)
     for i, ejercicio_data in enumerate(data['ejercicios']):
         if not isinstance(ejercicio_data, dict):
             return jsonify({'error': f'El elemento en el índice {i} de "ejercicios" debe ser un objeto.'}), 400
@@ -58,12 +62,6 @@ def crear_entrenamiento_realizados(token_payload):
             return jsonify(
                 {'error': f'El ejercicio en el índice {i} debe tener un "ejercicios_id" de tipo entero.'}), 400
 
-        # Se valida que el ejercicio exista, pero no su pertenencia a la rutina
-        ejercicio_id = ejercicio_data['ejercicios_id']
-        ejercicio = Ejercicio.query.get(ejercicio_id)
-        if not ejercicio:
-            return jsonify({'error': f'El ejercicio con ID {ejercicio_id} no existe.'}), 404
-
         if 'series' not in ejercicio_data or not isinstance(ejercicio_data['series'], list) or not ejercicio_data[
             'series']:
             return jsonify({
@@ -88,40 +86,75 @@ def crear_entrenamiento_realizados(token_payload):
                     {
                         'error': f'El campo "peso_kg" en la serie {j} del ejercicio {i} debe ser un número no negativo.'}), 400
 
+    # 4. Existencia, propiedad y pertenencia a la rutina en una única consulta:
+    # la rutina se une a todos los ejercicios referenciados por el cliente.
+    rutinas_id = data['rutinas_id']
+    ids_ejercicios = {ejercicio_data['ejercicios_id'] for ejercicio_data in data['ejercicios']}
+    try:
+        filas = db.session.query(Rutina.usuarios_id, Ejercicio.id_ejercicios, Ejercicio.rutinas_id)\
+            .select_from(Rutina)\
+            .outerjoin(Ejercicio, Ejercicio.id_ejercicios.in_(ids_ejercicios))\
+            .filter(Rutina.id_rutinas == rutinas_id)\
+            .all()
+    except SQLAlchemyError as e:
+        return jsonify({'error': 'Error en la base de datos', 'detalle': str(e)}), 500
+
+    if not filas:
+        return jsonify({'error': 'Rutina no encontrada', 'detalle': f"La rutina con id {rutinas_id} no existe."}), 404
+
+    # --- Validación de Propiedad ---
+    if filas[0].usuarios_id != user_id_from_token:
+        return jsonify({'error': 'Acción no permitida', 'detalle': 'No puedes registrar un entrenamiento para una rutina que no te pertenece.'}), 403
+
+    rutina_de_ejercicio = {fila.id_ejercicios: fila.rutinas_id for fila in filas if fila.id_ejercicios is not None}
+    for ejercicio_data in data['ejercicios']:
+        ejercicio_id = ejercicio_data['ejercicios_id']
+        if ejercicio_id not in rutina_de_ejercicio:
+            return jsonify({'error': f'El ejercicio con ID {ejercicio_id} no existe.'}), 404
+        if rutina_de_ejercicio[ejercicio_id] != rutinas_id:
+            return jsonify({
+                'error': 'Ejercicio inválido',
+                'detalle': f'El ejercicio con ID {ejercicio_id} no pertenece a la rutina {rutinas_id}.'
+            }), 400
+
     # --- Fin de Validaciones ---
 
     try:
         entrenamiento = Entrenamiento(
-            fecha=data['fecha'],
+            fecha=fecha,
             usuarios_id=user_id_from_token, # Se usa el ID del token
-            rutinas_id=data['rutinas_id']
+            rutinas_id=rutinas_id
         )
         db.session.add(entrenamiento)
         db.session.flush()
 
-        ultimo_entrenamiento_realizado = None
+        # --- Inserción por lotes del árbol completo del entrenamiento ---
+        ids_realizados = insertar_con_returning(EntrenamientoRealizado, EntrenamientoRealizado.id_entrenamientos_realizados, [
+            {'entrenamientos_id': entrenamiento.id_entrenamientos, 'ejercicios_id': ejercicio_data['ejercicios_id']}
+            for ejercicio_data in data['ejercicios']
+        ])
+
+        db.session.execute(insert(SerieRealizada), [
+            {
+                'entrenamientos_realizados_id': id_realizado,
+                'repeticiones': serie_data['repeticiones'],
+                'peso_kg': serie_data['peso_kg']
+            }
+            for ejercicio_data, id_realizado in zip(data['ejercicios'], ids_realizados)
+            for serie_data in ejercicio_data['series']
+        ])
+
+        # Estadísticas acumuladas, en la misma transacción que el entrenamiento
+        pesos_por_ejercicio = defaultdict(list)
         for ejercicio_data in data['ejercicios']:
-            entrenamiento_realizado = EntrenamientoRealizado(
-                entrenamientos_id=entrenamiento.id_entrenamientos,
-                ejercicios_id=ejercicio_data["ejercicios_id"]
-            )
-            db.session.add(entrenamiento_realizado)
-            db.session.flush()
-            ultimo_entrenamiento_realizado = entrenamiento_realizado
-
-            for serie_data in ejercicio_data['series']:
-                serie_realizada = SerieRealizada(
-                    entrenamientos_realizados_id=entrenamiento_realizado.id_entrenamientos_realizados,
-                    repeticiones=serie_data['repeticiones'],
-                    peso_kg=serie_data['peso_kg']
-                )
-                db.session.add(serie_realizada)
+            pesos_por_ejercicio[ejercicio_data['ejercicios_id']].extend(s['peso_kg'] for s in ejercicio_data['series'])
+        acumular_series(user_id_from_token, rutinas_id, pesos_por_ejercicio)
 
         db.session.commit()
 
         return jsonify(
             {'mensaje': 'Entrenamiento realizado creado con éxito',
-             'id': ultimo_entrenamiento_realizado.id_entrenamientos_realizados}), 201
+             'id': ids_realizados[-1]}), 201
 
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -131,44 +164,155 @@ def crear_entrenamiento_realizados(token_payload):
         return jsonify({'error': 'Ocurrió un error inesperado', 'detalle': str(e)}), 500
 
 
+def _carga_por_lotes():
+    """
+    Opciones de carga compatibles con LIMIT y `yield_per`: los hijos se traen con una
+    consulta IN por lote de entrenamientos en lugar de multiplicar filas con JOINs.
+    """
+    return (
+        db.selectinload(Entrenamiento.realizados).selectinload(EntrenamientoRealizado.series_realizadas),
+        db.selectinload(Entrenamiento.realizados).joinedload(EntrenamientoRealizado.ejercicio).joinedload(Ejercicio.ejercicio_base)
+    )
+
+
+def _iterar_realizados(entrenamientos):
+    """Aplana los entrenamientos en los ejercicios realizados que devuelve la API, uno a uno."""
+    for entrenamiento in entrenamientos:
+        for realizado in entrenamiento.realizados:
+            yield EjercicioRealizadoDTO.desde_modelo(realizado, entrenamiento.fecha)
+
+
 @entrenamientos_realizados_bp.route('/entrenamientos_realizados', methods=['GET'])
+@max_consultas(4)
 @required_token
 def obtener_entrenamientos_realizados(token_payload):
+    """
+    Lista los ejercicios realizados del usuario autenticado, del más reciente al más antiguo.
+
+    Parámetros opcionales:
+    - `desde` / `hasta` (YYYY-MM-DD): filtran por fecha del entrenamiento.
+    - `limit` / `cursor`: activan la paginación por keyset sobre (fecha, id_entrenamientos).
+      La respuesta pasa a ser un objeto con `entrenamientos_realizados` y `next_cursor`,
+      y cada página contiene como máximo `limit` entrenamientos.
+
+    Con `Accept: application/x-ndjson` la respuesta se envía en streaming, un ejercicio
+    realizado por línea, leyendo los entrenamientos por lotes desde el servidor.
+    """
     try:
         user_id_from_token = token_payload.get('id_usuario')
 
+        try:
+            desde = leer_fecha(request.args.get('desde'))
+            hasta = leer_fecha(request.args.get('hasta'))
+        except ValueError:
+            return jsonify({'error': 'Parámetros inválidos', 'detalle': 'Las fechas "desde" y "hasta" deben tener formato YYYY-MM-DD.'}), 400
+
+        paginado = 'limit' in request.args or 'cursor' in request.args
+        try:
+            limite = leer_limite(request.args.get('limit'))
+            cursor = decodificar_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'error': 'Parámetros inválidos', 'detalle': str(e)}), 400
+
         # --- Consulta Optimizada y Segura ---
-        # Se obtienen solo los entrenamientos del usuario autenticado
-        # y se cargan los datos relacionados de forma eficiente para evitar N+1 queries.
-        entrenamientos = Entrenamiento.query.filter_by(usuarios_id=user_id_from_token).options(
-            db.joinedload(Entrenamiento.realizados).joinedload(EntrenamientoRealizado.series_realizadas),
-            db.joinedload(Entrenamiento.realizados).joinedload(EntrenamientoRealizado.ejercicio).joinedload(Ejercicio.ejercicio_base)
-        ).order_by(Entrenamiento.fecha.desc()).all()
-
-        realizados_info = []
-        for entrenamiento in entrenamientos:
-            for realizado in entrenamiento.realizados:
-                series_info = [{'id': s.id_series_realizadas, 'repeticiones': s.repeticiones, 'peso_kg': s.peso_kg} for s in realizado.series_realizadas]
-                realizados_info.append({
-                    'id_entrenamientos_realizados': realizado.id_entrenamientos_realizados,
-                    'entrenamientos_id': realizado.entrenamientos_id,
-                    'fecha_entrenamiento': entrenamiento.fecha.isoformat(),
-                    'ejercicio': {
-                        'id': realizado.ejercicio.id_ejercicios,
-                        'nombre': realizado.ejercicio.ejercicio_base.nombre
-                    },
-                    'series_realizadas': series_info
-                })
-
-        return jsonify(realizados_info), 200
+        # Se obtienen solo los entrenamientos del usuario autenticado; los filtros de fecha
+        # y la posición del cursor se resuelven en SQL.
+        consulta = Entrenamiento.query.filter_by(usuarios_id=user_id_from_token)
+        if desde:
+            consulta = consulta.filter(Entrenamiento.fecha >= desde)
+        if hasta:
+            consulta = consulta.filter(Entrenamiento.fecha <= hasta)
+        consulta = consulta.order_by(Entrenamiento.fecha.desc(), Entrenamiento.id_entrenamientos.desc())
+
+        # --- Paginación por keyset ---
+        # El costo de cada página no depende de cuántas páginas haya antes: se continúa
+        # desde (fecha, id) del último entrenamiento entregado en vez de usar OFFSET.
+        if cursor:
+            consulta = consulta.filter(tuple_(Entrenamiento.fecha, Entrenamiento.id_entrenamientos) < cursor)
+
+        if quiere_ndjson():
+            entrenamientos = consulta.options(*_carga_por_lotes()).yield_per(TAMANIO_LOTE)
+            return respuesta_ndjson(_iterar_realizados(entrenamientos))
+
+        if not paginado:
+            entrenamientos = consulta.options(
+                db.joinedload(Entrenamiento.realizados).joinedload(EntrenamientoRealizado.series_realizadas),
+                db.joinedload(Entrenamiento.realizados).joinedload(EntrenamientoRealizado.ejercicio).joinedload(Ejercicio.ejercicio_base)
+            ).all()
+            return jsonify(list(_iterar_realizados(entrenamientos))), 200
+
+        entrenamientos = consulta.options(*_carga_por_lotes()).limit(limite + 1).all()
+
+        next_cursor = None
+        if len(entrenamientos) > limite:
+            entrenamientos = entrenamientos[:limite]
+            ultimo = entrenamientos[-1]
+            next_cursor = codificar_cursor(ultimo.fecha, ultimo.id_entrenamientos)
+
+        return jsonify({
+            'entrenamientos_realizados': list(_iterar_realizados(entrenamientos)),
+            'next_cursor': next_cursor
+        }), 200
     except SQLAlchemyError as e:
         return jsonify({'error': 'Error en la base de datos', 'detalle': str(e)}), 500
 
 
+@entrenamientos_realizados_bp.route('/entrenamientos_realizados/importar', methods=['POST'])
+@required_token
+def importar_entrenamientos_realizados(token_payload):
+    """
+    Importa historial desde un archivo CSV (`Content-Type: text/csv`) o NDJSON
+    (`application/x-ndjson`) con una serie por fila; ver servicios/importacion.py.
+
+    El cuerpo se procesa como stream y la respuesta también es NDJSON en streaming: un
+    evento `error` por fila rechazada, uno de `progreso` por lote y al final un `resumen`
+    (o un `fallo` si la transacción no pudo confirmarse).
+    """
+    if request.mimetype not in FORMATOS:
+        return jsonify({
+            'error': 'Formato no soportado',
+            'detalle': 'El cuerpo debe ser text/csv o application/x-ndjson.'
+        }), 415
+
+    try:
+        filas = leer_csv(request.stream) if request.mimetype == 'text/csv' else leer_ndjson(request.stream)
+    except ValueError as e:
+        return jsonify({'error': 'Archivo inválido', 'detalle': str(e)}), 400
+
+    user_id_from_token = token_payload.get('id_usuario')
+    config = current_app.config
+
+    def generar():
+        try:
+            importador = Importador(user_id_from_token, config.get('IMPORTACION_LOTE', 5000),
+                                    config.get('IMPORTACION_MAX_ERRORES', 1000))
+            yield from importador.procesar(filas)
+            resumen = importador.terminar()
+            db.session.commit()
+            yield resumen
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            yield {'tipo': 'fallo', 'error': 'Error en la base de datos', 'detalle': str(e)}
+        except Exception as e:
+            db.session.rollback()
+            yield {'tipo': 'fallo', 'error': 'Ocurrió un error inesperado', 'detalle': str(e)}
+
+    respuesta = respuesta_ndjson(generar())
+    # Sin compresión: los eventos de progreso deben llegar a medida que se generan
+    respuesta.headers['Cache-Control'] = 'no-transform'
+    return respuesta
+
+
 @entrenamientos_realizados_bp.route('/entrenamientos_realizados/<int:id>', methods=['GET'])
+@max_consultas(2)
 @required_token
 def obtener_entrenamiento_realizado(id, token_payload):
-    realizado = EntrenamientoRealizado.query.get(id)
+    # Una sola consulta: el entrenamiento (para validar propiedad), el ejercicio con su base y las series
+    realizado = db.session.get(EntrenamientoRealizado, id, options=[
+        db.joinedload(EntrenamientoRealizado.entrenamiento),
+        db.joinedload(EntrenamientoRealizado.ejercicio).joinedload(Ejercicio.ejercicio_base),
+        db.joinedload(EntrenamientoRealizado.series_realizadas)
+    ])
 
     # --- Validación de Existencia ---
     # Se añade una validación explícita para devolver un mensaje de error personalizado.
@@ -180,12 +324,11 @@ def obtener_entrenamiento_realizado(id, token_payload):
     if realizado.entrenamiento.usuarios_id != token_payload.get('id_usuario'):
         return jsonify({'error': 'No autorizado para ver este recurso.'}), 403
 
-    ejercicio = Ejercicio.query.get(realizado.ejercicios_id)
+    ejercicio = realizado.ejercicio
     if not ejercicio:
         return jsonify({'error': f'El ejercicio con ID {realizado.ejercicios_id} no fue encontrado.'}), 404
 
-    series = SerieRealizada.query.filter_by(entrenamientos_realizados_id=id).all()
-    series_info = [{'id': s.id_series_realizadas, 'repeticiones': s.repeticiones, 'peso_kg': s.peso_kg} for s in series]
+    series_info = [SerieDTO.desde_serie_realizada(s) for s in realizado.series_realizadas]
 
     return jsonify({
         'id_entrenamientos_realizados': realizado.id_entrenamientos_realizados,
@@ -0,0 +1,31 @@
+import os
+
+from flask import Blueprint, jsonify
+from modelos.models import db
+
+from security import estadisticas_cache_principales, required_token
+from servicios.pool import estado_pool, metricas_pool
+
+metricas_bp = Blueprint('metricas_bp', __name__)
+
+@metricas_bp.route('/metricas/pool', methods=['GET'])
+@required_token
+def obtener_metricas_pool(token_payload):
+    """
+    Estado y contadores del pool de conexiones del worker que atiende la petición.
+
+    Los contadores son por proceso (ver `pid`): con varios workers cada uno informa
+    los suyos. Incluye también las estadísticas de la cache de tokens verificados.
+    """
+    try:
+        return jsonify({
+            'pid': os.getpid(),
+            'pool': estado_pool(db.engine.pool),
+            'contadores': metricas_pool.instantanea(),
+            'cache_principales': estadisticas_cache_principales()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'error': 'Error al obtener las métricas',
+            'detalle': str(e)
+        }), 500
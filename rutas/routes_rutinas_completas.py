@@ -1,37 +1,40 @@
-from flask import Blueprint, request, jsonify
-from modelos.models import db, Rutina, Ejercicio, Serie, EjercicioBase, Entrenamiento, EntrenamientoRealizado, Usuario
+from flask import Blueprint, Response, g, request, jsonify
+from modelos.models import db, Rutina, Ejercicio, Serie, EjercicioBase, Entrenamiento, EntrenamientoRealizado
+from modelos.dtos import RutinaDTO, SesionDTO
 from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.exceptions import NotFound
 from security import required_token
-from sqlalchemy import func
-from modelos.models import SerieRealizada
+from servicios.borrado import borrar_rutina
+from servicios.estadisticas import combinar_estadisticas, consulta_estadisticas_usuario, consulta_rutinas_usuario
+from servicios.idempotencia import idempotente
+from servicios.insercion import insertar_con_returning
+from servicios.instrumentacion_sql import max_consultas
+from servicios.rutinas_json import documento_rutina, documento_rutinas_por_ids, documento_rutinas_usuario, leer_ids
+from servicios.streaming import TAMANIO_LOTE, quiere_ndjson, respuesta_ndjson
 
 rutinas_completas_bp = Blueprint('rutinas_completas_bp', __name__)
 
-# --- Helper Function para construir la respuesta JSON de una rutina ---
-def _build_rutina_json(rutina):
-    """Construye un diccionario serializable en JSON a partir de un objeto Rutina."""
-    ejercicios_completos = []
-    for ejercicio in rutina.ejercicios:
-        ejercicios_completos.append({
-            'id': ejercicio.id_ejercicios,
-            'ejercicios_base_id': ejercicio.ejercicios_base_id,
-            'nombre': ejercicio.ejercicio_base.nombre,
-            'descripcion': ejercicio.ejercicio_base.descripcion,
-            'video_url': ejercicio.ejercicio_base.video_url,
-            'series': [{'id': s.id_series, 'repeticiones': s.repeticiones, 'peso_kg': s.peso_kg} for s in ejercicio.series]
-        })
-    return {
-        'id': rutina.id_rutinas,
-        'nombre': rutina.nombre,
-        'descripcion': rutina.descripcion,
-        'usuarios_id': rutina.usuarios_id,
-        'nivel_rutinas_id': rutina.nivel_rutinas_id,
-        'ejercicios': ejercicios_completos
-    }
+def _etag_rutina(id_rutina, version):
+    return f'rutina-{id_rutina}-v{version}'
+
+def _iterar_rutinas_json(usuario_id):
+    """
+    Recorre las rutinas del usuario en lotes de TAMANIO_LOTE (cursor del servidor en
+    Postgres) y genera el DTO de cada una a medida que se materializa.
+    """
+    rutinas = Rutina.query.filter_by(usuarios_id=usuario_id).options(
+        db.selectinload(Rutina.ejercicios).joinedload(Ejercicio.ejercicio_base),
+        db.selectinload(Rutina.ejercicios).selectinload(Ejercicio.series)
+    ).order_by(Rutina.nombre).yield_per(TAMANIO_LOTE)
+
+    for rutina in rutinas:
+        yield RutinaDTO.desde_modelo(rutina)
 
 @rutinas_completas_bp.route('/rutinas/completas', methods=['POST'])
+# +2 del registro de Idempotency-Key con IDEMPOTENCIA_BACKEND=db (ver servicios/idempotencia.py)
+@max_consultas(8)
 @required_token
+@idempotente
 def crear_rutina_completa(token_payload):
     try:
         data = request.json
@@ -52,7 +55,13 @@ def crear_rutina_completa(token_payload):
                     'detalle': f'El campo {campo} es requerido'
                 }), 400
 
-        # Validar que exista el ejercicio base
+        if not isinstance(data['ejercicios'], list):
+            return jsonify({
+                'error': 'Datos inválidos',
+                'detalle': 'El campo ejercicios debe ser una lista'
+            }), 400
+
+        # Validar la estructura completa antes de tocar la base de datos
         for ejercicio_data in data['ejercicios']:
             if 'ejercicios_base_id' not in ejercicio_data:
                 return jsonify({
@@ -60,8 +69,28 @@ def crear_rutina_completa(token_payload):
                     'detalle': 'Cada ejercicio debe tener un ejercicios_base_id'
                 }), 400
 
-            ejercicio_base = EjercicioBase.query.get(ejercicio_data['ejercicios_base_id'])
-            if not ejercicio_base:
+            if 'series' not in ejercicio_data:
+                return jsonify({
+                    'error': 'Datos incompletos',
+                    'detalle': 'Cada ejercicio debe tener al menos una serie'
+                }), 400
+
+            for serie_data in ejercicio_data['series']:
+                if 'repeticiones' not in serie_data or 'peso_kg' not in serie_data:
+                    return jsonify({
+                        'error': 'Datos incompletos',
+                        'detalle': 'Cada serie debe tener repeticiones y peso_kg'
+                    }), 400
+
+        # Validar que existan los ejercicios base con una única consulta IN
+        ids_base = {ejercicio_data['ejercicios_base_id'] for ejercicio_data in data['ejercicios']}
+        ejercicios_base = {
+            eb.id_ejercicios_base: eb
+            for eb in EjercicioBase.query.filter(EjercicioBase.id_ejercicios_base.in_(ids_base)).all()
+        } if ids_base else {}
+
+        for ejercicio_data in data['ejercicios']:
+            if ejercicio_data['ejercicios_base_id'] not in ejercicios_base:
                 return jsonify({
                     'error': 'Ejercicio no encontrado',
                     'detalle': f'No existe un ejercicio base con ID {ejercicio_data["ejercicios_base_id"]}'
@@ -77,63 +106,46 @@ def crear_rutina_completa(token_payload):
         db.session.add(rutina)
         db.session.flush()
 
-        # Crear los ejercicios y sus series
-        ejercicios_creados = []
-        for ejercicio_data in data['ejercicios']:
-            ejercicio = Ejercicio(
-                ejercicios_base_id=ejercicio_data['ejercicios_base_id'],
-                rutinas_id=rutina.id_rutinas
-            )
-            db.session.add(ejercicio)
-            db.session.flush()
-
-            # Validar series
-            if 'series' not in ejercicio_data:
-                return jsonify({
-                    'error': 'Datos incompletos',
-                    'detalle': 'Cada ejercicio debe tener al menos una serie'
-                }), 400
+        # --- Inserción por lotes: una sentencia multi-fila con RETURNING por tabla ---
+        ids_ejercicios = insertar_con_returning(Ejercicio, Ejercicio.id_ejercicios, [
+            {'ejercicios_base_id': ejercicio_data['ejercicios_base_id'], 'rutinas_id': rutina.id_rutinas}
+            for ejercicio_data in data['ejercicios']
+        ])
 
-            series_creadas = []
-            for serie_data in ejercicio_data['series']:
-                if 'repeticiones' not in serie_data or 'peso_kg' not in serie_data:
-                    return jsonify({
-                        'error': 'Datos incompletos',
-                        'detalle': 'Cada serie debe tener repeticiones y peso_kg'
-                    }), 400
+        filas_series = [
+            {'repeticiones': serie_data['repeticiones'], 'peso_kg': serie_data['peso_kg'], 'ejercicios_id': id_ejercicio}
+            for ejercicio_data, id_ejercicio in zip(data['ejercicios'], ids_ejercicios)
+            for serie_data in ejercicio_data['series']
+        ]
+        ids_series = iter(insertar_con_returning(Serie, Serie.id_series, filas_series))
 
-                serie = Serie(
-                    repeticiones=serie_data['repeticiones'],
-                    peso_kg=serie_data['peso_kg'],
-                    ejercicios_id=ejercicio.id_ejercicios
-                )
-                db.session.add(serie)
-                db.session.flush()
-
-                series_creadas.append({
-                    'id': serie.id_series,
-                    'repeticiones': serie.repeticiones,
-                    'peso_kg': serie.peso_kg
-                })
-
-            ejercicio_base = EjercicioBase.query.get(ejercicio_data['ejercicios_base_id'])
+        # Construir la respuesta sin volver a consultar la base de datos
+        ejercicios_creados = []
+        for ejercicio_data, id_ejercicio in zip(data['ejercicios'], ids_ejercicios):
+            ejercicio_base = ejercicios_base[ejercicio_data['ejercicios_base_id']]
             ejercicios_creados.append({
-                'id': ejercicio.id_ejercicios,
+                'id': id_ejercicio,
                 'nombre': ejercicio_base.nombre,
                 'descripcion': ejercicio_base.descripcion,
-                'series': series_creadas
+                'series': [{
+                    'id': next(ids_series),
+                    'repeticiones': serie_data['repeticiones'],
+                    'peso_kg': serie_data['peso_kg']
+                } for serie_data in ejercicio_data['series']]
             })
 
+        # Se arma antes del commit para no recargar la rutina expirada
+        rutina_creada = {
+            'id': rutina.id_rutinas,
+            'nombre': rutina.nombre,
+            'descripcion': rutina.descripcion,
+            'ejercicios': ejercicios_creados
+        }
         db.session.commit()
 
         return jsonify({
             'mensaje': 'Rutina completa creada exitosamente',
-            'rutina': {
-                'id': rutina.id_rutinas,
-                'nombre': rutina.nombre,
-                'descripcion': rutina.descripcion,
-                'ejercicios': ejercicios_creados
-            }
+            'rutina': rutina_creada
         }), 201
 
     except SQLAlchemyError as e:
@@ -150,26 +162,41 @@ def crear_rutina_completa(token_payload):
         }), 500
 
 @rutinas_completas_bp.route('/rutinas/completas/<int:id>', methods=['GET'])
+@max_consultas(2)
 @required_token
 def obtener_rutina_completa(id, token_payload):
+    """
+    Devuelve la rutina completa con un ETag derivado de `Rutina.version`.
+
+    Si el cliente envía `If-None-Match`, primero se lee solo (usuarios_id, version) por
+    clave primaria: cuando el ETag coincide se responde 304 sin cargar el árbol.
+    """
     try:
-        # --- Mejora de Rendimiento: Carga Eficiente de Datos Relacionados ---
-        rutina = Rutina.query.options(
-            db.joinedload(Rutina.ejercicios).joinedload(Ejercicio.ejercicio_base),
-            db.joinedload(Rutina.ejercicios).joinedload(Ejercicio.series)
-        ).get_or_404(id)
+        if request.if_none_match:
+            estado = db.session.query(Rutina.usuarios_id, Rutina.version).filter_by(id_rutinas=id).first()
+            if estado is not None and estado.usuarios_id == token_payload.get('id_usuario') \
+                    and request.if_none_match.contains_weak(_etag_rutina(id, estado.version)):
+                respuesta = Response(status=304)
+                respuesta.set_etag(_etag_rutina(id, estado.version))
+                return respuesta
+
+        # --- Lectura "lean": Postgres arma el documento JSON completo ---
+        fila = documento_rutina(id)
+        if fila is None:
+            return jsonify({
+                'error': 'Rutina no encontrada',
+                'detalle': f'No existe una rutina con ID {id}'
+            }), 404
 
         # --- Validación de Propiedad ---
-        if rutina.usuarios_id != token_payload.get('id_usuario'):
+        if fila.usuarios_id != token_payload.get('id_usuario'):
             return jsonify({'error': 'No autorizado para ver esta rutina.'}), 403
 
-        return jsonify(_build_rutina_json(rutina))
+        respuesta = Response(fila.documento, mimetype='application/json')
+        respuesta.set_etag(_etag_rutina(id, fila.version))
+        respuesta.headers['Cache-Control'] = 'private, no-cache'
+        return respuesta
 
-    except NotFound:
-        return jsonify({
-            'error': 'Rutina no encontrada',
-            'detalle': f'No existe una rutina con ID {id}'
-        }), 404
     except SQLAlchemyError as e:
         return jsonify({
             'error': 'Error en la base de datos',
@@ -182,18 +209,31 @@ def obtener_rutina_completa(id, token_payload):
         }), 500
 
 @rutinas_completas_bp.route('/rutinas/completas', methods=['GET'])
+@max_consultas(2)
 @required_token
 def obtener_todas_rutinas_completas(token_payload):
-    """ Obtiene todas las rutinas completas del usuario autenticado. """
+    """
+    Obtiene todas las rutinas completas del usuario autenticado.
+
+    Con `?ids=1,2,3` devuelve solo esas rutinas, leídas en una sola consulta, en un objeto
+    con una entrada por id: la rutina o un marcador de no encontrada / no autorizada.
+    """
     try:
         user_id = token_payload.get('id_usuario')
-        # --- Consulta Segura y Optimizada ---
-        rutinas = Rutina.query.filter_by(usuarios_id=user_id).options(
-            db.joinedload(Rutina.ejercicios).joinedload(Ejercicio.ejercicio_base),
-            db.joinedload(Rutina.ejercicios).joinedload(Ejercicio.series)
-        ).order_by(Rutina.nombre).all()
+        if 'ids' in request.args:
+            try:
+                ids = leer_ids(request.args.get('ids'))
+            except ValueError as e:
+                return jsonify({'error': 'Parámetros inválidos', 'detalle': str(e)}), 400
+            respuesta = Response(documento_rutinas_por_ids(ids, user_id), mimetype='application/json')
+            respuesta.headers['Cache-Control'] = 'private, no-cache'
+            return respuesta
+
+        if quiere_ndjson():
+            return respuesta_ndjson(_iterar_rutinas_json(user_id))
 
-        return jsonify([_build_rutina_json(rutina) for rutina in rutinas])
+        # --- Lectura "lean": el documento se arma en la base y se devuelve sin tocarlo ---
+        return Response(documento_rutinas_usuario(user_id), mimetype='application/json')
 
     except SQLAlchemyError as e:
         return jsonify({
@@ -214,6 +254,9 @@ def obtener_rutinas_usuario(usuario_id, token_payload):
         if token_payload.get('id_usuario') != usuario_id:
             return jsonify({'error': 'No autorizado', 'detalle': 'No puedes ver rutinas de otro usuario.'}), 403
 
+        if quiere_ndjson():
+            return respuesta_ndjson(_iterar_rutinas_json(usuario_id))
+
         # --- Consulta Optimizada ---
         rutinas = Rutina.query.filter_by(usuarios_id=usuario_id).options(
             db.joinedload(Rutina.ejercicios).joinedload(Ejercicio.ejercicio_base),
@@ -228,7 +271,7 @@ def obtener_rutinas_usuario(usuario_id, token_payload):
 
         return jsonify({
             'mensaje': f'Se encontraron {len(rutinas)} rutinas para el usuario',
-            'rutinas': [_build_rutina_json(rutina) for rutina in rutinas]
+            'rutinas': [RutinaDTO.desde_modelo(rutina) for rutina in rutinas]
         })
 
     except SQLAlchemyError as e:
@@ -270,27 +313,7 @@ def obtener_entrenamientos_realizados_por_rutina(id_rutina, token_payload):
             }), 200
 
         # 3. Construir la respuesta JSON
-        resultado = []
-        for entrenamiento in entrenamientos:
-            entrenamiento_info = {
-                'id_entrenamiento': entrenamiento.id_entrenamientos,
-                'fecha': entrenamiento.fecha.isoformat(),
-                'ejercicios_realizados': []
-            }
-            for realizado in entrenamiento.realizados:
-                entrenamiento_info['ejercicios_realizados'].append({
-                    'id_entrenamiento_realizado': realizado.id_entrenamientos_realizados,
-                    'ejercicio': {
-                        'id_ejercicio': realizado.ejercicio.id_ejercicios,
-                        'nombre': realizado.ejercicio.ejercicio_base.nombre
-                    },
-                    'series_realizadas': [
-                        {'id_series_realizadas': s.id_series_realizadas, 'repeticiones': s.repeticiones, 'peso_kg': s.peso_kg} for s in realizado.series_realizadas
-                    ]
-                })
-            resultado.append(entrenamiento_info)
-
-        return jsonify(resultado)
+        return jsonify([SesionDTO.desde_modelo(entrenamiento) for entrenamiento in entrenamientos])
 
     except NotFound:
         return jsonify({'error': 'Rutina no encontrada', 'detalle': f'No existe una rutina con ID {id_rutina}'}), 404
@@ -300,6 +323,8 @@ def obtener_entrenamientos_realizados_por_rutina(id_rutina, token_payload):
 
 
 @rutinas_completas_bp.route('/rutinas/completas/<int:id>', methods=['DELETE'])
+# Token + rutina + tombstones (2) + un DELETE por tabla (7); ver servicios/borrado.py
+@max_consultas(11)
 @required_token
 def eliminar_rutina_completa(id, token_payload):
     try:
@@ -308,7 +333,7 @@ def eliminar_rutina_completa(id, token_payload):
         if rutina.usuarios_id != token_payload.get('id_usuario'):
             return jsonify({'error': 'No autorizado', 'detalle': 'No puedes eliminar rutinas de otro usuario.'}), 403
 
-        db.session.delete(rutina)
+        borrar_rutina(rutina)
         db.session.commit()
 
         return jsonify({
@@ -334,59 +359,8 @@ def eliminar_rutina_completa(id, token_payload):
             'detalle': str(e)
         }), 500
 
-# --- Funciones de Servicio para Estadísticas ---
-
-def _get_max_pesos_por_rutina(usuario_id):
-    """
-     Encuentra el peso máximo levantado para cada rutina de un usuario y el ejercicio asociado.
-
-     Usa una función de ventana de SQL (`row_number`) para rankear los levantamientos
-     por peso dentro de cada rutina y seleccionar solo el más alto (ranking 1),
-     optimizando el proceso en una única consulta.
-     """
-    subquery = db.session.query(
-        Entrenamiento.rutinas_id,
-        SerieRealizada.peso_kg,
-        EjercicioBase.nombre.label("ejercicio_nombre"),
-        func.row_number().over(
-            partition_by=Entrenamiento.rutinas_id,
-            order_by=SerieRealizada.peso_kg.desc()
-        ).label('rn')
-    ).join(EntrenamientoRealizado, SerieRealizada.entrenamientos_realizados_id == EntrenamientoRealizado.id_entrenamientos_realizados)\
-     .join(Entrenamiento, EntrenamientoRealizado.entrenamientos_id == Entrenamiento.id_entrenamientos)\
-     .join(Ejercicio, EntrenamientoRealizado.ejercicios_id == Ejercicio.id_ejercicios)\
-     .join(EjercicioBase, Ejercicio.ejercicios_base_id == EjercicioBase.id_ejercicios_base)\
-     .filter(Entrenamiento.usuarios_id == usuario_id).subquery()
-
-    return db.session.query(
-        Rutina.id_rutinas,
-        Rutina.nombre.label("rutina_nombre"),
-        subquery.c.peso_kg.label("max_peso"),
-        subquery.c.ejercicio_nombre.label("ejercicio_max_peso")
-    ).join(subquery, Rutina.id_rutinas == subquery.c.rutinas_id)\
-     .filter(subquery.c.rn == 1).all()
-
-def _get_estadistica_por_ejercicio(usuario_id):
-    """
-    Calcula estadísticas (promedio y máximo de peso) para cada ejercicio
-    realizado por un usuario, agrupado por rutina.
-    """
-    return db.session.query(
-        Entrenamiento.rutinas_id,
-        Ejercicio.id_ejercicios.label("ejercicio_id"),
-        EjercicioBase.nombre.label("ejercicio_nombre"),
-        func.avg(SerieRealizada.peso_kg).label("promedio_peso"),
-        func.max(SerieRealizada.peso_kg).label("max_peso_ejercicio")
-    ).join(EntrenamientoRealizado, Entrenamiento.id_entrenamientos == EntrenamientoRealizado.entrenamientos_id)\
-     .join(SerieRealizada, EntrenamientoRealizado.id_entrenamientos_realizados == SerieRealizada.entrenamientos_realizados_id)\
-     .join(Ejercicio, EntrenamientoRealizado.ejercicios_id == Ejercicio.id_ejercicios)\
-     .join(EjercicioBase, Ejercicio.ejercicios_base_id == EjercicioBase.id_ejercicios_base)\
-     .filter(Entrenamiento.usuarios_id == usuario_id)\
-     .group_by(Entrenamiento.rutinas_id, Ejercicio.id_ejercicios, EjercicioBase.nombre)\
-     .all()
-
-
 @rutinas_completas_bp.route('/rutinas/estadisticas', methods=['GET'])
+@max_consultas(3)
 @required_token
 def estadisticas_rutinas(token_payload):
     """
@@ -401,41 +375,17 @@ def estadisticas_rutinas(token_payload):
     try:
         # 1. Validaciones iniciales
         usuario_id = token_payload.get('id_usuario')
-        usuario = Usuario.query.get(usuario_id)
-        if not usuario:
+        # Usuario ya resuelto (y cacheado) por required_token
+        if not g.principal:
             return jsonify({'error': 'Usuario no encontrado', 'detalle': 'El usuario asociado al token no existe.'}), 404
 
-        rutinas_usuario = Rutina.query.filter_by(usuarios_id=usuario_id).all()
+        rutinas_usuario = db.session.execute(consulta_rutinas_usuario(usuario_id)).all()
         if not rutinas_usuario:
             return jsonify({'mensaje': 'No se encontraron rutinas para este usuario.'}), 200
 
-        max_pesos = _get_max_pesos_por_rutina(usuario_id)
-        stats_ejercicios = _get_estadistica_por_ejercicio(usuario_id)
-
-    # Procesamiento y combinación de resultados
-        max_map = {r.id_rutinas: r for r in max_pesos}
-        
-        # Agrupar estadísticas de ejercicios por rutina
-        ejercicios_map = {}
-        for stat in stats_ejercicios:
-            if stat.rutinas_id not in ejercicios_map:
-                ejercicios_map[stat.rutinas_id] = []
-            ejercicios_map[stat.rutinas_id].append(stat)
-
-        resultado_final = []
-        for rutina in rutinas_usuario:
-            max_info = max_map.get(rutina.id_rutinas)
-            ejercicios_info = ejercicios_map.get(rutina.id_rutinas, [])
-
-            resultado_final.append({
-                "rutina_id": rutina.id_rutinas,
-                "rutina_nombre": rutina.nombre,
-                "max_peso_levantado": float(max_info.max_peso) if max_info and max_info.max_peso is not None else 0,
-                "ejercicio_max_peso": max_info.ejercicio_max_peso if max_info else None,
-                "estadisticas_por_ejercicio": [{
-                    "ejercicio_nombre": ej.ejercicio_nombre, "promedio_peso": float(ej.promedio_peso), "max_peso": float(ej.max_peso_ejercicio)
-                } for ej in ejercicios_info]
-            })
+        # El acumulado se mantiene al registrar cada entrenamiento (servicios/estadisticas.py)
+        stats_ejercicios = db.session.execute(consulta_estadisticas_usuario(usuario_id)).all()
+        resultado_final = combinar_estadisticas(rutinas_usuario, stats_ejercicios)
 
         # Validación final y respuesta
         if not any(r['max_peso_levantado'] > 0 for r in resultado_final):
@@ -0,0 +1,41 @@
+from flask import Blueprint, Response, request, jsonify
+from sqlalchemy.exc import SQLAlchemyError
+
+from security import required_token
+from servicios.instrumentacion_sql import max_consultas
+from servicios.sincronizacion import cambios_desde, decodificar_cursor_sync
+
+sync_bp = Blueprint('sync_bp', __name__)
+
+@sync_bp.route('/sync', methods=['GET'])
+# Token + hora de la base + rutinas + sesiones (3) + ejercicios propios + eliminados
+@max_consultas(8)
+@required_token
+def sincronizar(token_payload):
+    """
+    Cambios del usuario autenticado desde el cursor `since` (ver servicios/sincronizacion.py).
+
+    Devuelve las rutinas completas, entrenamientos y ejercicios propios creados o
+    modificados, los ids eliminados y el `cursor` para el próximo sync. Sin `since` (o con
+    uno vencido) devuelve todo con `completo: true`.
+    """
+    try:
+        try:
+            desde = decodificar_cursor_sync(request.args['since']) if request.args.get('since') else None
+        except ValueError as e:
+            return jsonify({'error': 'Parámetros inválidos', 'detalle': str(e)}), 400
+
+        respuesta = Response(cambios_desde(token_payload.get('id_usuario'), desde), mimetype='application/json')
+        respuesta.headers['Cache-Control'] = 'private, no-store'
+        return respuesta
+
+    except SQLAlchemyError as e:
+        return jsonify({
+            'error': 'Error en la base de datos',
+            'detalle': str(e)
+        }), 500
+    except Exception as e:
+        return jsonify({
+            'error': 'Error inesperado',
+            'detalle': str(e)
+        }), 500
@@ -1,12 +1,14 @@
 from flask import Blueprint, request, jsonify
 from modelos.models import db, Usuario
-from google.oauth2 import id_token
-from google.auth.transport import requests
 import os
 from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from werkzeug.exceptions import NotFound
 from security import create_token, required_token, is_token_invalidated
+from servicios.exportacion import FORMATOS, respuesta_exportacion
+from servicios.google_certs import verificar_id_token
+from servicios.instrumentacion_sql import max_consultas
+from servicios.streaming import quiere_ndjson
 
 usuarios_bp = Blueprint('usuarios_bp', __name__)
 
@@ -44,6 +46,31 @@ def obtener_usuario(id, token_payload):
             'detalle': str(e)
         }), 500
 
+@usuarios_bp.route('/usuarios/<int:id>/export', methods=['GET'])
+@max_consultas(1)
+@required_token
+def exportar_historial(id, token_payload):
+    """
+    Descarga el historial completo de entrenamientos del usuario, una serie por fila.
+
+    `formato` elige `csv` (por defecto) o `ndjson`; sin el parámetro, `Accept:
+    application/x-ndjson` también elige NDJSON. La consulta se ejecuta mientras se envía
+    la respuesta (ver servicios/exportacion.py).
+    """
+    # --- Validación de Propiedad ---
+    if token_payload.get('id_usuario') != id:
+        return jsonify({'error': 'No autorizado', 'detalle': 'No puedes exportar datos de otro usuario.'}), 403
+
+    formato = request.args.get('formato') or ('ndjson' if quiere_ndjson() else 'csv')
+    if formato not in FORMATOS:
+        return jsonify({
+            'error': 'Parámetros inválidos',
+            'detalle': f'"formato" debe ser uno de: {", ".join(FORMATOS)}.'
+        }), 400
+
+    return respuesta_exportacion(id, formato)
+
+
 @usuarios_bp.route('/usuarios/google-login', methods=['POST'])
 def google_login():
     try:
@@ -58,12 +85,8 @@ def google_login():
         # Obtener el token de ID de Google del request
         token = data['token']
         
-        # Verificar el token con Google
-        idinfo = id_token.verify_oauth2_token(
-            token, 
-            requests.Request(), 
-            os.getenv('GOOGLE_CLIENT_ID')
-        )
+        # Verificar el token localmente contra los certificados de Google en cache
+        idinfo = verificar_id_token(token, os.getenv('GOOGLE_CLIENT_ID'))
 
         # Verificar que el token es válido
         if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
@@ -149,7 +172,7 @@ def logout(token_payload): # Se añade token_payload aunque no se use directamen
             return jsonify({'error': 'Token ya invalidado'}), 401
         
         # Invalidar el token usando la función de security.py
-        is_token_invalidated.invalidate(token)
+        is_token_invalidated.invalidate(token, token_payload.get('exp'))
         
         return jsonify({
             'mensaje': 'Sesión cerrada exitosamente'
@@ -1,21 +1,100 @@
 import os, pytz
 import jwt
+import threading
+import time
+from collections import OrderedDict, namedtuple
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import request, jsonify
+from flask import g, request, jsonify
+
+from modelos.models import db, Usuario
+from servicios.revocacion import crear_registro_desde_entorno
 
 
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
 tz = pytz.timezone("America/Argentina/Buenos_Aires")
 
-# Set en memoria para tokens invalidados
-_invalidated_tokens = set()
+# Usuario autenticado, resuelto una vez por token y disponible en `g.principal`
+Principal = namedtuple('Principal', ['id_usuario', 'email', 'auth_provider', 'nombre'])
+
+
+class _CachePrincipales:
+    """
+    Cache LRU acotada de tokens ya verificados -> (payload, Principal).
+
+    Cada entrada vence al `exp` del token o a los `ttl` segundos (lo que ocurra antes),
+    y se elimina explícitamente al hacer logout.
+    """
+
+    def __init__(self, max_entradas, ttl):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, token):
+        with self._lock:
+            entrada = self._entradas.get(token)
+            if entrada is None or entrada[0] <= time.time():
+                if entrada is not None:
+                    del self._entradas[token]
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(token)
+            self.aciertos += 1
+            return entrada[1], entrada[2]
+
+    def guardar(self, token, payload, principal):
+        vence = min(payload.get('exp', 0), time.time() + self.ttl)
+        with self._lock:
+            self._entradas[token] = (vence, payload, principal)
+            self._entradas.move_to_end(token)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def eliminar(self, token):
+        with self._lock:
+            self._entradas.pop(token, None)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+            }
+
+
+_cache_principales = _CachePrincipales(
+    max_entradas=int(os.getenv('PRINCIPAL_CACHE_MAX', 10000)),
+    ttl=int(os.getenv('PRINCIPAL_CACHE_TTL', 300))
+)
+
+
+def estadisticas_cache_principales():
+    """Contadores de aciertos/fallos y tamaño de la cache de principales."""
+    return _cache_principales.estadisticas()
+
+# Registro de tokens revocados compartido entre workers (ver servicios/revocacion.py). No
+# abre conexiones al importar: cada proceso abre las suyas en el primer uso
+_revocaciones = crear_registro_desde_entorno()
 
 def is_token_invalidated(token):
-    return token in _invalidated_tokens
+    return _revocaciones.esta_revocado(token)
 
-def _invalidate_token(token):
-    _invalidated_tokens.add(token)
+def _invalidate_token(token, exp=None):
+    if exp is None:
+        # Sin payload verificado, se conserva la revocación hasta el vencimiento declarado
+        try:
+            exp = jwt.decode(token, options={'verify_signature': False}).get('exp')
+        except jwt.InvalidTokenError:
+            exp = None
+        exp = exp or time.time() + 24 * 3600
+    _revocaciones.revocar(token, exp)
+    _cache_principales.eliminar(token)
 
 # Permitir llamar is_token_invalidated.invalidate(token)
 is_token_invalidated.invalidate = _invalidate_token
@@ -43,6 +122,12 @@ def verify_token(token):
     except jwt.InvalidTokenError:
         return None  # Token inválido
 
+def _resolver_principal(payload):
+    """Busca el usuario del token. Devuelve None si ya no existe."""
+    usuario = db.session.query(Usuario.id_usuarios, Usuario.email, Usuario.auth_provider, Usuario.nombre)\
+        .filter(Usuario.id_usuarios == payload.get('id_usuario')).first()
+    return Principal(*usuario) if usuario else None
+
 # Decorador para requerir token en endpoints
 
 def required_token(f):
@@ -54,9 +139,21 @@ def required_token(f):
         token = auth_header.split(' ')[1]
         if is_token_invalidated(token):
             return jsonify({'error': 'Token invalidado'}), 401
-        payload = verify_token(token)
-        if not payload:
-            return jsonify({'error': 'Token inválido o expirado'}), 401
+
+        # Un token ya verificado cuesta una búsqueda en la cache en lugar de decode + consulta
+        entrada = _cache_principales.obtener(token)
+        if entrada:
+            payload, principal = entrada
+        else:
+            payload = verify_token(token)
+            if not payload:
+                return jsonify({'error': 'Token inválido o expirado'}), 401
+            principal = _resolver_principal(payload)
+            if principal:
+                _cache_principales.guardar(token, payload, principal)
+
+        # El usuario resuelto (o None si ya no existe) queda disponible en g.principal
+        g.principal = principal
         # Puedes pasar el payload al endpoint si lo necesitas
         return f(*args, **kwargs, token_payload=payload)
-    return decorated 
\ No newline at end of file
+    return decorated
@@ -0,0 +1,49 @@
+"""
+Borrado de una rutina completa con sentencias por lotes.
+
+`db.session.delete(rutina)` recorre las cascadas del ORM: carga ejercicios, series,
+entrenamientos, ejercicios realizados y series realizadas con una consulta por colección
+y después los borra fila por fila. Acá cada nivel se borra con un único DELETE, de las
+hojas a la raíz, así que la cantidad de sentencias no depende del tamaño de la rutina.
+
+Como no pasa por el flush, registra sus propios tombstones en `eliminaciones` (la rutina
+y sus entrenamientos, igual que `_registrar_eliminaciones` en modelos/models.py) y borra
+el acumulado de `estadisticas_ejercicios` de la rutina.
+"""
+from sqlalchemy import delete, insert, or_, select
+
+from modelos.models import (db, Ejercicio, Eliminacion, Entrenamiento, EntrenamientoRealizado, EstadisticaEjercicio,
+                            Rutina, Serie, SerieRealizada)
+
+
+def borrar_rutina(rutina):
+    """Borra la rutina y todo lo que cuelga de ella en la transacción de `db.session`."""
+    id_rutina = rutina.id_rutinas
+    ejercicios = select(Ejercicio.id_ejercicios).where(Ejercicio.rutinas_id == id_rutina)
+    entrenamientos = select(Entrenamiento.id_entrenamientos).where(Entrenamiento.rutinas_id == id_rutina)
+    de_la_rutina = or_(EntrenamientoRealizado.entrenamientos_id.in_(entrenamientos),
+                       EntrenamientoRealizado.ejercicios_id.in_(ejercicios))
+
+    eliminadas = [{'usuarios_id': rutina.usuarios_id, 'tabla': Rutina.__tablename__, 'id_registro': id_rutina}]
+    eliminadas += [
+        {'usuarios_id': e.usuarios_id, 'tabla': Entrenamiento.__tablename__, 'id_registro': e.id_entrenamientos}
+        for e in db.session.execute(
+            select(Entrenamiento.usuarios_id, Entrenamiento.id_entrenamientos).where(Entrenamiento.rutinas_id == id_rutina)
+        )
+    ]
+    db.session.execute(insert(Eliminacion), eliminadas)
+
+    for sentencia in (
+        delete(SerieRealizada).where(SerieRealizada.entrenamientos_realizados_id.in_(
+            select(EntrenamientoRealizado.id_entrenamientos_realizados).where(de_la_rutina)
+        )),
+        delete(EntrenamientoRealizado).where(de_la_rutina),
+        delete(Entrenamiento).where(Entrenamiento.rutinas_id == id_rutina),
+        delete(EstadisticaEjercicio).where(EstadisticaEjercicio.rutinas_id == id_rutina),
+        delete(Serie).where(Serie.ejercicios_id.in_(ejercicios)),
+        delete(Ejercicio).where(Ejercicio.rutinas_id == id_rutina),
+        delete(Rutina).where(Rutina.id_rutinas == id_rutina),
+    ):
+        # Sin sincronizar la sesión: evita un SELECT por sentencia y nada vuelve a leerse
+        db.session.execute(sentencia, execution_options={'synchronize_session': False})
+    db.session.expunge(rutina)
@@ -0,0 +1,85 @@
+"""
+Cache en memoria (por worker) del catálogo global de ejercicios base.
+
+El catálogo casi nunca cambia, así que se guarda ya serializado junto con un ETag
+calculado sobre el contenido (igual en todos los workers). Se invalida explícitamente con
+`invalidar()` —automáticamente al confirmar una transacción que modificó un EjercicioBase
+desde el ORM— y, como red de seguridad para cambios hechos desde otros procesos, al
+vencer `CATALOGO_CACHE_TTL` segundos. El documento completo se guarda además como
+`CuerpoPrecomprimido`, así cada versión del catálogo se comprime una sola vez.
+"""
+import hashlib
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from modelos.models import db, EjercicioBase
+from servicios.compresion import CuerpoPrecomprimido
+
+
+class CatalogoBaseCache:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fragmento = None
+        self._etag = None
+        self._cuerpo = None
+        self._cargado_en = 0.0
+
+    def obtener(self):
+        """
+        Devuelve `(fragmento, etag, cuerpo)`: los elementos del catálogo como JSON sin
+        corchetes, su ETag y el documento completo como `CuerpoPrecomprimido`.
+        """
+        ttl = current_app.config.get('CATALOGO_CACHE_TTL', 300)
+        with self._lock:
+            if self._fragmento is None or time.monotonic() - self._cargado_en > ttl:
+                self._cargar()
+            return self._fragmento, self._etag, self._cuerpo
+
+    def invalidar(self):
+        with self._lock:
+            self._fragmento = None
+
+    def _cargar(self):
+        ejercicios_base = db.session.query(
+            EjercicioBase.id_ejercicios_base, EjercicioBase.nombre, EjercicioBase.descripcion, EjercicioBase.video_url
+        ).order_by(EjercicioBase.id_ejercicios_base).all()
+
+        documento = current_app.json.dumps([{
+            'id': e.id_ejercicios_base,
+            'nombre': e.nombre,
+            'descripcion': e.descripcion,
+            'video_url': e.video_url,
+        } for e in ejercicios_base])
+
+        self._fragmento = documento[1:-1]
+        self._etag = hashlib.sha1(documento.encode()).hexdigest()
+        self._cuerpo = CuerpoPrecomprimido(documento)
+        self._cargado_en = time.monotonic()
+
+
+catalogo_base = CatalogoBaseCache()
+
+
+@event.listens_for(EjercicioBase, 'after_insert')
+@event.listens_for(EjercicioBase, 'after_update')
+@event.listens_for(EjercicioBase, 'after_delete')
+def _marcar_catalogo_modificado(mapper, connection, target):
+    # El flush todavía no es visible para otras conexiones: una lectura concurrente
+    # recargaría el catálogo viejo. Se invalida recién al confirmar
+    object_session(target).info['catalogo_modificado'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_catalogo(session):
+    if session.info.pop('catalogo_modificado', False):
+        catalogo_base.invalidar()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_modificacion(session):
+    session.info.pop('catalogo_modificado', None)
@@ -0,0 +1,177 @@
+"""
+Compresión de respuestas negociada con `Accept-Encoding` (brotli o gzip).
+
+Los historiales y listados de rutinas son JSON muy repetitivo (las mismas claves y
+nombres de ejercicios) y se comprimen entre 5 y 15 veces. `comprimir_respuestas(app)`
+registra un `after_request` que comprime:
+
+- los tipos de COMPRESION_TIPOS (JSON y NDJSON por defecto);
+- a partir de COMPRESION_UMBRAL bytes: por debajo la cabecera gzip y la CPU no compensan;
+- con COMPRESION_NIVEL_GZIP / COMPRESION_NIVEL_BROTLI (niveles medios: el costo de los
+  niveles máximos no se justifica para contenido dinámico);
+- las respuestas en streaming de a trozos, vaciando el compresor cada
+  COMPRESION_BLOQUE_STREAMING bytes para que el cliente reciba líneas completas sin
+  esperar al final.
+
+Brotli solo se ofrece si el paquete `brotli` está instalado. Las respuestas comprimidas
+llevan `Vary: Accept-Encoding` y su ETag pasa a ser débil (el cuerpo ya no es idéntico
+byte a byte), de modo que los If-None-Match deben compararse con `contains_weak`.
+
+`CuerpoPrecomprimido` guarda las variantes comprimidas de un cuerpo que se sirve igual
+muchas veces (ej: el catálogo de ejercicios base) para comprimirlo una sola vez.
+"""
+import threading
+import zlib
+
+from flask import current_app, request
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TIPOS_COMPRIMIBLES = ('application/json', 'application/x-ndjson')
+
+
+def codificaciones_disponibles():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def elegir_codificacion(accept_encoding):
+    """Devuelve 'br', 'gzip' o None según el valor de `Accept-Encoding` (a igual calidad, brotli)."""
+    if not accept_encoding:
+        return None
+    return parse_accept_header(accept_encoding).best_match(codificaciones_disponibles())
+
+
+def nivel_compresion(codificacion, config):
+    if codificacion == 'br':
+        return config.get('COMPRESION_NIVEL_BROTLI', 5)
+    return config.get('COMPRESION_NIVEL_GZIP', 6)
+
+
+def comprimir(datos, codificacion, nivel):
+    if codificacion == 'br':
+        return brotli.compress(datos, quality=nivel)
+    return zlib.compress(datos, nivel, wbits=31)
+
+
+class Compresor:
+    """Compresión incremental para streaming: `comprimir` puede devolver b'' mientras acumula."""
+
+    def __init__(self, codificacion, nivel):
+        self._brotli = codificacion == 'br'
+        self._c = brotli.Compressor(quality=nivel) if self._brotli else zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def comprimir(self, datos):
+        return self._c.process(datos) if self._brotli else self._c.compress(datos)
+
+    def vaciar(self):
+        """Emite todo lo pendiente en un bloque que el cliente ya puede descomprimir."""
+        return self._c.flush() if self._brotli else self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def terminar(self):
+        return self._c.finish() if self._brotli else self._c.flush(zlib.Z_FINISH)
+
+
+def comprimir_iterable(trozos, codificacion, nivel, bloque):
+    """Comprime un iterable de bytes/str, vaciando el compresor cada `bloque` bytes de entrada."""
+    compresor = Compresor(codificacion, nivel)
+    pendiente = 0
+    try:
+        for trozo in trozos:
+            if isinstance(trozo, str):
+                trozo = trozo.encode()
+            salida = compresor.comprimir(trozo)
+            pendiente += len(trozo)
+            if pendiente >= bloque:
+                salida += compresor.vaciar()
+                pendiente = 0
+            if salida:
+                yield salida
+        yield compresor.terminar()
+    finally:
+        if hasattr(trozos, 'close'):
+            trozos.close()
+
+
+def _debilitar_etag(response):
+    etag, debil = response.get_etag()
+    if etag and not debil:
+        response.set_etag(etag, weak=True)
+
+
+def es_comprimible(mimetype, config):
+    return config.get('COMPRESION_HABILITADA', True) and mimetype in config.get('COMPRESION_TIPOS', TIPOS_COMPRIMIBLES)
+
+
+def _comprimir_respuesta(response):
+    config = current_app.config
+    if not es_comprimible(response.mimetype, config):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if response.headers.get('Content-Encoding') in codificaciones_disponibles():
+        # Cuerpo ya comprimido (CuerpoPrecomprimido): el ETag lo fija la ruta después
+        _debilitar_etag(response)
+        return response
+    if (response.status_code < 200 or response.status_code in (204, 304) or request.method == 'HEAD'
+            or 'Content-Encoding' in response.headers or response.direct_passthrough
+            or 'no-transform' in response.headers.get('Cache-Control', '')):
+        return response
+    codificacion = elegir_codificacion(request.headers.get('Accept-Encoding'))
+    if codificacion is None:
+        return response
+
+    nivel = nivel_compresion(codificacion, config)
+    if response.is_streamed:
+        response.response = comprimir_iterable(response.response, codificacion, nivel,
+                                               config.get('COMPRESION_BLOQUE_STREAMING', 8192))
+        response.headers.pop('Content-Length', None)
+    else:
+        datos = response.get_data()
+        if len(datos) < config.get('COMPRESION_UMBRAL', 1024):
+            return response
+        response.set_data(comprimir(datos, codificacion, nivel))
+    response.headers['Content-Encoding'] = codificacion
+    _debilitar_etag(response)
+    return response
+
+
+def comprimir_respuestas(app):
+    """Registra la compresión de respuestas en la app."""
+    app.after_request(_comprimir_respuesta)
+
+
+class CuerpoPrecomprimido:
+    """
+    Cuerpo que se sirve igual muchas veces, con sus variantes comprimidas calculadas una
+    sola vez (al pedirse por primera vez cada codificación).
+    """
+
+    def __init__(self, datos):
+        self.datos = datos.encode() if isinstance(datos, str) else datos
+        self._variantes = {}
+        self._lock = threading.Lock()
+
+    def variante(self, codificacion, nivel):
+        with self._lock:
+            if codificacion not in self._variantes:
+                self._variantes[codificacion] = comprimir(self.datos, codificacion, nivel)
+            return self._variantes[codificacion]
+
+    def respuesta(self, mimetype='application/json'):
+        """Respuesta con la variante que acepte el cliente (o el cuerpo sin comprimir)."""
+        config = current_app.config
+        response = current_app.response_class(self.datos, mimetype=mimetype)
+        if not es_comprimible(response.mimetype, config):
+            return response
+        response.vary.add('Accept-Encoding')
+        codificacion = elegir_codificacion(request.headers.get('Accept-Encoding'))
+        if codificacion is None or len(self.datos) < config.get('COMPRESION_UMBRAL', 1024):
+            return response
+        # Las variantes precomprimidas usan el nivel máximo: se pagan una sola vez
+        response.set_data(self.variante(codificacion, 11 if codificacion == 'br' else 9))
+        response.headers['Content-Encoding'] = codificacion
+        return response
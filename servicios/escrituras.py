@@ -0,0 +1,84 @@
+"""
+Momento de la última escritura de cada usuario, compartido entre procesos.
+
+servicios/replicas.py lo consulta para que un usuario que acaba de escribir lea de la
+base principal durante REPLICA_VENTANA_ESCRITURA_SEGUNDOS, aunque su próxima petición
+llegue a otro worker o a otro host y sin depender de que el cliente guarde cookies (las
+apps móviles con Bearer no lo hacen).
+
+El almacén se elige con REPLICA_ESCRITURAS_BACKEND, con el mismo criterio que
+servicios/idempotencia.py:
+
+- 'db': la tabla `ultimas_escrituras` de la base principal, compartida por todos los
+  hosts. Es el valor por defecto cuando la base principal es Postgres.
+- 'sqlite': un archivo local, compartido solo por los workers de un mismo host.
+
+Hay una fila por usuario que se sobrescribe en cada escritura, así que la tabla no crece
+con el tráfico y no necesita purga.
+"""
+import os
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from modelos.models import db, UltimaEscritura
+from servicios.pool import backend_compartido_por_defecto
+from servicios.sqlite_local import ConexionSQLiteLocal, ruta_sqlite
+
+
+class AlmacenEscriturasSQLite:
+    """Almacén en un archivo SQLite local, compartido por los workers de un mismo host."""
+
+    def __init__(self, ruta):
+        self._conexion = ConexionSQLiteLocal(ruta, (
+            'CREATE TABLE IF NOT EXISTS ultimas_escrituras ('
+            'usuarios_id INTEGER PRIMARY KEY, momento REAL NOT NULL)'
+        ))
+
+    def registrar(self, usuario_id, momento):
+        with self._conexion() as conexion:
+            conexion.execute(
+                'INSERT INTO ultimas_escrituras (usuarios_id, momento) VALUES (?, ?) '
+                'ON CONFLICT (usuarios_id) DO UPDATE SET momento = max(momento, excluded.momento)',
+                (usuario_id, momento)
+            )
+
+    def ultima(self, usuario_id):
+        fila = self._conexion().execute(
+            'SELECT momento FROM ultimas_escrituras WHERE usuarios_id = ?', (usuario_id,)
+        ).fetchone()
+        return fila[0] if fila else None
+
+
+class AlmacenEscriturasDB:
+    """Almacén en la tabla `ultimas_escrituras` de la base principal, compartido entre hosts."""
+
+    def registrar(self, usuario_id, momento):
+        with db.engine.begin() as conexion:
+            actualizada = conexion.execute(update(UltimaEscritura).where(
+                UltimaEscritura.usuarios_id == usuario_id, UltimaEscritura.momento < momento
+            ).values(momento=momento)).rowcount
+        if actualizada:
+            return
+        try:
+            with db.engine.begin() as conexion:
+                conexion.execute(insert(UltimaEscritura).values(usuarios_id=usuario_id, momento=momento))
+        except IntegrityError:
+            pass    # Ya había una fila con un momento igual o posterior
+
+    def ultima(self, usuario_id):
+        with db.engine.connect() as conexion:
+            return conexion.execute(
+                select(UltimaEscritura.momento).where(UltimaEscritura.usuarios_id == usuario_id)
+            ).scalar()
+
+
+def crear_almacen_desde_entorno():
+    """
+    Crea el almacén según REPLICA_ESCRITURAS_BACKEND: 'db' (tabla en la base principal; por
+    defecto con Postgres) o 'sqlite' (un archivo compartido por los workers del host en
+    REPLICA_ESCRITURAS_SQLITE_PATH).
+    """
+    if os.getenv('REPLICA_ESCRITURAS_BACKEND', backend_compartido_por_defecto(os.getenv('DATABASE_URL'))) == 'db':
+        return AlmacenEscriturasDB()
+    return AlmacenEscriturasSQLite(ruta_sqlite('REPLICA_ESCRITURAS_SQLITE_PATH', 'gymapp_escrituras.sqlite3'))
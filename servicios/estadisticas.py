@@ -0,0 +1,148 @@
+"""
+Mantenimiento de la tabla acumulada `estadisticas_ejercicios`.
+
+Cada entrenamiento registrado suma sus series al acumulado de (usuario, rutina, ejercicio)
+con un único UPSERT, de modo que /rutinas/estadisticas lee una fila por ejercicio en vez de
+recorrer todas las series históricas. `reconstruir_estadisticas` recalcula el acumulado
+desde cero (backfill o reparación) y está disponible como `flask estadisticas reconstruir`.
+"""
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from modelos.models import (db, Ejercicio, EjercicioBase, Entrenamiento, EntrenamientoRealizado, EstadisticaEjercicio,
+                            Rutina, SerieRealizada)
+
+
+def acumular_series(usuario_id, rutinas_id, series_por_ejercicio):
+    """
+    Suma al acumulado las series de un entrenamiento.
+
+    `series_por_ejercicio` mapea ejercicios_id -> lista de pesos (kg) de sus series.
+    Se ejecuta en la transacción en curso; el commit queda a cargo del llamador.
+    """
+    filas = [{
+        'usuarios_id': usuario_id,
+        'rutinas_id': rutinas_id,
+        'ejercicios_id': ejercicios_id,
+        'cantidad_series': len(pesos),
+        'suma_peso_kg': float(sum(pesos)),
+        'max_peso_kg': float(max(pesos)),
+    } for ejercicios_id, pesos in series_por_ejercicio.items() if pesos]
+    if not filas:
+        return
+
+    tabla = EstadisticaEjercicio.__table__
+    es_sqlite = db.session.get_bind().dialect.name == 'sqlite'
+    sentencia = (sqlite_insert if es_sqlite else pg_insert)(tabla).values(filas)
+    nuevo = sentencia.excluded
+    db.session.execute(sentencia.on_conflict_do_update(
+        index_elements=[tabla.c.usuarios_id, tabla.c.rutinas_id, tabla.c.ejercicios_id],
+        set_={
+            'cantidad_series': tabla.c.cantidad_series + nuevo.cantidad_series,
+            'suma_peso_kg': tabla.c.suma_peso_kg + nuevo.suma_peso_kg,
+            'max_peso_kg': case((nuevo.max_peso_kg > tabla.c.max_peso_kg, nuevo.max_peso_kg),
+                                else_=tabla.c.max_peso_kg),
+        }
+    ))
+
+
+def reconstruir_estadisticas(usuario_id=None, rutinas_id=None):
+    """
+    Recalcula el acumulado a partir de las series realizadas, opcionalmente acotado a un
+    usuario y/o rutina. Devuelve la cantidad de filas generadas.
+    """
+    borrar = delete(EstadisticaEjercicio)
+    origen = select(
+        Entrenamiento.usuarios_id,
+        Entrenamiento.rutinas_id,
+        EntrenamientoRealizado.ejercicios_id,
+        func.count(SerieRealizada.id_series_realizadas),
+        func.sum(SerieRealizada.peso_kg),
+        func.max(SerieRealizada.peso_kg),
+    ).join(EntrenamientoRealizado, Entrenamiento.id_entrenamientos == EntrenamientoRealizado.entrenamientos_id)\
+     .join(SerieRealizada, EntrenamientoRealizado.id_entrenamientos_realizados == SerieRealizada.entrenamientos_realizados_id)\
+     .group_by(Entrenamiento.usuarios_id, Entrenamiento.rutinas_id, EntrenamientoRealizado.ejercicios_id)
+
+    if usuario_id is not None:
+        borrar = borrar.where(EstadisticaEjercicio.usuarios_id == usuario_id)
+        origen = origen.where(Entrenamiento.usuarios_id == usuario_id)
+    if rutinas_id is not None:
+        borrar = borrar.where(EstadisticaEjercicio.rutinas_id == rutinas_id)
+        origen = origen.where(Entrenamiento.rutinas_id == rutinas_id)
+
+    db.session.execute(borrar)
+    resultado = db.session.execute(insert(EstadisticaEjercicio).from_select(
+        ['usuarios_id', 'rutinas_id', 'ejercicios_id', 'cantidad_series', 'suma_peso_kg', 'max_peso_kg'],
+        origen
+    ))
+    return resultado.rowcount
+
+
+def consulta_rutinas_usuario(usuario_id):
+    """Rutinas (id, nombre) del usuario sobre las que se informan estadísticas."""
+    return select(Rutina.id_rutinas, Rutina.nombre).where(Rutina.usuarios_id == usuario_id)
+
+
+def consulta_estadisticas_usuario(usuario_id):
+    """
+    Acumulado por (rutina, ejercicio) del usuario desde `estadisticas_ejercicios`.
+
+    El costo depende de la cantidad de ejercicios y no de las series históricas. Es una
+    sentencia Core, de modo que sirve tanto para la sesión sync como para la conexión async.
+    """
+    return select(
+        EstadisticaEjercicio.rutinas_id,
+        EstadisticaEjercicio.ejercicios_id.label("ejercicio_id"),
+        EjercicioBase.nombre.label("ejercicio_nombre"),
+        EstadisticaEjercicio.cantidad_series,
+        EstadisticaEjercicio.suma_peso_kg,
+        EstadisticaEjercicio.max_peso_kg
+    ).join(Ejercicio, EstadisticaEjercicio.ejercicios_id == Ejercicio.id_ejercicios)\
+     .join(EjercicioBase, Ejercicio.ejercicios_base_id == EjercicioBase.id_ejercicios_base)\
+     .where(EstadisticaEjercicio.usuarios_id == usuario_id)\
+     .order_by(EstadisticaEjercicio.rutinas_id, EstadisticaEjercicio.ejercicios_id)
+
+
+def combinar_estadisticas(rutinas, stats_ejercicios):
+    """
+    Arma, para cada rutina, el peso máximo levantado, el ejercicio donde se logró y el
+    promedio/máximo por ejercicio, a partir de las filas de `consulta_estadisticas_usuario`.
+    """
+    # Agrupar estadísticas de ejercicios por rutina
+    ejercicios_map = {}
+    for stat in stats_ejercicios:
+        ejercicios_map.setdefault(stat.rutinas_id, []).append(stat)
+
+    resultado = []
+    for rutina in rutinas:
+        ejercicios_info = ejercicios_map.get(rutina.id_rutinas, [])
+        # La serie más pesada de la rutina es el máximo entre sus ejercicios
+        max_info = max(ejercicios_info, key=lambda ej: ej.max_peso_kg, default=None)
+
+        resultado.append({
+            "rutina_id": rutina.id_rutinas,
+            "rutina_nombre": rutina.nombre,
+            "max_peso_levantado": float(max_info.max_peso_kg) if max_info else 0,
+            "ejercicio_max_peso": max_info.ejercicio_nombre if max_info else None,
+            "estadisticas_por_ejercicio": [{
+                "ejercicio_nombre": ej.ejercicio_nombre,
+                "promedio_peso": ej.suma_peso_kg / ej.cantidad_series,
+                "max_peso": float(ej.max_peso_kg)
+            } for ej in ejercicios_info]
+        })
+    return resultado
+
+
+estadisticas_cli = AppGroup('estadisticas', help='Mantenimiento de las estadísticas acumuladas.')
+
+
+@estadisticas_cli.command('reconstruir')
+@click.option('--usuario', 'usuario_id', type=int, default=None, help='Reconstruir solo este usuario.')
+def reconstruir_command(usuario_id):
+    """Recalcula la tabla estadisticas_ejercicios desde las series realizadas."""
+    filas = reconstruir_estadisticas(usuario_id)
+    db.session.commit()
+    click.echo(f'Estadísticas reconstruidas: {filas} filas.')
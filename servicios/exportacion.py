@@ -0,0 +1,85 @@
+"""
+Exportación del historial completo de un usuario (GET /usuarios/<id>/export).
+
+Cada serie realizada es una fila del join Entrenamiento -> EntrenamientoRealizado ->
+SerieRealizada -> Ejercicio -> EjercicioBase (más el nombre de la rutina). La consulta se
+recorre con un cursor del servidor (`yield_per`, que en Postgres activa `stream_results`)
+y cada lote se escribe apenas llega: la memoria del worker no depende del tamaño de la
+cuenta y el cliente empieza a recibir datos sin esperar al final.
+
+Las columnas del CSV incluyen las de servicios/importacion.py (`sesion` es el id del
+entrenamiento), de modo que un archivo exportado puede volver a importarse.
+"""
+import csv
+import io
+
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import select
+
+from modelos.models import db, Ejercicio, EjercicioBase, Entrenamiento, EntrenamientoRealizado, Rutina, SerieRealizada
+
+COLUMNAS = ('fecha', 'rutina', 'ejercicio', 'repeticiones', 'peso_kg', 'sesion',
+            'id_rutina', 'id_ejercicio', 'id_entrenamiento_realizado', 'id_serie')
+FORMATOS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+# Filas (series) leídas por lote desde el cursor del servidor
+TAMANIO_LOTE_EXPORTACION = 1000
+
+
+def _consulta_historial(usuario_id):
+    return (
+        select(Entrenamiento.fecha, Rutina.nombre.label('rutina'), EjercicioBase.nombre.label('ejercicio'),
+               SerieRealizada.repeticiones, SerieRealizada.peso_kg, Entrenamiento.id_entrenamientos.label('sesion'),
+               Rutina.id_rutinas.label('id_rutina'), Ejercicio.id_ejercicios.label('id_ejercicio'),
+               EntrenamientoRealizado.id_entrenamientos_realizados.label('id_entrenamiento_realizado'),
+               SerieRealizada.id_series_realizadas.label('id_serie'))
+        .join(Rutina, Entrenamiento.rutinas_id == Rutina.id_rutinas)
+        .join(EntrenamientoRealizado, EntrenamientoRealizado.entrenamientos_id == Entrenamiento.id_entrenamientos)
+        .join(SerieRealizada,
+              SerieRealizada.entrenamientos_realizados_id == EntrenamientoRealizado.id_entrenamientos_realizados)
+        .join(Ejercicio, EntrenamientoRealizado.ejercicios_id == Ejercicio.id_ejercicios)
+        .join(EjercicioBase, Ejercicio.ejercicios_base_id == EjercicioBase.id_ejercicios_base)
+        .where(Entrenamiento.usuarios_id == usuario_id)
+        .order_by(Entrenamiento.fecha, Entrenamiento.id_entrenamientos,
+                  EntrenamientoRealizado.id_entrenamientos_realizados, SerieRealizada.id_series_realizadas)
+        .execution_options(yield_per=TAMANIO_LOTE_EXPORTACION)
+    )
+
+
+def lotes_historial(usuario_id):
+    """Genera las filas del historial en lotes de TAMANIO_LOTE_EXPORTACION, en orden cronológico."""
+    resultado = db.session.execute(_consulta_historial(usuario_id))
+    try:
+        yield from resultado.partitions()
+    finally:
+        resultado.close()
+
+
+def _trozos_csv(lotes):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow(COLUMNAS)
+    for lote in lotes:
+        escritor.writerows((f.fecha.isoformat(), *f[1:]) for f in lote)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Un historial vacío igual devuelve el encabezado
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _trozos_ndjson(lotes):
+    dumps = current_app.json.dumps_bytes
+    for lote in lotes:
+        yield b''.join(dumps({**f._asdict(), 'fecha': f.fecha.isoformat()}) + b'\n' for f in lote)
+
+
+def respuesta_exportacion(usuario_id, formato):
+    """Respuesta en streaming con el historial del usuario en `formato` ('csv' o 'ndjson')."""
+    lotes = lotes_historial(usuario_id)
+    trozos = _trozos_csv(lotes) if formato == 'csv' else _trozos_ndjson(lotes)
+    respuesta = Response(stream_with_context(trozos), mimetype=FORMATOS[formato])
+    respuesta.headers['Content-Disposition'] = f'attachment; filename="historial-{usuario_id}.{formato}"'
+    respuesta.headers['Cache-Control'] = 'private, no-store'
+    return respuesta
@@ -0,0 +1,108 @@
+"""
+Verificación local de ID tokens de Google con certificados en cache.
+
+Los certificados públicos de Google se descargan con una `requests.Session` de módulo
+(conexiones reutilizadas) y se guardan durante el `max-age` que indica su header
+`Cache-Control`. Poco antes de vencer se renuevan en un hilo en segundo plano, así que
+ningún login espera la descarga salvo el primero (o si la renovación viene fallando).
+Si llega un token firmado con un `kid` desconocido (rotación de claves) se fuerza una
+renovación, como mucho una vez cada `INTERVALO_MIN_REFRESCO` segundos.
+
+GOOGLE_CERTS_URL permite apuntar a un servidor de certificados local en pruebas
+(ver benchmarks/servidor_certificados.py).
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+import requests
+from google.auth import jwt
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+EMISORES_GOOGLE = ('accounts.google.com', 'https://accounts.google.com')
+MAX_AGE_POR_DEFECTO = 3600
+INTERVALO_MIN_REFRESCO = 30
+
+logger = logging.getLogger(__name__)
+
+_sesion = requests.Session()
+_sesion.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=10))
+_sesion.mount('http://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=10))
+
+
+def _max_age(headers):
+    coincidencia = re.search(r'max-age=(\d+)', headers.get('Cache-Control', ''))
+    max_age = int(coincidencia.group(1)) if coincidencia else MAX_AGE_POR_DEFECTO
+    return max(0, max_age - int(headers.get('Age', 0) or 0))
+
+
+class CacheCertificados:
+
+    def __init__(self, url, sesion=_sesion, timeout=5):
+        self.url = url
+        self.sesion = sesion
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._certificados = None
+        self._vence = 0.0
+        self._renovar_desde = 0.0
+        self._ultima_descarga = 0.0
+        self._renovando = False
+
+    def _descargar(self):
+        respuesta = self.sesion.get(self.url, timeout=self.timeout)
+        respuesta.raise_for_status()
+        certificados = respuesta.json()
+        max_age = _max_age(respuesta.headers)
+        ahora = time.monotonic()
+        with self._lock:
+            self._certificados = certificados
+            self._vence = ahora + max_age
+            # Se renueva en segundo plano en el último 10% de vida (como mucho 5 minutos antes)
+            self._renovar_desde = self._vence - min(300, max_age * 0.1)
+            self._ultima_descarga = ahora
+        return certificados
+
+    def _renovar_en_segundo_plano(self):
+        try:
+            self._descargar()
+        except Exception:
+            logger.warning('No se pudieron renovar los certificados de Google', exc_info=True)
+        finally:
+            with self._lock:
+                self._renovando = False
+
+    def obtener(self, kid=None):
+        """Devuelve el dict `{kid: certificado}` vigente, descargándolo solo si hace falta."""
+        ahora = time.monotonic()
+        with self._lock:
+            certificados = self._certificados
+            vencidos = certificados is None or ahora >= self._vence
+            kid_desconocido = kid is not None and certificados is not None and kid not in certificados
+            rotacion = kid_desconocido and ahora - self._ultima_descarga >= INTERVALO_MIN_REFRESCO
+            lanzar_renovacion = not vencidos and ahora >= self._renovar_desde and not self._renovando
+            if lanzar_renovacion:
+                self._renovando = True
+
+        if vencidos or rotacion:
+            return self._descargar()
+        if lanzar_renovacion:
+            threading.Thread(target=self._renovar_en_segundo_plano, daemon=True).start()
+        return certificados
+
+
+certificados_google = CacheCertificados(os.getenv('GOOGLE_CERTS_URL', GOOGLE_CERTS_URL))
+
+
+def verificar_id_token(token, audience):
+    """
+    Verifica firma, `aud`, `exp` e `iss` de un ID token de Google contra los certificados
+    en cache. Lanza ValueError si el token no es válido.
+    """
+    kid = jwt.decode_header(token).get('kid')
+    idinfo = jwt.decode(token, certs=certificados_google.obtener(kid), audience=audience)
+    if idinfo.get('iss') not in EMISORES_GOOGLE:
+        raise ValueError('Emisor del token inválido')
+    return idinfo
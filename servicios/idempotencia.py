@@ -0,0 +1,264 @@
+"""
+Reintentos seguros con el header `Idempotency-Key` en los POST de creación.
+
+Un cliente con mala conexión puede reenviar el mismo POST varias veces. Con
+`@idempotente`, la primera petición con una clave reserva la clave en un almacén
+compartido y, al terminar, guarda su respuesta comprimida por IDEMPOTENCIA_TTL
+segundos. Las repeticiones reciben esa respuesta (con `Idempotent-Replayed: true`) sin
+volver a validar ni insertar nada:
+
+- si la original sigue en curso, esperan hasta IDEMPOTENCIA_ESPERA segundos a que
+  termine (consultando con pausas crecientes, de 50 ms a 1 s) y después responden 409;
+- si la clave se reutiliza con otro cuerpo, responden 422;
+- las respuestas 5xx y las excepciones liberan la clave para que el reintento se procese.
+
+El almacén se elige con IDEMPOTENCIA_BACKEND, como en servicios/revocacion.py:
+
+- 'db': la tabla `respuestas_idempotentes` de la base principal, compartida por todos los
+  hosts. Es el valor por defecto cuando la base principal es Postgres. Usa la sesión de
+  la petición, así que no toma conexiones del pool aparte de la que ya tiene la petición.
+- 'sqlite': un archivo local, compartido solo por los workers de un mismo host. Detrás
+  de un balanceador, un reintento que llega a otro host no ve la clave y vuelve a
+  insertar: sirve únicamente para despliegues de un solo host o desarrollo.
+
+Las claves se guardan por hash de (usuario, método, ruta, clave): la misma clave de dos
+usuarios no colisiona. Una reserva vence a los IDEMPOTENCIA_TIMEOUT_RESERVA segundos,
+por si el worker que la tomó murió sin responder.
+
+`habilitar_idempotencia(app)` crea el registro con la configuración IDEMPOTENCIA_* de la
+app (ver app/config.py).
+"""
+import hashlib
+import threading
+import time
+import zlib
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from modelos.models import db, RespuestaIdempotente
+from servicios.sqlite_local import ConexionSQLiteLocal, ruta_sqlite
+
+HEADER_CLAVE = 'Idempotency-Key'
+LONGITUD_MAXIMA_CLAVE = 255
+EXTENSION_IDEMPOTENCIA = 'idempotencia'
+
+
+class AlmacenIdempotenciaSQLite:
+    """Almacén en un archivo SQLite local, compartido por los workers de un mismo host."""
+
+    def __init__(self, ruta):
+        self._conexion = ConexionSQLiteLocal(ruta, (
+            'CREATE TABLE IF NOT EXISTS respuestas_idempotentes ('
+            'clave TEXT PRIMARY KEY, huella TEXT NOT NULL, status INTEGER, mimetype TEXT, cuerpo BLOB, '
+            'exp INTEGER NOT NULL)'
+        ))
+
+    def reservar(self, clave, huella, exp, ahora):
+        with self._conexion() as conexion:
+            conexion.execute('DELETE FROM respuestas_idempotentes WHERE clave = ? AND exp < ?', (clave, ahora))
+            cursor = conexion.execute(
+                'INSERT OR IGNORE INTO respuestas_idempotentes (clave, huella, exp) VALUES (?, ?, ?)',
+                (clave, huella, exp)
+            )
+            return cursor.rowcount == 1
+
+    def obtener(self, clave):
+        return self._conexion().execute(
+            'SELECT huella, status, mimetype, cuerpo, exp FROM respuestas_idempotentes WHERE clave = ?', (clave,)
+        ).fetchone()
+
+    def completar(self, clave, status, mimetype, cuerpo, exp):
+        with self._conexion() as conexion:
+            conexion.execute(
+                'UPDATE respuestas_idempotentes SET status = ?, mimetype = ?, cuerpo = ?, exp = ? WHERE clave = ?',
+                (status, mimetype, cuerpo, exp, clave)
+            )
+
+    def liberar(self, clave):
+        with self._conexion() as conexion:
+            conexion.execute('DELETE FROM respuestas_idempotentes WHERE clave = ?', (clave,))
+
+    def purgar(self, ahora):
+        with self._conexion() as conexion:
+            conexion.execute('DELETE FROM respuestas_idempotentes WHERE exp < ?', (ahora,))
+
+
+class AlmacenIdempotenciaDB:
+    """
+    Almacén en la tabla `respuestas_idempotentes` de la base principal, compartido entre hosts.
+
+    Trabaja en `db.session` y confirma cada paso: la reserva tiene que ser visible para los
+    reintentos antes de que corra la vista, y la conexión queda libre mientras se espera.
+    """
+
+    def reservar(self, clave, huella, exp, ahora):
+        for _ in range(2):
+            try:
+                db.session.execute(insert(RespuestaIdempotente).values(clave=clave, huella=huella, exp=exp))
+                db.session.commit()
+                return True
+            except IntegrityError:
+                db.session.rollback()
+            # Ocupada: solo se reintenta si lo que había ya venció
+            vencida = db.session.execute(delete(RespuestaIdempotente).where(
+                RespuestaIdempotente.clave == clave, RespuestaIdempotente.exp < ahora
+            )).rowcount
+            db.session.commit()
+            if not vencida:
+                return False
+        return False
+
+    def obtener(self, clave):
+        fila = db.session.execute(
+            select(RespuestaIdempotente.huella, RespuestaIdempotente.status, RespuestaIdempotente.mimetype,
+                   RespuestaIdempotente.cuerpo, RespuestaIdempotente.exp)
+            .where(RespuestaIdempotente.clave == clave)
+        ).first()
+        db.session.commit()
+        return fila
+
+    def completar(self, clave, status, mimetype, cuerpo, exp):
+        self._confirmar(update(RespuestaIdempotente).where(RespuestaIdempotente.clave == clave).values(
+            status=status, mimetype=mimetype, cuerpo=cuerpo, exp=exp
+        ))
+
+    def liberar(self, clave):
+        self._confirmar(delete(RespuestaIdempotente).where(RespuestaIdempotente.clave == clave))
+
+    def purgar(self, ahora):
+        self._confirmar(delete(RespuestaIdempotente).where(RespuestaIdempotente.exp < ahora))
+
+    @staticmethod
+    def _confirmar(sentencia):
+        # Lo que la vista dejó sin confirmar se descartaría al cerrar la petición; descartarlo
+        # antes deja la sesión usable aunque la vista haya fallado a mitad de una transacción
+        db.session.rollback()
+        db.session.execute(sentencia)
+        db.session.commit()
+
+
+class RegistroIdempotencia:
+
+    def __init__(self, almacen, ttl=86400, espera=10.0, timeout_reserva=60, intervalo_purga=3600):
+        self.almacen = almacen
+        self.ttl = ttl
+        self.espera = espera
+        self.timeout_reserva = timeout_reserva
+        self.intervalo_purga = intervalo_purga
+        self._lock = threading.Lock()
+        self._ultima_purga = time.monotonic()
+
+    @staticmethod
+    def clave(usuario_id, metodo, ruta, clave_cliente):
+        return hashlib.sha256(f'{usuario_id}:{metodo}:{ruta}:{clave_cliente}'.encode()).hexdigest()
+
+    @staticmethod
+    def huella(cuerpo):
+        return hashlib.sha256(cuerpo).hexdigest()
+
+    def ejecutar(self, clave, huella, vista):
+        """
+        Devuelve la respuesta guardada para `clave` o, si es la primera vez, la de
+        `vista()` (que se guarda). Devuelve una respuesta de error si la clave está en
+        uso con otro cuerpo o la original no terminó a tiempo.
+        """
+        self._purgar_si_corresponde()
+        limite = time.monotonic() + self.espera
+        pausa = 0.05
+        while True:
+            ahora = int(time.time())
+            if self.almacen.reservar(clave, huella, ahora + self.timeout_reserva, ahora):
+                return self._procesar(clave, vista)
+            guardada = self.almacen.obtener(clave)
+            if guardada is None or guardada[4] < ahora:
+                continue    # Liberada o vencida entre la reserva y la lectura
+            huella_guardada, status, mimetype, cuerpo, _ = guardada
+            if huella_guardada != huella:
+                return jsonify({
+                    'error': 'Clave de idempotencia reutilizada',
+                    'detalle': f'El {HEADER_CLAVE} ya se usó con un cuerpo distinto.'
+                }), 422
+            if status is not None:
+                respuesta = current_app.response_class(zlib.decompress(cuerpo), status=status, mimetype=mimetype)
+                respuesta.headers['Idempotent-Replayed'] = 'true'
+                return respuesta
+            if time.monotonic() >= limite:
+                respuesta = jsonify({
+                    'error': 'Petición en curso',
+                    'detalle': f'Otra petición con el mismo {HEADER_CLAVE} todavía se está procesando.'
+                })
+                respuesta.status_code = 409
+                respuesta.headers['Retry-After'] = '1'
+                return respuesta
+            time.sleep(max(0.0, min(pausa, limite - time.monotonic())))
+            pausa = min(pausa * 2, 1.0)
+
+    def _procesar(self, clave, vista):
+        try:
+            respuesta = current_app.make_response(vista())
+        except BaseException:
+            self.almacen.liberar(clave)
+            raise
+        if respuesta.status_code >= 500 or respuesta.is_streamed:
+            self.almacen.liberar(clave)
+        else:
+            self.almacen.completar(clave, respuesta.status_code, respuesta.mimetype,
+                                   zlib.compress(respuesta.get_data()), int(time.time()) + self.ttl)
+        return respuesta
+
+    def _purgar_si_corresponde(self):
+        ahora = time.monotonic()
+        if ahora - self._ultima_purga < self.intervalo_purga:
+            return
+        with self._lock:
+            if ahora - self._ultima_purga < self.intervalo_purga:
+                return
+            self._ultima_purga = ahora
+        self.almacen.purgar(int(time.time()))
+
+
+def habilitar_idempotencia(app):
+    """
+    Registra en `app` el registro de Idempotency-Key según IDEMPOTENCIA_BACKEND: 'db'
+    (tabla en la base principal) o 'sqlite' (un archivo compartido por los workers del
+    host en IDEMPOTENCIA_SQLITE_PATH).
+    """
+    config = app.config
+    if config.get('IDEMPOTENCIA_BACKEND', 'sqlite') == 'db':
+        almacen = AlmacenIdempotenciaDB()
+    else:
+        almacen = AlmacenIdempotenciaSQLite(config.get('IDEMPOTENCIA_SQLITE_PATH') or
+                                            ruta_sqlite('IDEMPOTENCIA_SQLITE_PATH', 'gymapp_idempotencia.sqlite3'))
+    app.extensions[EXTENSION_IDEMPOTENCIA] = RegistroIdempotencia(
+        almacen,
+        ttl=config.get('IDEMPOTENCIA_TTL', 86400),
+        espera=config.get('IDEMPOTENCIA_ESPERA', 10.0),
+        timeout_reserva=config.get('IDEMPOTENCIA_TIMEOUT_RESERVA', 60),
+        intervalo_purga=config.get('IDEMPOTENCIA_INTERVALO_PURGA', 3600)
+    )
+
+
+def idempotente(f):
+    """
+    Hace idempotente un endpoint de creación cuando el cliente envía `Idempotency-Key`.
+    Va debajo de `@required_token`: las claves son por usuario.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        clave_cliente = request.headers.get(HEADER_CLAVE)
+        if clave_cliente is None:
+            return f(*args, **kwargs)
+        if not clave_cliente or len(clave_cliente) > LONGITUD_MAXIMA_CLAVE:
+            return jsonify({
+                'error': 'Parámetros inválidos',
+                'detalle': f'{HEADER_CLAVE} debe tener entre 1 y {LONGITUD_MAXIMA_CLAVE} caracteres.'
+            }), 400
+
+        registro = current_app.extensions[EXTENSION_IDEMPOTENCIA]
+        usuario_id = kwargs['token_payload'].get('id_usuario')
+        clave = registro.clave(usuario_id, request.method, request.path, clave_cliente)
+        return registro.ejecutar(clave, registro.huella(request.get_data()), lambda: f(*args, **kwargs))
+    return decorated
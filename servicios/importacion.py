@@ -0,0 +1,293 @@
+"""
+Importación masiva de historial de entrenamientos (POST /entrenamientos_realizados/importar).
+
+El archivo (CSV con encabezado o NDJSON) trae una serie realizada por fila:
+
+    fecha,rutina,ejercicio,repeticiones,peso_kg,sesion
+    2024-03-01,Fuerza A,Sentadilla,5,100,
+    2024-03-01,Fuerza A,Sentadilla,5,102.5,
+
+`rutina` es el id o el nombre de una rutina del usuario y `ejercicio` el nombre de un
+ejercicio de esa rutina (sin distinguir mayúsculas). Las filas con igual (fecha, rutina,
+sesion) forman un entrenamiento y, dentro de él, las de un mismo ejercicio un ejercicio
+realizado. `sesion` es opcional: sirve para separar dos entrenamientos del mismo día.
+
+Los nombres se resuelven al empezar, con una consulta por tabla para todo el archivo
+(las rutinas del usuario y sus ejercicios). El cuerpo se lee como stream y se procesa por
+lotes de IMPORTACION_LOTE filas; las filas válidas de cada lote se cargan:
+
+- en Postgres, con COPY a una tabla temporal de staging; al terminar, tres INSERT ...
+  SELECT crean entrenamientos, ejercicios realizados y series tomando los ids de sus
+  secuencias, sin ida y vuelta por fila ni por lote;
+- en los demás motores (SQLite), con inserciones por lote (`insertar_con_returning`).
+
+Todo ocurre en una transacción: las filas con errores se informan y se saltean, y el
+resto se confirma al final junto con el acumulado de estadísticas de las rutinas tocadas.
+"""
+import csv
+import io
+import math
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import insert, select, text
+
+from modelos.models import (db, Ejercicio, EjercicioBase, EjercicioUsuario, Entrenamiento, EntrenamientoRealizado,
+                            Rutina, SerieRealizada)
+from servicios.estadisticas import reconstruir_estadisticas
+from servicios.insercion import insertar_con_returning
+
+COLUMNAS = ('fecha', 'rutina', 'ejercicio', 'repeticiones', 'peso_kg')
+FORMATOS = ('text/csv', 'application/x-ndjson')
+
+
+class ErrorFila(ValueError):
+    pass
+
+
+# --- Lectura del archivo ---
+
+def leer_csv(stream):
+    """
+    Genera (número de línea, fila) desde un CSV con encabezado. Lanza ValueError antes
+    de generar nada si faltan columnas en el encabezado.
+    """
+    lector = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    faltantes = [c for c in COLUMNAS if c not in (lector.fieldnames or [])]
+    if faltantes:
+        raise ValueError(f'Faltan columnas en el encabezado: {", ".join(faltantes)}')
+
+    def filas():
+        for fila in lector:
+            yield lector.line_num, fila
+    return filas()
+
+
+def leer_ndjson(stream):
+    """Genera (número de línea, fila) desde un NDJSON; las líneas inválidas llegan como ErrorFila."""
+    for numero, linea in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), start=1):
+        if not linea.strip():
+            continue
+        try:
+            fila = current_app.json.loads(linea)
+        except ValueError:
+            fila = ErrorFila('La línea no es JSON válido')
+        if not isinstance(fila, (dict, ErrorFila)):
+            fila = ErrorFila('Cada línea debe ser un objeto JSON')
+        yield numero, fila
+
+
+def _normalizar(nombre):
+    return ' '.join(str(nombre).split()).casefold()
+
+
+def _validar(fila):
+    """Devuelve (fecha, referencia de rutina, nombre de ejercicio, repeticiones, peso, sesion)."""
+    if isinstance(fila, ErrorFila):
+        raise fila
+    faltantes = [c for c in COLUMNAS if fila.get(c) in (None, '')]
+    if faltantes:
+        raise ErrorFila(f'Faltan campos: {", ".join(faltantes)}')
+    try:
+        fecha = date.fromisoformat(str(fila['fecha'])[:10])
+    except ValueError:
+        raise ErrorFila('La fecha debe tener formato YYYY-MM-DD') from None
+    repeticiones, peso_kg = fila['repeticiones'], fila['peso_kg']
+    try:
+        # En NDJSON `true` o 5.5 no son repeticiones válidas (int() las aceptaría como 1 y 5)
+        if isinstance(repeticiones, bool) or isinstance(peso_kg, bool) or (
+                isinstance(repeticiones, float) and not repeticiones.is_integer()):
+            raise ValueError
+        repeticiones = int(repeticiones)
+        peso_kg = float(peso_kg)
+        if not math.isfinite(peso_kg):
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ErrorFila('repeticiones debe ser entero y peso_kg numérico') from None
+    if repeticiones < 1 or peso_kg < 0:
+        raise ErrorFila('repeticiones debe ser positivo y peso_kg no negativo')
+    rutina = fila['rutina']
+    rutina = int(rutina) if isinstance(rutina, int) or str(rutina).isdigit() else _normalizar(rutina)
+    return fecha, rutina, _normalizar(fila['ejercicio']), repeticiones, peso_kg, str(fila.get('sesion') or '')
+
+
+# --- Carga ---
+
+class _CargaPorLotes:
+    """Carga compatible con cualquier motor: INSERT multi-fila por lote."""
+
+    def __init__(self):
+        self.entrenamientos = {}    # (fecha, rutinas_id, sesion) -> id_entrenamientos
+        self.realizados = {}        # (fecha, rutinas_id, sesion, ejercicios_id) -> id_entrenamientos_realizados
+
+    def agregar(self, usuario_id, filas):
+        sesiones = list(dict.fromkeys(f[1:4] for f in filas if f[1:4] not in self.entrenamientos))
+        ids = insertar_con_returning(Entrenamiento, Entrenamiento.id_entrenamientos, [
+            {'fecha': fecha, 'usuarios_id': usuario_id, 'rutinas_id': rutinas_id} for fecha, rutinas_id, _ in sesiones
+        ])
+        self.entrenamientos.update(zip(sesiones, ids))
+
+        realizados = list(dict.fromkeys(f[1:5] for f in filas if f[1:5] not in self.realizados))
+        ids = insertar_con_returning(EntrenamientoRealizado, EntrenamientoRealizado.id_entrenamientos_realizados, [
+            {'entrenamientos_id': self.entrenamientos[clave[:3]], 'ejercicios_id': clave[3]} for clave in realizados
+        ])
+        self.realizados.update(zip(realizados, ids))
+
+        db.session.execute(insert(SerieRealizada), [
+            {'entrenamientos_realizados_id': self.realizados[f[1:5]], 'repeticiones': f[5], 'peso_kg': f[6]}
+            for f in filas
+        ])
+
+    def terminar(self, usuario_id):
+        return len(self.entrenamientos), len(self.realizados)
+
+
+class _CargaCopy:
+    """Carga en Postgres: COPY a staging por lote y un INSERT ... SELECT por tabla al final."""
+
+    def __init__(self):
+        db.session.execute(text("""
+            CREATE TEMP TABLE importacion_series (
+                fila integer, fecha date, rutinas_id integer, sesion text, ejercicios_id integer,
+                repeticiones integer, peso_kg double precision
+            ) ON COMMIT DROP
+        """))
+
+    def agregar(self, usuario_id, filas):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(filas)
+        buffer.seek(0)
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert('COPY importacion_series FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (sesion))', buffer)
+        finally:
+            cursor.close()
+
+    def terminar(self, usuario_id):
+        # Los ids salen de las secuencias de cada tabla, asignados en el orden del archivo
+        db.session.execute(text("""
+            CREATE TEMP TABLE importacion_sesiones ON COMMIT DROP AS
+            SELECT nextval(pg_get_serial_sequence('entrenamientos', 'id_entrenamientos')) AS id, t.*
+            FROM (
+                SELECT fecha, rutinas_id, sesion FROM importacion_series
+                GROUP BY fecha, rutinas_id, sesion ORDER BY min(fila)
+            ) t
+        """))
+        sesiones = db.session.execute(text("""
+            INSERT INTO entrenamientos (id_entrenamientos, fecha, usuarios_id, rutinas_id)
+            SELECT id, fecha, :usuario_id, rutinas_id FROM importacion_sesiones
+        """), {'usuario_id': usuario_id}).rowcount
+
+        db.session.execute(text("""
+            CREATE TEMP TABLE importacion_realizados ON COMMIT DROP AS
+            SELECT nextval(pg_get_serial_sequence('entrenamientos_realizados', 'id_entrenamientos_realizados')) AS id,
+                   t.*
+            FROM (
+                SELECT s.id AS entrenamientos_id, i.fecha, i.rutinas_id, i.sesion, i.ejercicios_id
+                FROM importacion_series i
+                JOIN importacion_sesiones s USING (fecha, rutinas_id, sesion)
+                GROUP BY s.id, i.fecha, i.rutinas_id, i.sesion, i.ejercicios_id ORDER BY min(i.fila)
+            ) t
+        """))
+        realizados = db.session.execute(text("""
+            INSERT INTO entrenamientos_realizados (id_entrenamientos_realizados, entrenamientos_id, ejercicios_id)
+            SELECT id, entrenamientos_id, ejercicios_id FROM importacion_realizados
+        """)).rowcount
+
+        db.session.execute(text("""
+            INSERT INTO series_realizadas (entrenamientos_realizados_id, repeticiones, peso_kg)
+            SELECT r.id, i.repeticiones, i.peso_kg
+            FROM importacion_series i
+            JOIN importacion_realizados r USING (fecha, rutinas_id, sesion, ejercicios_id)
+            ORDER BY i.fila
+        """))
+        return sesiones, realizados
+
+
+# --- Importación ---
+
+class Importador:
+    """
+    Procesa las filas de un archivo por lotes dentro de la transacción de la sesión.
+    `procesar` genera los eventos (errores por fila y progreso) a medida que avanza.
+    """
+
+    def __init__(self, usuario_id, lote=5000, max_errores=1000):
+        self.usuario_id = usuario_id
+        self.lote = lote
+        self.max_errores = max_errores
+        self.filas = self.series = self.errores = 0
+        self.rutinas_usadas = set()
+        self._carga = _CargaCopy() if db.session.get_bind().dialect.name == 'postgresql' else _CargaPorLotes()
+
+        # --- Resolución de nombres: una consulta por tabla para todo el archivo ---
+        self.rutinas = {}           # id o nombre normalizado -> id_rutinas (solo rutinas del usuario)
+        for fila in db.session.execute(select(Rutina.id_rutinas, Rutina.nombre).where(Rutina.usuarios_id == usuario_id)):
+            self.rutinas[fila.id_rutinas] = self.rutinas[_normalizar(fila.nombre)] = fila.id_rutinas
+        self.ejercicios = {}        # (rutinas_id, nombre normalizado) -> id_ejercicios
+        filas = db.session.execute(
+            select(Ejercicio.id_ejercicios, Ejercicio.rutinas_id, EjercicioBase.nombre)
+            .join(EjercicioBase, Ejercicio.ejercicios_base_id == EjercicioBase.id_ejercicios_base)
+            .join(Rutina, Ejercicio.rutinas_id == Rutina.id_rutinas)
+            .where(Rutina.usuarios_id == usuario_id).order_by(Ejercicio.id_ejercicios.desc())
+        )
+        # Si la rutina repite un ejercicio base se usa el de menor id
+        for fila in filas:
+            self.ejercicios[(fila.rutinas_id, _normalizar(fila.nombre))] = fila.id_ejercicios
+        self._propios = {_normalizar(n) for n in db.session.scalars(
+            select(EjercicioUsuario.nombre).where(EjercicioUsuario.usuarios_id == usuario_id)
+        )}
+
+    def _fila_de_carga(self, numero, valores):
+        fecha, referencia, ejercicio, repeticiones, peso_kg, sesion = valores
+        rutinas_id = self.rutinas.get(referencia)
+        if rutinas_id is None:
+            raise ErrorFila(f'No existe una rutina "{referencia}" del usuario')
+        ejercicios_id = self.ejercicios.get((rutinas_id, ejercicio))
+        if ejercicios_id is None:
+            if ejercicio in self._propios:
+                # Los ejercicios realizados solo pueden apuntar a ejercicios de una rutina
+                raise ErrorFila(f'"{ejercicio}" es un ejercicio propio y no forma parte de la rutina {rutinas_id}')
+            raise ErrorFila(f'El ejercicio "{ejercicio}" no forma parte de la rutina {rutinas_id}')
+        self.rutinas_usadas.add(rutinas_id)
+        return numero, fecha, rutinas_id, sesion, ejercicios_id, repeticiones, peso_kg
+
+    def _error(self, numero, error):
+        self.errores += 1
+        if self.errores <= self.max_errores:
+            return {'tipo': 'error', 'fila': numero, 'detalle': str(error)}
+
+    def _procesar_lote(self, lote):
+        carga = []
+        for numero, fila in lote:
+            try:
+                carga.append(self._fila_de_carga(numero, _validar(fila)))
+            except ErrorFila as e:
+                yield self._error(numero, e)
+        if carga:
+            self._carga.agregar(self.usuario_id, carga)
+        self.series += len(carga)
+
+    def procesar(self, filas):
+        lote = []
+        for numero, fila in filas:
+            self.filas += 1
+            lote.append((numero, fila))
+            if len(lote) >= self.lote:
+                yield from filter(None, self._procesar_lote(lote))
+                yield self.progreso()
+                lote = []
+        if lote:
+            yield from filter(None, self._procesar_lote(lote))
+            yield self.progreso()
+
+    def progreso(self):
+        return {'tipo': 'progreso', 'filas': self.filas, 'series': self.series, 'errores': self.errores}
+
+    def terminar(self):
+        """Crea las filas definitivas (si hace falta), actualiza las estadísticas y devuelve el resumen."""
+        entrenamientos, realizados = self._carga.terminar(self.usuario_id) if self.series else (0, 0)
+        for rutinas_id in self.rutinas_usadas:
+            reconstruir_estadisticas(self.usuario_id, rutinas_id)
+        return {'tipo': 'resumen', 'filas': self.filas, 'series': self.series, 'errores': self.errores,
+                'entrenamientos': entrenamientos, 'ejercicios_realizados': realizados}
@@ -0,0 +1,22 @@
+from sqlalchemy import insert
+
+from modelos.models import db
+
+
+def insertar_con_returning(modelo, columna_id, filas):
+    """
+    Inserta todas las filas en una única sentencia INSERT multi-fila y devuelve
+    los IDs generados en el mismo orden que `filas`.
+    """
+    if not filas:
+        return []
+
+    if db.session.get_bind().dialect.name == 'sqlite':
+        # SQLite no ofrece un "sentinel" para ordenar el RETURNING, pero asigna los
+        # rowid de forma creciente en el orden del VALUES: basta con ordenarlos.
+        return sorted(db.session.scalars(insert(modelo).returning(columna_id), filas).all())
+
+    return db.session.scalars(
+        insert(modelo).returning(columna_id, sort_by_parameter_order=True),
+        filas
+    ).all()
@@ -0,0 +1,121 @@
+"""
+Contabilidad de SQL por petición.
+
+Engancha `before/after_cursor_execute` de todos los engines y acumula, en `g`, la
+cantidad de sentencias y el tiempo en la base de la petición en curso. Al responder:
+
+- agrega los headers `X-DB-Queries` y `X-DB-Time-ms` (si SQL_HEADERS está activo);
+- registra un warning cuando una misma sentencia se repite SQL_UMBRAL_REPETICIONES veces
+  o más en la petición (patrón N+1 probable, típicamente una relación lazy en un bucle);
+- en modo testing (o con SQL_VERIFICAR_MAX_CONSULTAS), falla con AssertionError si el
+  endpoint supera el presupuesto declarado con `@max_consultas(n)`.
+
+Las respuestas en streaming solo cuentan lo ejecutado antes de empezar a enviar, y los
+handlers async de app/asgi.py (sin contexto de petición de Flask) no se cuentan.
+`contar_consultas` sirve para acotar consultas fuera de una petición (scripts, pruebas).
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Contadores activos de `contar_consultas` (además del de la petición en curso)
+_contadores_activos = []
+
+
+class ContadorSQL:
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+        self.sentencias = Counter()
+
+    def registrar(self, sentencia, segundos):
+        self.consultas += 1
+        self.tiempo += segundos
+        self.sentencias[sentencia] += 1
+
+    def repetidas(self, umbral):
+        return [(sentencia, veces) for sentencia, veces in self.sentencias.most_common() if veces >= umbral]
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_inicios_sql', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get('_inicios_sql')
+    if not inicios:
+        return
+    segundos = time.perf_counter() - inicios.pop()
+    if has_request_context() and 'contador_sql' in g:
+        g.contador_sql.registrar(statement, segundos)
+    for contador in _contadores_activos:
+        contador.registrar(statement, segundos)
+
+
+def max_consultas(limite):
+    """Declara el máximo de sentencias SQL que puede ejecutar el endpoint."""
+    def decorador(f):
+        f.max_consultas = limite
+        return f
+    return decorador
+
+
+@contextmanager
+def contar_consultas(maximo=None):
+    """
+    Cuenta las sentencias ejecutadas dentro del bloque. Si se indica `maximo`, lanza
+    AssertionError al salir cuando se supera.
+    """
+    contador = ContadorSQL()
+    _contadores_activos.append(contador)
+    try:
+        yield contador
+    finally:
+        _contadores_activos.remove(contador)
+    if maximo is not None and contador.consultas > maximo:
+        raise AssertionError(
+            f'Se ejecutaron {contador.consultas} consultas (máximo {maximo}): {list(contador.sentencias)}'
+        )
+
+
+def _iniciar_contador():
+    g.contador_sql = ContadorSQL()
+
+
+def _informar(response):
+    contador = g.pop('contador_sql', None)
+    if contador is None:
+        return response
+    config = current_app.config
+
+    if config.get('SQL_HEADERS', True):
+        response.headers['X-DB-Queries'] = str(contador.consultas)
+        response.headers['X-DB-Time-ms'] = f'{contador.tiempo * 1000:.2f}'
+
+    for sentencia, veces in contador.repetidas(config.get('SQL_UMBRAL_REPETICIONES', 3)):
+        current_app.logger.warning(
+            'Posible N+1 en %s %s: la misma sentencia se ejecutó %d veces: %s',
+            request.method, request.path, veces, ' '.join(sentencia.split())[:300]
+        )
+
+    vista = current_app.view_functions.get(request.endpoint)
+    limite = getattr(vista, 'max_consultas', None)
+    verificar = current_app.testing or config.get('SQL_VERIFICAR_MAX_CONSULTAS', False)
+    if verificar and limite is not None and contador.consultas > limite:
+        raise AssertionError(
+            f'{request.endpoint} ejecutó {contador.consultas} consultas (máximo {limite})'
+        )
+    return response
+
+
+def instrumentar_sql(app):
+    """Registra la contabilidad de SQL por petición en la app."""
+    app.before_request(_iniciar_contador)
+    app.after_request(_informar)
@@ -0,0 +1,176 @@
+"""
+Capa de acceso a datos async para las lecturas pesadas (ver app/asgi.py).
+
+Usa los engines asyncpg de `Config.crear_engine_async` (el de la base principal y, si
+hay DATABASE_REPLICA_URL, el de la réplica) y reutiliza las mismas sentencias que las
+rutas sync: los documentos JSON "lean" de servicios/rutinas_json.py, la paginación por
+keyset de /entrenamientos_realizados y el acumulado de servicios/estadisticas.py.
+Ninguna función hidrata instancias del ORM: todas trabajan con filas Core sobre una
+`AsyncConnection` que recibe el llamador.
+"""
+import os
+
+from sqlalchemy import select, tuple_
+
+from app.config import Config
+from modelos.dtos import EjercicioRealizadoDTO, EjercicioResumenDTO, SerieDTO
+from modelos.models import Ejercicio, EjercicioBase, Entrenamiento, EntrenamientoRealizado, SerieRealizada, Usuario
+from servicios.estadisticas import consulta_estadisticas_usuario, consulta_rutinas_usuario
+from servicios.paginacion import codificar_cursor
+from servicios.pool import opciones_pool_async
+from servicios.rutinas_json import (armar_documento_por_ids, sql_documentos_usuario, sql_rutinas_por_ids,
+                                    sql_rutinas_usuario)
+from servicios.streaming import TAMANIO_LOTE
+
+# 'principal' y 'replica' -> engine async del proceso, creado en el primer uso
+_engines = {}
+
+
+def obtener_engine(replica=False):
+    """Engine async de la base principal o, con `replica=True`, el de DATABASE_REPLICA_URL."""
+    clave = 'replica' if replica else 'principal'
+    if clave not in _engines:
+        db_url = os.getenv('DATABASE_REPLICA_URL' if replica else 'DATABASE_URL')
+        _engines[clave] = Config.crear_engine_async(db_url, pool_pre_ping=True, **opciones_pool_async(db_url))
+    return _engines[clave]
+
+
+async def cerrar_engine():
+    while _engines:
+        _, engine = _engines.popitem()
+        await engine.dispose()
+
+
+async def buscar_usuario(conexion, id_usuario):
+    """Devuelve (id_usuarios, email, auth_provider, nombre) del usuario, o None."""
+    resultado = await conexion.execute(
+        select(Usuario.id_usuarios, Usuario.email, Usuario.auth_provider, Usuario.nombre)
+        .where(Usuario.id_usuarios == id_usuario)
+    )
+    return resultado.first()
+
+
+# --- Rutinas completas ---
+
+async def documento_rutinas_usuario(conexion, usuario_id):
+    """Arreglo JSON (texto) con todas las rutinas del usuario, armado en la base."""
+    sentencia = sql_rutinas_usuario(conexion.dialect.name)
+    return (await conexion.execute(sentencia, {'usuario_id': usuario_id})).scalar()
+
+
+async def iterar_documentos_rutinas(conexion, usuario_id):
+    """Genera el documento JSON (texto) de cada rutina del usuario leyendo con un cursor del servidor."""
+    sentencia = sql_documentos_usuario(conexion.dialect.name)
+    resultado = await conexion.stream(sentencia, {'usuario_id': usuario_id})
+    async for fila in resultado:
+        yield fila.documento
+
+
+async def documento_rutinas_por_ids(conexion, ids, usuario_id):
+    """Objeto JSON (texto) con las rutinas pedidas por id, como `rutinas_json.documento_rutinas_por_ids`."""
+    sentencia = sql_rutinas_por_ids(conexion.dialect.name)
+    filas = (await conexion.execute(sentencia, {'ids': ids, 'usuario_id': usuario_id})).all()
+    return armar_documento_por_ids(ids, usuario_id, filas)
+
+
+# --- Entrenamientos realizados ---
+
+def _consulta_entrenamientos(usuario_id, desde=None, hasta=None, cursor=None):
+    consulta = select(Entrenamiento.id_entrenamientos, Entrenamiento.fecha)\
+        .where(Entrenamiento.usuarios_id == usuario_id)
+    if desde:
+        consulta = consulta.where(Entrenamiento.fecha >= desde)
+    if hasta:
+        consulta = consulta.where(Entrenamiento.fecha <= hasta)
+    if cursor:
+        consulta = consulta.where(tuple_(Entrenamiento.fecha, Entrenamiento.id_entrenamientos) < cursor)
+    return consulta.order_by(Entrenamiento.fecha.desc(), Entrenamiento.id_entrenamientos.desc())
+
+
+async def _realizados_de(conexion, entrenamientos):
+    """
+    Aplana los entrenamientos en ejercicios realizados con la misma forma que
+    `_iterar_realizados` de la ruta sync, con una consulta IN por nivel.
+    """
+    if not entrenamientos:
+        return []
+    realizados = (await conexion.execute(
+        select(
+            EntrenamientoRealizado.id_entrenamientos_realizados,
+            EntrenamientoRealizado.entrenamientos_id,
+            Ejercicio.id_ejercicios,
+            EjercicioBase.nombre
+        ).join(Ejercicio, EntrenamientoRealizado.ejercicios_id == Ejercicio.id_ejercicios)
+         .join(EjercicioBase, Ejercicio.ejercicios_base_id == EjercicioBase.id_ejercicios_base)
+         .where(EntrenamientoRealizado.entrenamientos_id.in_([e.id_entrenamientos for e in entrenamientos]))
+         .order_by(EntrenamientoRealizado.id_entrenamientos_realizados)
+    )).all()
+
+    series_por_realizado = {r.id_entrenamientos_realizados: [] for r in realizados}
+    if realizados:
+        series = await conexion.execute(
+            select(
+                SerieRealizada.id_series_realizadas,
+                SerieRealizada.entrenamientos_realizados_id,
+                SerieRealizada.repeticiones,
+                SerieRealizada.peso_kg
+            ).where(SerieRealizada.entrenamientos_realizados_id.in_(list(series_por_realizado)))
+             .order_by(SerieRealizada.id_series_realizadas)
+        )
+        for s in series:
+            series_por_realizado[s.entrenamientos_realizados_id].append(
+                SerieDTO(s.id_series_realizadas, s.repeticiones, s.peso_kg)
+            )
+
+    realizados_por_entrenamiento = {}
+    for r in realizados:
+        realizados_por_entrenamiento.setdefault(r.entrenamientos_id, []).append(r)
+
+    resultado = []
+    for entrenamiento in entrenamientos:
+        for r in realizados_por_entrenamiento.get(entrenamiento.id_entrenamientos, []):
+            resultado.append(EjercicioRealizadoDTO(
+                r.id_entrenamientos_realizados,
+                r.entrenamientos_id,
+                entrenamiento.fecha.isoformat(),
+                EjercicioResumenDTO(r.id_ejercicios, r.nombre),
+                series_por_realizado[r.id_entrenamientos_realizados]
+            ))
+    return resultado
+
+
+async def pagina_realizados(conexion, usuario_id, limite, desde=None, hasta=None, cursor=None):
+    """Una página por keyset: devuelve (ejercicios realizados, next_cursor)."""
+    entrenamientos = (await conexion.execute(
+        _consulta_entrenamientos(usuario_id, desde, hasta, cursor).limit(limite + 1)
+    )).all()
+
+    next_cursor = None
+    if len(entrenamientos) > limite:
+        entrenamientos = entrenamientos[:limite]
+        ultimo = entrenamientos[-1]
+        next_cursor = codificar_cursor(ultimo.fecha, ultimo.id_entrenamientos)
+    return await _realizados_de(conexion, entrenamientos), next_cursor
+
+
+async def iterar_realizados(conexion, usuario_id, desde=None, hasta=None, cursor=None):
+    """Genera todos los ejercicios realizados del usuario, leyendo de a TAMANIO_LOTE entrenamientos."""
+    while True:
+        entrenamientos = (await conexion.execute(
+            _consulta_entrenamientos(usuario_id, desde, hasta, cursor).limit(TAMANIO_LOTE)
+        )).all()
+        for realizado in await _realizados_de(conexion, entrenamientos):
+            yield realizado
+        if len(entrenamientos) < TAMANIO_LOTE:
+            return
+        cursor = (entrenamientos[-1].fecha, entrenamientos[-1].id_entrenamientos)
+
+
+# --- Estadísticas ---
+
+async def estadisticas_usuario(conexion, usuario_id):
+    """Devuelve (rutinas, filas del acumulado) del usuario para `combinar_estadisticas`."""
+    rutinas = (await conexion.execute(consulta_rutinas_usuario(usuario_id))).all()
+    if not rutinas:
+        return rutinas, []
+    return rutinas, (await conexion.execute(consulta_estadisticas_usuario(usuario_id))).all()
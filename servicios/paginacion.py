@@ -0,0 +1,44 @@
+import base64
+import json
+from datetime import date
+
+LIMITE_POR_DEFECTO = 20
+LIMITE_MAXIMO = 100
+
+
+def codificar_cursor(fecha, id_entrenamiento):
+    """Codifica la posición (fecha, id) del último elemento de una página como cursor opaco."""
+    crudo = json.dumps([fecha.isoformat(), id_entrenamiento], separators=(',', ':'))
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Devuelve la tupla (fecha, id) de un cursor. Lanza ValueError si es inválido."""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, id_entrenamiento = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if not isinstance(id_entrenamiento, int):
+            raise ValueError
+        return date.fromisoformat(fecha), id_entrenamiento
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise ValueError('Cursor inválido') from None
+
+
+def leer_limite(valor):
+    """Valida el parámetro `limit` y lo acota a LIMITE_MAXIMO. Lanza ValueError si es inválido."""
+    if valor is None:
+        return LIMITE_POR_DEFECTO
+    try:
+        limite = int(valor)
+    except ValueError:
+        limite = 0
+    if limite < 1:
+        raise ValueError('El límite debe ser un entero positivo')
+    return min(limite, LIMITE_MAXIMO)
+
+
+def leer_fecha(valor):
+    """Convierte un parámetro YYYY-MM-DD opcional en `date`. Lanza ValueError si es inválido."""
+    if valor is None:
+        return None
+    return date.fromisoformat(valor)
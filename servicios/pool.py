@@ -0,0 +1,215 @@
+"""
+Dimensionamiento e instrumentación del pool de conexiones.
+
+Cada worker tiene su propio pool, así que el total de conexiones contra Postgres es
+aproximadamente `WEB_CONCURRENCY x (pool_size + max_overflow)`. Las opciones se toman de
+las variables DB_* o, si no se indican, se derivan del modelo de workers:
+
+- WSGI (gunicorn): `opciones_pool` da una conexión por hilo (WEB_THREADS).
+- ASGI (app/asgi.py, que fija WEB_SERVIDOR=asgi): las rutas delegadas a Flask corren en
+  el executor del event loop (ASGI_HILOS_PUENTE hilos, por defecto el tamaño estándar
+  de `asyncio.to_thread`: min(32, CPUs + 4)) y el pool sync tiene una conexión por hilo.
+  El engine asyncpg usa `opciones_pool_async`: ASGI_CONCURRENCIA conexiones (las
+  peticiones async consultando a la vez) más overflow, o DB_ASYNC_POOL_SIZE /
+  DB_ASYNC_MAX_OVERFLOW.
+
+Si se define DB_MAX_CONEXIONES (el límite del plan administrado) cada pool se acota a su
+parte del presupuesto por worker (en ASGI, la mitad para cada engine) y el resto queda
+como overflow. `pool_timeout` admite fracciones de segundo. Las opciones de tamaño solo
+se pasan cuando la URL usa un QueuePool: SQLite en memoria usa StaticPool (lo fija
+Flask-SQLAlchemy), que no las acepta.
+
+`instrumentar_pool` mide el pool que tenga el engine, sea cual sea su clase: cuenta con
+eventos del pool los checkouts, conexiones nuevas, overflow e invalidaciones, y mide
+cuánto espera cada checkout (y los timeouts) envolviendo la obtención de conexiones del
+pool. Los contadores son por proceso y se exponen en /metricas/pool.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+def es_asgi():
+    return os.getenv('WEB_SERVIDOR', 'wsgi') == 'asgi'
+
+
+def hilos_puente_asgi():
+    """Hilos del executor donde app/asgi.py corre las peticiones delegadas a Flask."""
+    return max(1, int(os.getenv('ASGI_HILOS_PUENTE', min(32, (os.cpu_count() or 1) + 4))))
+
+
+def _presupuestos_por_worker():
+    """(sync, async) conexiones por worker según DB_MAX_CONEXIONES, o (None, None)."""
+    if not os.getenv('DB_MAX_CONEXIONES'):
+        return None, None
+    workers = max(1, int(os.getenv('WEB_CONCURRENCY', 1)))
+    por_worker = max(1, int(os.getenv('DB_MAX_CONEXIONES')) // workers)
+    if not es_asgi():
+        return por_worker, None
+    para_async = max(1, por_worker // 2)
+    return max(1, por_worker - para_async), para_async
+
+
+def usa_queue_pool(db_url):
+    """Indica si el engine de `db_url` usa un QueuePool (el único que acepta las opciones de tamaño)."""
+    url = make_url(db_url)
+    return issubclass(url.get_dialect().get_pool_class(url), QueuePool)
+
+
+def backend_compartido_por_defecto(db_url):
+    """
+    Almacén por defecto de los registros compartidos entre workers (idempotencia, últimas
+    escrituras): 'db' si la base principal es Postgres (despliegue que puede tener varios
+    hosts); si no, 'sqlite'.
+    """
+    return 'db' if make_url(db_url).get_backend_name().startswith('postgres') else 'sqlite'
+
+
+def _opciones(db_url, prefijo, pool_size, max_overflow, presupuesto):
+    # Reciclar antes de que el proveedor corte conexiones ociosas
+    opciones = {'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800))}
+    if not usa_queue_pool(db_url):
+        return opciones
+    if presupuesto is not None:
+        pool_size = min(pool_size, presupuesto)
+        max_overflow = presupuesto - pool_size
+    return {
+        **opciones,
+        'pool_size': int(os.getenv(f'{prefijo}_POOL_SIZE', pool_size)),
+        'max_overflow': int(os.getenv(f'{prefijo}_MAX_OVERFLOW', max_overflow)),
+        # Mejor fallar rápido que encolar peticiones 30s esperando una conexión
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+    }
+
+
+def opciones_pool(db_url):
+    """Opciones de pool del engine sync de `db_url`, leídas del entorno y repartidas por worker."""
+    hilos = hilos_puente_asgi() if es_asgi() else max(1, int(os.getenv('WEB_THREADS', 1)))
+    return _opciones(db_url, 'DB', hilos, 2, _presupuestos_por_worker()[0])
+
+
+def opciones_pool_async(db_url):
+    """Opciones de pool del engine asyncpg de app/asgi.py para `db_url`."""
+    concurrencia = max(1, int(os.getenv('ASGI_CONCURRENCIA', 10)))
+    return _opciones(db_url, 'DB_ASYNC', concurrencia, concurrencia, _presupuestos_por_worker()[1])
+
+
+class MetricasPool:
+
+    def __init__(self, muestras=1000):
+        self._lock = threading.Lock()
+        self._esperas = deque(maxlen=muestras)
+        self.checkouts = 0
+        self.checkouts_en_overflow = 0
+        self.conexiones_nuevas = 0
+        self.invalidaciones = 0
+        self.timeouts = 0
+        self.esperas = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.pico_en_uso = 0
+
+    def registrar_espera(self, segundos):
+        with self._lock:
+            self._esperas.append(segundos)
+            self.esperas += 1
+            self.espera_total += segundos
+            self.espera_maxima = max(self.espera_maxima, segundos)
+
+    def registrar_checkout(self, pool):
+        # Solo QueuePool lleva la cuenta de conexiones en uso
+        en_uso = pool.checkedout() if isinstance(pool, QueuePool) else 0
+        with self._lock:
+            self.checkouts += 1
+            if en_uso > getattr(pool, 'size', lambda: en_uso)():
+                self.checkouts_en_overflow += 1
+            self.pico_en_uso = max(self.pico_en_uso, en_uso)
+
+    def incrementar(self, contador):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def instantanea(self):
+        with self._lock:
+            esperas = sorted(self._esperas)
+            return {
+                'checkouts': self.checkouts,
+                'checkouts_en_overflow': self.checkouts_en_overflow,
+                'conexiones_nuevas': self.conexiones_nuevas,
+                'invalidaciones': self.invalidaciones,
+                'timeouts': self.timeouts,
+                'pico_en_uso': self.pico_en_uso,
+                'espera_ms': {
+                    'promedio': round(self.espera_total / self.esperas * 1000, 3) if self.esperas else 0,
+                    'p95': round(esperas[int(len(esperas) * 0.95)] * 1000, 3) if esperas else 0,
+                    'maxima': round(self.espera_maxima * 1000, 3),
+                    'muestras': len(esperas),
+                },
+            }
+
+
+metricas_pool = MetricasPool()
+
+
+def _al_checkout(conexion_dbapi, registro, proxy):
+    metricas_pool.registrar_checkout(proxy._pool)
+
+
+def _al_conectar(conexion_dbapi, registro):
+    metricas_pool.incrementar('conexiones_nuevas')
+
+
+def _al_invalidar(conexion_dbapi, registro, excepcion):
+    metricas_pool.incrementar('invalidaciones')
+
+
+def _medir_esperas(pool):
+    # No hay un evento previo al checkout: se envuelve la obtención de la conexión del
+    # pool concreto, que incluye la espera en la cola y, si hace falta, abrir una nueva
+    obtener = pool._do_get
+
+    def _do_get():
+        inicio = time.perf_counter()
+        try:
+            return obtener()
+        except PoolTimeoutError:
+            metricas_pool.incrementar('timeouts')
+            raise
+        finally:
+            metricas_pool.registrar_espera(time.perf_counter() - inicio)
+
+    pool._do_get = _do_get
+
+
+def instrumentar_pool(engine):
+    """Registra las métricas de /metricas/pool sobre el pool del engine."""
+    event.listen(engine.pool, 'checkout', _al_checkout)
+    event.listen(engine.pool, 'connect', _al_conectar)
+    event.listen(engine.pool, 'invalidate', _al_invalidar)
+    _medir_esperas(engine.pool)
+    # `engine.dispose()` reemplaza el pool por uno nuevo que hereda los eventos, pero no
+    # el envoltorio
+    event.listen(engine, 'engine_disposed', lambda e: _medir_esperas(e.pool))
+
+
+def estado_pool(pool):
+    """Ocupación actual del pool y su configuración (el detalle, solo para QueuePool)."""
+    if not isinstance(pool, QueuePool):
+        return {'clase': type(pool).__name__, 'pool_recycle': pool._recycle}
+    return {
+        'clase': type(pool).__name__,
+        'pool_size': pool.size(),
+        'max_overflow': pool._max_overflow,
+        'pool_timeout': pool.timeout(),
+        'pool_recycle': pool._recycle,
+        'en_uso': pool.checkedout(),
+        'disponibles': pool.checkedin(),
+        # QueuePool cuenta el overflow desde -pool_size; solo interesan las conexiones extra
+        'overflow': max(0, pool.overflow()),
+    }
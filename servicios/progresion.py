@@ -0,0 +1,78 @@
+"""
+Serie temporal de progresión de fuerza por ejercicio.
+
+Se agrega por sesión en SQL (serie más pesada, 1RM estimado y volumen) sobre la misma
+cadena Entrenamiento -> EntrenamientoRealizado -> SerieRealizada que usan las
+estadísticas, y si la historia supera `max_puntos` se reduce con LTTB
+(Largest-Triangle-Three-Buckets), que conserva la forma visual de la curva.
+"""
+from sqlalchemy import func, select
+
+from modelos.models import db, Entrenamiento, EntrenamientoRealizado, SerieRealizada
+
+MAX_PUNTOS_POR_DEFECTO = 200
+MAX_PUNTOS_LIMITE = 2000
+
+
+def consulta_progresion(usuario_id, ejercicios_id):
+    """Sentencia Core con el agregado por sesión del ejercicio, en orden cronológico."""
+    return select(
+        Entrenamiento.id_entrenamientos,
+        Entrenamiento.fecha,
+        func.max(SerieRealizada.peso_kg).label('top_set'),
+        func.max(SerieRealizada.peso_kg * (1 + SerieRealizada.repeticiones / 30.0)).label('e1rm'),
+        func.sum(SerieRealizada.peso_kg * SerieRealizada.repeticiones).label('volumen')
+    ).join(EntrenamientoRealizado, Entrenamiento.id_entrenamientos == EntrenamientoRealizado.entrenamientos_id)\
+     .join(SerieRealizada, EntrenamientoRealizado.id_entrenamientos_realizados == SerieRealizada.entrenamientos_realizados_id)\
+     .where(Entrenamiento.usuarios_id == usuario_id, EntrenamientoRealizado.ejercicios_id == ejercicios_id)\
+     .group_by(Entrenamiento.id_entrenamientos, Entrenamiento.fecha)\
+     .order_by(Entrenamiento.fecha, Entrenamiento.id_entrenamientos)
+
+
+def progresion_por_sesion(usuario_id, ejercicios_id):
+    """Devuelve, por sesión y en orden cronológico, la serie más pesada, el 1RM estimado (Epley) y el volumen."""
+    filas = db.session.execute(consulta_progresion(usuario_id, ejercicios_id)).all()
+
+    return [{
+        'fecha': fila.fecha.isoformat(),
+        'entrenamientos_id': fila.id_entrenamientos,
+        'top_set_kg': float(fila.top_set),
+        'e1rm_kg': round(float(fila.e1rm), 2),
+        'volumen_kg': float(fila.volumen),
+        '_x': fila.fecha.toordinal(),
+    } for fila in filas]
+
+
+def lttb(puntos, max_puntos, y):
+    """
+    Reduce `puntos` (ordenados por `_x`) a `max_puntos` con Largest-Triangle-Three-Buckets.
+
+    Se conservan el primer y el último punto; de cada bucket intermedio se elige el punto
+    que forma el triángulo de mayor área con el elegido anterior y el promedio del
+    bucket siguiente. `y` es la clave del valor a preservar.
+    """
+    n = len(puntos)
+    if max_puntos >= n or max_puntos < 3:
+        return list(puntos)
+
+    elegidos = [puntos[0]]
+    ancho = (n - 2) / (max_puntos - 2)
+    a = 0
+    for i in range(max_puntos - 2):
+        inicio, fin = int(i * ancho) + 1, int((i + 1) * ancho) + 1
+        sig_inicio, sig_fin = fin, min(int((i + 2) * ancho) + 1, n)
+        siguiente = puntos[sig_inicio:sig_fin] or [puntos[-1]]
+        prom_x = sum(p['_x'] for p in siguiente) / len(siguiente)
+        prom_y = sum(p[y] for p in siguiente) / len(siguiente)
+
+        ax, ay = puntos[a]['_x'], puntos[a][y]
+        mejor, mejor_area = inicio, -1.0
+        for j in range(inicio, fin):
+            area = abs((ax - prom_x) * (puntos[j][y] - ay) - (ax - puntos[j]['_x']) * (prom_y - ay))
+            if area > mejor_area:
+                mejor, mejor_area = j, area
+        elegidos.append(puntos[mejor])
+        a = mejor
+
+    elegidos.append(puntos[-1])
+    return elegidos
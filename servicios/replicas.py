@@ -0,0 +1,194 @@
+"""
+Lecturas en una réplica de la base (DATABASE_REPLICA_URL).
+
+Si hay réplica configurada queda como el bind `replica` de Flask-SQLAlchemy y
+`SesionRuteada` (la clase de `db.session`) decide el engine de cada sentencia:
+
+- las peticiones GET/HEAD leen de la réplica;
+- los flush del ORM, los INSERT/UPDATE/DELETE y los SELECT ... FOR UPDATE van siempre a
+  la principal, y desde la primera escritura el resto de la petición también;
+- fuera de una petición (CLI, scripts) todo va a la principal.
+
+La decisión se toma una vez por petición, así todas sus consultas ven la misma base. Se
+lee de la principal cuando:
+
+- el retraso de la réplica supera REPLICA_RETRASO_MAXIMO_SEGUNDOS. Cada proceso lo
+  consulta cada REPLICA_INTERVALO_VERIFICACION segundos; si la réplica no responde se
+  considera infinito;
+- el usuario del token escribió hace menos de REPLICA_VENTANA_ESCRITURA_SEGUNDOS (por
+  defecto, el retraso máximo). Cada POST/PUT/PATCH/DELETE exitoso registra su momento
+  por usuario en el almacén de servicios/escrituras.py, compartido entre workers y
+  hosts, y las lecturas siguientes de ese usuario ven sus propios cambios desde
+  cualquier cliente. La cookie `ultima_escritura` queda como pista adicional: un
+  navegador que la envía va a la principal sin consultar el almacén.
+
+Con token, la decisión espera a saber quién es el usuario: la búsqueda del usuario de
+@required_token (si no está en la cache de principales) va a la principal. Con
+REPLICA_ESCRITURAS_BACKEND=db, cada lectura autenticada suma una consulta por clave
+primaria a la principal y cada escritura exitosa una más; sin réplica no hay ninguna.
+`usa_replica` aplica la misma decisión fuera de una petición (app/asgi.py).
+
+Para probarlo alcanza con dos bases locales (por ejemplo dos archivos SQLite o dos bases
+del mismo Postgres): sin replicación entre ellas, lo escrito en la principal solo se ve
+en las lecturas dentro de la ventana de escritura. El margen de GET /sync
+(SYNC_MARGEN_SEGUNDOS) debe ser mayor que el retraso máximo.
+"""
+import math
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+
+BIND_REPLICA = 'replica'
+COOKIE_ESCRITURA = 'ultima_escritura'
+EXTENSION_ESCRITURAS = 'ultimas_escrituras'
+METODOS_LECTURA = ('GET', 'HEAD')
+
+# 0 si la réplica no está en recuperación o ya aplicó todo lo recibido; si no, la
+# antigüedad de la última transacción aplicada
+_SQL_RETRASO_POSTGRES = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class MonitorRetraso:
+    """Retraso de la réplica en segundos, consultado como máximo una vez por intervalo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._retraso = 0.0
+        self._ultima_verificacion = None
+
+    def retraso(self, engine, intervalo):
+        ahora = time.monotonic()
+        if self._ultima_verificacion is not None and ahora - self._ultima_verificacion < intervalo:
+            return self._retraso
+        with self._lock:
+            if self._ultima_verificacion is None or ahora - self._ultima_verificacion >= intervalo:
+                self._retraso = self._medir(engine)
+                self._ultima_verificacion = ahora
+            return self._retraso
+
+    @staticmethod
+    def _medir(engine):
+        if engine.dialect.name != 'postgresql':
+            return 0.0
+        try:
+            with engine.connect() as conexion:
+                return float(conexion.execute(_SQL_RETRASO_POSTGRES).scalar())
+        except Exception as e:
+            current_app.logger.warning('No se pudo consultar el retraso de la réplica: %s', e)
+            return math.inf
+
+
+monitor_retraso = MonitorRetraso()
+
+
+def _ventana_escritura(config):
+    return config.get('REPLICA_VENTANA_ESCRITURA_SEGUNDOS', config.get('REPLICA_RETRASO_MAXIMO_SEGUNDOS', 5))
+
+
+def _cookie_reciente(cookie, ventana):
+    try:
+        ultima = float(cookie or '')
+    except ValueError:
+        return False
+    return 0 <= time.time() - ultima < ventana
+
+
+def usa_replica(engines, usuario_id, cookie=None):
+    """
+    Indica si las lecturas de `usuario_id` (None si es anónimo) pueden ir a la réplica: si
+    está al día y el usuario no escribió dentro de la ventana, según el almacén o la cookie
+    `ultima_escritura` (`cookie`, su valor). Requiere contexto de la app.
+    """
+    if BIND_REPLICA not in engines:
+        return False
+    config = current_app.config
+    if _cookie_reciente(cookie, _ventana_escritura(config)):
+        return False
+    retraso_maximo = config.get('REPLICA_RETRASO_MAXIMO_SEGUNDOS', 5)
+    if monitor_retraso.retraso(engines[BIND_REPLICA], config.get('REPLICA_INTERVALO_VERIFICACION', 5)) > retraso_maximo:
+        return False
+    if usuario_id is None:
+        return True
+    try:
+        ultima = current_app.extensions[EXTENSION_ESCRITURAS].ultima(usuario_id)
+    except Exception as e:
+        # Sin saber cuándo escribió, lo seguro es leer de la principal
+        current_app.logger.warning('No se pudo consultar la última escritura: %s', e)
+        return False
+    # Sin el 0 <= de la cookie: un reloj adelantado en otro host cuenta como escritura reciente
+    return ultima is None or time.time() - ultima >= _ventana_escritura(config)
+
+
+def leer_de_replica(engines):
+    """Indica si las lecturas de la petición en curso van a la réplica (se decide una vez)."""
+    if BIND_REPLICA not in engines or not has_request_context() or request.method not in METODOS_LECTURA:
+        return False
+    if 'leer_de_replica' not in g:
+        if 'principal' not in g and 'Authorization' in request.headers:
+            # @required_token todavía no resolvió el usuario: esta consulta va a la principal
+            return False
+        principal = g.get('principal')
+        g.leer_de_replica = usa_replica(engines, principal.id_usuario if principal else None,
+                                        request.cookies.get(COOKIE_ESCRITURA))
+    return g.leer_de_replica
+
+
+def _es_escritura(clause):
+    return getattr(clause, 'is_dml', False) or getattr(clause, '_for_update_arg', None) is not None
+
+
+class SesionRuteada(Session):
+    """Sesión de Flask-SQLAlchemy que envía las lecturas de GET/HEAD a la réplica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self.info.get('escribio'):
+            if self._flushing or _es_escritura(clause):
+                self.info['escribio'] = True
+            elif leer_de_replica(self._db.engines):
+                return self._db.engines[BIND_REPLICA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _marcar_escritura(response):
+    if request.method in METODOS_LECTURA or response.status_code >= 400:
+        return response
+    config = current_app.config
+    if BIND_REPLICA in config.get('SQLALCHEMY_BINDS', {}):
+        ahora = time.time()
+        principal = g.get('principal')
+        if principal:
+            try:
+                current_app.extensions[EXTENSION_ESCRITURAS].registrar(principal.id_usuario, ahora)
+            except Exception as e:
+                # La escritura ya se confirmó: sin el registro, la cookie sigue sirviendo de pista
+                current_app.logger.warning('No se pudo registrar la última escritura: %s', e)
+        response.set_cookie(COOKIE_ESCRITURA, f'{ahora:.3f}', max_age=math.ceil(_ventana_escritura(config)),
+                            secure=True, httponly=True, samesite='Lax')
+    return response
+
+
+def _informar_origen(response):
+    if current_app.config.get('SQL_HEADERS', True) and 'leer_de_replica' in g:
+        response.headers['X-DB-Lectura'] = 'replica' if g.leer_de_replica else 'principal'
+    return response
+
+
+def rutear_lecturas(app):
+    """
+    Registra el almacén de últimas escrituras (si hay réplica), la marca de escritura de
+    cada petición y el header de origen de las lecturas.
+    """
+    if BIND_REPLICA in app.config.get('SQLALCHEMY_BINDS', {}):
+        # Import diferido: servicios/escrituras.py usa los modelos, que importan este módulo
+        from servicios.escrituras import crear_almacen_desde_entorno
+        app.extensions[EXTENSION_ESCRITURAS] = crear_almacen_desde_entorno()
+    app.after_request(_marcar_escritura)
+    app.after_request(_informar_origen)
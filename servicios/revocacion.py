@@ -0,0 +1,186 @@
+"""
+Registro de tokens revocados compartido entre procesos.
+
+Los tokens se guardan por hash SHA-256 junto con su `exp` en un almacén compartido por
+todos los workers (un archivo SQLite local o una tabla de la base principal) y se purgan
+solos cuando vencen. Delante del almacén, cada proceso mantiene un filtro de Bloom con
+todas las claves revocadas: la verificación habitual ("no está revocado") se resuelve en
+memoria y solo los positivos del filtro consultan el almacén.
+
+El filtro se sincroniza con el almacén cada `intervalo_sync` segundos leyendo únicamente
+las revocaciones nuevas, de modo que un logout hecho en otro worker se ve en este con un
+retraso máximo de ese intervalo. Tras cada purga el filtro se reconstruye desde cero.
+
+Las revocaciones se leen por id, pero en Postgres dos logouts concurrentes pueden
+confirmarse fuera de orden: el 11 puede ser visible antes que el 10. Los ids salteados
+al avanzar quedan como huecos y se vuelven a pedir en cada sincronización hasta que
+aparecen o pasan `espera_huecos` segundos (los de transacciones que hicieron rollback no
+aparecen nunca).
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from modelos.models import db, TokenRevocado
+from servicios.sqlite_local import ConexionSQLiteLocal, ruta_sqlite
+
+
+class FiltroBloom:
+
+    def __init__(self, capacidad, tasa_error):
+        self.bits = max(8, int(-capacidad * math.log(tasa_error) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacidad * math.log(2)))
+        self._arreglo = bytearray((self.bits + 7) // 8)
+
+    def _posiciones(self, clave):
+        digest = hashlib.blake2b(clave.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def agregar(self, clave):
+        for posicion in self._posiciones(clave):
+            self._arreglo[posicion >> 3] |= 1 << (posicion & 7)
+
+    def __contains__(self, clave):
+        return all(self._arreglo[posicion >> 3] & (1 << (posicion & 7)) for posicion in self._posiciones(clave))
+
+
+class AlmacenRevocacionSQLite:
+    """Almacén en un archivo SQLite local, compartido por los workers de un mismo host."""
+
+    def __init__(self, ruta):
+        self._conexion = ConexionSQLiteLocal(ruta, (
+            'CREATE TABLE IF NOT EXISTS tokens_revocados ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, clave TEXT NOT NULL UNIQUE, exp INTEGER NOT NULL)'
+        ))
+
+    def revocar(self, clave, exp):
+        with self._conexion() as conexion:
+            conexion.execute('INSERT OR IGNORE INTO tokens_revocados (clave, exp) VALUES (?, ?)', (clave, exp))
+
+    def esta_revocado(self, clave):
+        fila = self._conexion().execute('SELECT 1 FROM tokens_revocados WHERE clave = ?', (clave,)).fetchone()
+        return fila is not None
+
+    def novedades(self, desde_id, huecos=()):
+        huecos = list(huecos)
+        marcas = ', '.join('?' * len(huecos))
+        condicion = f'id > ? OR id IN ({marcas})' if huecos else 'id > ?'
+        return self._conexion().execute(
+            f'SELECT id, clave FROM tokens_revocados WHERE {condicion} ORDER BY id', (desde_id, *huecos)
+        ).fetchall()
+
+    def purgar(self, ahora):
+        with self._conexion() as conexion:
+            conexion.execute('DELETE FROM tokens_revocados WHERE exp < ?', (ahora,))
+
+
+class AlmacenRevocacionDB:
+    """Almacén en la tabla `tokens_revocados` de la base principal, compartido entre hosts."""
+
+    def revocar(self, clave, exp):
+        try:
+            with db.engine.begin() as conexion:
+                conexion.execute(insert(TokenRevocado).values(clave=clave, exp=exp))
+        except IntegrityError:
+            pass    # Ya estaba revocado (por ejemplo, dos logouts concurrentes del mismo token)
+
+    def esta_revocado(self, clave):
+        with db.engine.connect() as conexion:
+            return conexion.execute(select(TokenRevocado.id).where(TokenRevocado.clave == clave)).first() is not None
+
+    def novedades(self, desde_id, huecos=()):
+        condicion = TokenRevocado.id > desde_id
+        if huecos:
+            condicion = or_(condicion, TokenRevocado.id.in_(list(huecos)))
+        with db.engine.connect() as conexion:
+            return conexion.execute(
+                select(TokenRevocado.id, TokenRevocado.clave).where(condicion).order_by(TokenRevocado.id)
+            ).all()
+
+    def purgar(self, ahora):
+        with db.engine.begin() as conexion:
+            conexion.execute(delete(TokenRevocado).where(TokenRevocado.exp < ahora))
+
+
+class RegistroRevocaciones:
+
+    def __init__(self, almacen, capacidad=100000, tasa_error=0.001, intervalo_sync=1.0, intervalo_purga=3600,
+                 espera_huecos=60):
+        self.almacen = almacen
+        self.capacidad = capacidad
+        self.tasa_error = tasa_error
+        self.intervalo_sync = intervalo_sync
+        self.intervalo_purga = intervalo_purga
+        self.espera_huecos = espera_huecos
+        self._lock = threading.Lock()
+        self._filtro = FiltroBloom(capacidad, tasa_error)
+        self._ultimo_id = 0
+        self._huecos = {}   # id salteado -> momento (monotonic) en que se detectó
+        self._ultima_sync = 0.0
+        self._ultima_purga = time.monotonic()
+
+    @staticmethod
+    def clave(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def revocar(self, token, exp):
+        clave = self.clave(token)
+        self.almacen.revocar(clave, int(exp))
+        with self._lock:
+            self._filtro.agregar(clave)
+
+    def esta_revocado(self, token):
+        self._sincronizar()
+        clave = self.clave(token)
+        if clave not in self._filtro:
+            return False
+        # Positivo del filtro (revocado o falso positivo): se confirma en el almacén
+        return self.almacen.esta_revocado(clave)
+
+    def _sincronizar(self):
+        ahora = time.monotonic()
+        if ahora - self._ultima_sync < self.intervalo_sync:
+            return
+        with self._lock:
+            if ahora - self._ultima_sync < self.intervalo_sync:
+                return
+            if ahora - self._ultima_purga >= self.intervalo_purga:
+                # Un filtro de Bloom no admite borrados: tras purgar se reconstruye
+                self.almacen.purgar(int(time.time()))
+                self._filtro = FiltroBloom(self.capacidad, self.tasa_error)
+                self._ultimo_id = 0
+                self._huecos = {}
+                self._ultima_purga = ahora
+            for id_revocacion, clave in self.almacen.novedades(self._ultimo_id, self._huecos):
+                self._filtro.agregar(clave)
+                if self._huecos.pop(id_revocacion, None) is None and id_revocacion > self._ultimo_id:
+                    # En la primera lectura (o tras una purga) los ids anteriores ya no existen
+                    for salteado in range(self._ultimo_id + 1 if self._ultimo_id else id_revocacion, id_revocacion):
+                        self._huecos[salteado] = ahora
+                    self._ultimo_id = id_revocacion
+            self._huecos = {i: desde for i, desde in self._huecos.items() if ahora - desde < self.espera_huecos}
+            self._ultima_sync = ahora
+
+
+def crear_registro_desde_entorno():
+    """
+    Crea el registro según REVOCACION_BACKEND: 'sqlite' (por defecto, un archivo compartido
+    por los workers del host en REVOCACION_SQLITE_PATH) o 'db' (tabla en la base principal).
+    """
+    if os.getenv('REVOCACION_BACKEND', 'sqlite') == 'db':
+        almacen = AlmacenRevocacionDB()
+    else:
+        almacen = AlmacenRevocacionSQLite(ruta_sqlite('REVOCACION_SQLITE_PATH', 'gymapp_revocaciones.sqlite3'))
+    return RegistroRevocaciones(
+        almacen,
+        capacidad=int(os.getenv('REVOCACION_BLOOM_CAPACIDAD', 100000)),
+        intervalo_sync=float(os.getenv('REVOCACION_INTERVALO_SYNC', 1.0)),
+        intervalo_purga=int(os.getenv('REVOCACION_INTERVALO_PURGA', 3600)),
+        espera_huecos=int(os.getenv('REVOCACION_ESPERA_HUECOS', 60))
+    )
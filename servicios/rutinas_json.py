@@ -0,0 +1,271 @@
+"""
+Motor de lectura "lean" de rutinas completas.
+
+La base de datos arma el documento JSON anidado (rutina -> ejercicios -> series) con
+subconsultas correlacionadas, sin multiplicar filas con JOINs ni hidratar instancias
+del ORM. Python recibe el documento como texto y lo devuelve tal cual.
+
+En Postgres se usa `json_build_object`/`json_agg`; en SQLite (desarrollo y pruebas
+locales) `json_object`/`json_group_array`, con la misma forma y orden de claves que
+`RutinaDTO` (modelos/dtos.py).
+"""
+import json
+
+from sqlalchemy import DateTime, Integer, bindparam, text
+
+from modelos.models import db
+
+_DOCUMENTO_RUTINA = {
+    'postgresql': """
+        json_build_object(
+            'id', r.id_rutinas,
+            'nombre', r.nombre,
+            'descripcion', r.descripcion,
+            'usuarios_id', r.usuarios_id,
+            'nivel_rutinas_id', r.nivel_rutinas_id,
+            'ejercicios', COALESCE((
+                SELECT json_agg(json_build_object(
+                    'id', e.id_ejercicios,
+                    'ejercicios_base_id', e.ejercicios_base_id,
+                    'nombre', eb.nombre,
+                    'descripcion', eb.descripcion,
+                    'video_url', eb.video_url,
+                    'series', COALESCE((
+                        SELECT json_agg(json_build_object(
+                            'id', s.id_series,
+                            'repeticiones', s.repeticiones,
+                            'peso_kg', s.peso_kg
+                        ) ORDER BY s.id_series)
+                        FROM series s
+                        WHERE s.ejercicios_id = e.id_ejercicios
+                    ), '[]'::json)
+                ) ORDER BY e.id_ejercicios)
+                FROM ejercicios e
+                JOIN ejercicios_base eb ON eb.id_ejercicios_base = e.ejercicios_base_id
+                WHERE e.rutinas_id = r.id_rutinas
+            ), '[]'::json)
+        )
+    """,
+    'sqlite': """
+        json_object(
+            'id', r.id_rutinas,
+            'nombre', r.nombre,
+            'descripcion', r.descripcion,
+            'usuarios_id', r.usuarios_id,
+            'nivel_rutinas_id', r.nivel_rutinas_id,
+            'ejercicios', json((
+                SELECT json_group_array(json(ej.doc)) FROM (
+                    SELECT json_object(
+                        'id', e.id_ejercicios,
+                        'ejercicios_base_id', e.ejercicios_base_id,
+                        'nombre', eb.nombre,
+                        'descripcion', eb.descripcion,
+                        'video_url', eb.video_url,
+                        'series', json((
+                            SELECT json_group_array(json(se.doc)) FROM (
+                                SELECT json_object(
+                                    'id', s.id_series,
+                                    'repeticiones', s.repeticiones,
+                                    'peso_kg', s.peso_kg
+                                ) AS doc
+                                FROM series s
+                                WHERE s.ejercicios_id = e.id_ejercicios
+                                ORDER BY s.id_series
+                            ) se
+                        ))
+                    ) AS doc
+                    FROM ejercicios e
+                    JOIN ejercicios_base eb ON eb.id_ejercicios_base = e.ejercicios_base_id
+                    WHERE e.rutinas_id = r.id_rutinas
+                    ORDER BY e.id_ejercicios
+                ) ej
+            ))
+        )
+    """,
+}
+
+_RUTINA_POR_ID = {
+    'postgresql': """
+        SELECT r.usuarios_id, r.version, ({documento})::text AS documento
+        FROM rutinas r
+        WHERE r.id_rutinas = :id_rutina
+    """,
+    'sqlite': """
+        SELECT r.usuarios_id, r.version, {documento} AS documento
+        FROM rutinas r
+        WHERE r.id_rutinas = :id_rutina
+    """,
+}
+
+_RUTINAS_DE_USUARIO = {
+    'postgresql': """
+        SELECT COALESCE(json_agg(t.documento ORDER BY t.nombre), '[]'::json)::text
+        FROM (
+            SELECT r.nombre, {documento} AS documento
+            FROM rutinas r
+            WHERE r.usuarios_id = :usuario_id
+        ) t
+    """,
+    'sqlite': """
+        SELECT json_group_array(json(t.documento))
+        FROM (
+            SELECT {documento} AS documento
+            FROM rutinas r
+            WHERE r.usuarios_id = :usuario_id
+            ORDER BY r.nombre
+        ) t
+    """,
+}
+
+# Un documento (texto) por rutina, para enviarlas de a una en streaming
+_DOCUMENTOS_DE_USUARIO = {
+    'postgresql': """
+        SELECT ({documento})::text AS documento
+        FROM rutinas r
+        WHERE r.usuarios_id = :usuario_id
+        ORDER BY r.nombre
+    """,
+    'sqlite': """
+        SELECT {documento} AS documento
+        FROM rutinas r
+        WHERE r.usuarios_id = :usuario_id
+        ORDER BY r.nombre
+    """,
+}
+
+# Varias rutinas por id: el documento solo se arma para las del usuario; las demás
+# vuelven con documento NULL y se informan como no autorizadas
+_RUTINAS_POR_IDS = {
+    'postgresql': """
+        SELECT r.id_rutinas, r.usuarios_id,
+               CASE WHEN r.usuarios_id = :usuario_id THEN ({documento})::text END AS documento
+        FROM rutinas r
+        WHERE r.id_rutinas IN :ids
+    """,
+    'sqlite': """
+        SELECT r.id_rutinas, r.usuarios_id,
+               CASE WHEN r.usuarios_id = :usuario_id THEN {documento} END AS documento
+        FROM rutinas r
+        WHERE r.id_rutinas IN :ids
+    """,
+}
+
+# Rutinas del usuario modificadas después de `:desde`, para la sincronización incremental
+_RUTINAS_MODIFICADAS = {
+    'postgresql': """
+        SELECT COALESCE(json_agg(t.documento ORDER BY t.id_rutinas), '[]'::json)::text
+        FROM (
+            SELECT r.id_rutinas, {documento} AS documento
+            FROM rutinas r
+            WHERE r.usuarios_id = :usuario_id AND r.actualizado_en > :desde
+        ) t
+    """,
+    'sqlite': """
+        SELECT json_group_array(json(t.documento))
+        FROM (
+            SELECT {documento} AS documento
+            FROM rutinas r
+            WHERE r.usuarios_id = :usuario_id AND r.actualizado_en > :desde
+            ORDER BY r.id_rutinas
+        ) t
+    """,
+}
+
+MAXIMO_IDS = 100
+
+_NO_ENCONTRADA = json.dumps({'error': 'Rutina no encontrada', 'estado': 404}, ensure_ascii=False)
+_NO_AUTORIZADA = json.dumps({'error': 'No autorizado para ver esta rutina.', 'estado': 403}, ensure_ascii=False)
+
+
+def _sql(plantillas, dialecto=None):
+    dialecto = dialecto or db.session.get_bind().dialect.name
+    dialecto = 'sqlite' if dialecto == 'sqlite' else 'postgresql'
+    return text(plantillas[dialecto].format(documento=_DOCUMENTO_RUTINA[dialecto]))
+
+
+def sql_rutina_por_id(dialecto):
+    """Sentencia de `documento_rutina` para un dialecto dado (usada también por la lectura async)."""
+    return _sql(_RUTINA_POR_ID, dialecto)
+
+
+def sql_rutinas_usuario(dialecto):
+    """Sentencia de `documento_rutinas_usuario` para un dialecto dado."""
+    return _sql(_RUTINAS_DE_USUARIO, dialecto)
+
+
+def sql_documentos_usuario(dialecto):
+    """Sentencia que devuelve una fila `documento` por rutina del usuario, ordenadas por nombre."""
+    return _sql(_DOCUMENTOS_DE_USUARIO, dialecto)
+
+
+def sql_rutinas_por_ids(dialecto):
+    """Sentencia de `documento_rutinas_por_ids` para un dialecto dado."""
+    return _sql(_RUTINAS_POR_IDS, dialecto).bindparams(bindparam('ids', expanding=True, type_=Integer))
+
+
+def sql_rutinas_modificadas(dialecto):
+    """Sentencia de `documento_rutinas_modificadas` para un dialecto dado."""
+    return _sql(_RUTINAS_MODIFICADAS, dialecto).bindparams(bindparam('desde', type_=DateTime))
+
+
+def leer_ids(valor):
+    """
+    Convierte el parámetro `ids` ("1,2,3") en una lista de ids sin repetidos, en el orden
+    pedido. Lanza ValueError si está vacío, tiene algo que no es un entero positivo o
+    supera MAXIMO_IDS.
+    """
+    ids = []
+    for parte in (valor or '').split(','):
+        parte = parte.strip()
+        if not parte.isdigit() or int(parte) < 1:
+            raise ValueError('El parámetro ids debe ser una lista de enteros positivos separados por coma')
+        if int(parte) not in ids:
+            ids.append(int(parte))
+    if len(ids) > MAXIMO_IDS:
+        raise ValueError(f'Se pueden pedir como máximo {MAXIMO_IDS} rutinas a la vez')
+    return ids
+
+
+def armar_documento_por_ids(ids, usuario_id, filas):
+    """
+    Objeto JSON (texto) con una entrada por id pedido, en el mismo orden: el documento de
+    la rutina o un marcador `{"error", "estado"}` (404 si no existe, 403 si es de otro usuario).
+    """
+    por_id = {fila.id_rutinas: fila for fila in filas}
+    entradas = []
+    for id_rutina in ids:
+        fila = por_id.get(id_rutina)
+        if fila is None:
+            documento = _NO_ENCONTRADA
+        elif fila.usuarios_id != usuario_id:
+            documento = _NO_AUTORIZADA
+        else:
+            documento = fila.documento
+        entradas.append(f'"{id_rutina}":{documento}')
+    return '{' + ','.join(entradas) + '}'
+
+
+def documento_rutina(id_rutina):
+    """
+    Devuelve una fila `(usuarios_id, version, documento)` con el JSON de la rutina ya
+    armado, o None si la rutina no existe.
+    """
+    return db.session.execute(_sql(_RUTINA_POR_ID), {'id_rutina': id_rutina}).first()
+
+
+def documento_rutinas_usuario(usuario_id):
+    """Devuelve el arreglo JSON (como texto) con todas las rutinas del usuario, ordenadas por nombre."""
+    return db.session.execute(_sql(_RUTINAS_DE_USUARIO), {'usuario_id': usuario_id}).scalar()
+
+
+def documento_rutinas_por_ids(ids, usuario_id):
+    """Devuelve, en una sola consulta, el objeto JSON (texto) de `armar_documento_por_ids`."""
+    dialecto = db.session.get_bind().dialect.name
+    filas = db.session.execute(sql_rutinas_por_ids(dialecto), {'ids': ids, 'usuario_id': usuario_id}).all()
+    return armar_documento_por_ids(ids, usuario_id, filas)
+
+
+def documento_rutinas_modificadas(usuario_id, desde):
+    """Arreglo JSON (texto) con las rutinas del usuario modificadas después de `desde`, por id."""
+    dialecto = db.session.get_bind().dialect.name
+    return db.session.execute(sql_rutinas_modificadas(dialecto), {'usuario_id': usuario_id, 'desde': desde}).scalar()
@@ -0,0 +1,54 @@
+"""
+Proveedor JSON de la app (`app.json`) respaldado por orjson.
+
+orjson serializa directamente dicts, listas y dataclasses (incluidos los DTOs con
+`__slots__` de modelos/dtos.py) sin pasar por `dataclasses.asdict`, y escribe bytes que
+van al cuerpo de la respuesta sin volver a codificar. Si orjson no está instalado se usa
+el proveedor estándar de Flask.
+
+Para no cambiar lo que ven los clientes, los tipos que orjson resuelve distinto que
+Flask se delegan al serializador de Flask: fechas (RFC 822, `http_date`), Decimal y
+objetos con `__html__`. La única diferencia en el cuerpo es que los caracteres no ASCII
+se envían en UTF-8 en lugar de escaparse como `\\uXXXX`.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _opciones(sort_keys):
+    # PASSTHROUGH_DATETIME delega fechas a `default`; NON_STR_KEYS acepta claves int como json
+    opciones = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        opciones |= orjson.OPT_SORT_KEYS
+    return opciones
+
+
+class ProveedorJSON(DefaultJSONProvider):
+    """`DefaultJSONProvider` que serializa y parsea con orjson cuando está disponible."""
+
+    def dumps_bytes(self, obj, **kwargs):
+        """Serializa a bytes UTF-8, listos para el cuerpo de una respuesta."""
+        if orjson is None or kwargs.get('indent') is not None:
+            return self.dumps(obj, **kwargs).encode()
+        return orjson.dumps(obj, default=self.default, option=_opciones(kwargs.get('sort_keys', self.sort_keys)))
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get('indent') is not None:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj, **kwargs).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._app.debug:
+            # En debug el proveedor estándar indenta la salida
+            return super().response(*args, **kwargs)
+        datos = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(datos) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,163 @@
+"""
+Sincronización incremental para clientes offline (GET /sync).
+
+Rutina, Entrenamiento y EjercicioUsuario llevan `actualizado_en`. Los cambios en
+Ejercicio y Serie se reflejan en la rutina dueña (el UPDATE de `incrementar_version_rutinas`
+dispara también su onupdate) y los borrados quedan en `eliminaciones`. Cada consulta
+recorre el índice (usuarios_id, actualizado_en) de su tabla: el trabajo depende de lo
+que cambió y no del tamaño de la cuenta.
+
+El cursor que se devuelve es el momento de la consulta menos SYNC_MARGEN_SEGUNDOS, leído
+del reloj de la base, el mismo que marca las filas: una transacción que marcó sus filas
+antes de ese corte pero confirmó después aparece en el sync siguiente. A cambio, lo modificado dentro del margen puede llegar dos veces, por lo
+que el cliente aplica los cambios por id (primero los eliminados, después el resto).
+
+Sin cursor, o con uno anterior a SYNC_RETENCION_DIAS (sus eliminaciones ya pueden estar
+purgadas), se devuelve todo con `completo: true` y el cliente reemplaza su copia local.
+"""
+import base64
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, select
+
+from modelos.dtos import EjercicioSesionDTO, RealizadoSesionDTO, SerieSesionDTO, SesionDTO
+from modelos.models import (db, ahora_utc, Ejercicio, EjercicioBase, EjercicioUsuario, Eliminacion, Entrenamiento,
+                            EntrenamientoRealizado, SerieRealizada)
+from servicios.rutinas_json import documento_rutinas_modificadas
+
+# `desde` de una sincronización completa: anterior a cualquier `actualizado_en`
+_EPOCA = datetime(1970, 1, 1)
+
+
+def codificar_cursor_sync(momento):
+    return base64.urlsafe_b64encode(momento.isoformat().encode()).decode().rstrip('=')
+
+
+def decodificar_cursor_sync(cursor):
+    """Devuelve el `datetime` (UTC sin zona) de un cursor de sincronización. Lanza ValueError si es inválido."""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        momento = datetime.fromisoformat(base64.urlsafe_b64decode(cursor + relleno).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Cursor inválido') from None
+    # Las columnas guardan UTC sin zona: un cursor con offset se lleva a esa forma
+    if momento.tzinfo is not None:
+        momento = momento.astimezone(timezone.utc).replace(tzinfo=None)
+    return momento
+
+
+def _entrenamientos_modificados(usuario_id, desde):
+    """
+    Sesiones modificadas con sus ejercicios y series realizadas. Cada nivel se lee con
+    un join filtrado por (usuarios_id, actualizado_en) en lugar de listas IN, así la
+    cantidad de consultas no crece con la cantidad de sesiones.
+    """
+    modificados = and_(Entrenamiento.usuarios_id == usuario_id, Entrenamiento.actualizado_en > desde)
+    entrenamientos = db.session.execute(
+        select(Entrenamiento.id_entrenamientos, Entrenamiento.fecha)
+        .where(modificados).order_by(Entrenamiento.id_entrenamientos)
+    ).all()
+    if not entrenamientos:
+        return []
+
+    realizados = db.session.execute(
+        select(EntrenamientoRealizado.id_entrenamientos_realizados, EntrenamientoRealizado.entrenamientos_id,
+               Ejercicio.id_ejercicios, EjercicioBase.nombre)
+        .join(Entrenamiento, EntrenamientoRealizado.entrenamientos_id == Entrenamiento.id_entrenamientos)
+        .join(Ejercicio, EntrenamientoRealizado.ejercicios_id == Ejercicio.id_ejercicios)
+        .join(EjercicioBase, Ejercicio.ejercicios_base_id == EjercicioBase.id_ejercicios_base)
+        .where(modificados).order_by(EntrenamientoRealizado.id_entrenamientos_realizados)
+    ).all()
+    series = db.session.execute(
+        select(SerieRealizada.id_series_realizadas, SerieRealizada.entrenamientos_realizados_id,
+               SerieRealizada.repeticiones, SerieRealizada.peso_kg)
+        .join(EntrenamientoRealizado,
+              SerieRealizada.entrenamientos_realizados_id == EntrenamientoRealizado.id_entrenamientos_realizados)
+        .join(Entrenamiento, EntrenamientoRealizado.entrenamientos_id == Entrenamiento.id_entrenamientos)
+        .where(modificados).order_by(SerieRealizada.id_series_realizadas)
+    )
+
+    series_por_realizado = defaultdict(list)
+    for s in series:
+        series_por_realizado[s.entrenamientos_realizados_id].append(
+            SerieSesionDTO(s.id_series_realizadas, s.repeticiones, s.peso_kg)
+        )
+    realizados_por_entrenamiento = defaultdict(list)
+    for r in realizados:
+        realizados_por_entrenamiento[r.entrenamientos_id].append(RealizadoSesionDTO(
+            r.id_entrenamientos_realizados, EjercicioSesionDTO(r.id_ejercicios, r.nombre),
+            series_por_realizado[r.id_entrenamientos_realizados]
+        ))
+    return [SesionDTO(e.id_entrenamientos, e.fecha.isoformat(), realizados_por_entrenamiento[e.id_entrenamientos])
+            for e in entrenamientos]
+
+
+def _ejercicios_usuario_modificados(usuario_id, desde):
+    filas = db.session.execute(
+        select(EjercicioUsuario.id_ejercicios_usuario, EjercicioUsuario.nombre, EjercicioUsuario.descripcion,
+               EjercicioUsuario.video_url)
+        .where(EjercicioUsuario.usuarios_id == usuario_id, EjercicioUsuario.actualizado_en > desde)
+        .order_by(EjercicioUsuario.id_ejercicios_usuario)
+    )
+    # Misma forma que los ejercicios propios de GET /ejercicios-base
+    return [{'id': f.id_ejercicios_usuario, 'nombre': f.nombre, 'descripcion': f.descripcion,
+             'video_url': f.video_url} for f in filas]
+
+
+def _eliminados(usuario_id, desde):
+    eliminados = {'rutinas': [], 'entrenamientos': [], 'ejercicios_usuario': []}
+    filas = db.session.execute(
+        select(Eliminacion.tabla, Eliminacion.id_registro)
+        .where(Eliminacion.usuarios_id == usuario_id, Eliminacion.eliminado_en > desde)
+        .order_by(Eliminacion.id)
+    )
+    for fila in filas:
+        eliminados[fila.tabla].append(fila.id_registro)
+    return eliminados
+
+
+def cambios_desde(usuario_id, desde=None):
+    """
+    Devuelve el documento JSON (texto) de GET /sync con lo modificado y eliminado después
+    de `desde` (None para una sincronización completa) y el cursor siguiente.
+    """
+    config = current_app.config
+    ahora = db.session.scalar(select(ahora_utc()))
+    corte = ahora - timedelta(seconds=config.get('SYNC_MARGEN_SEGUNDOS', 60))
+    completo = desde is None or desde < ahora - timedelta(days=config.get('SYNC_RETENCION_DIAS', 90))
+    if completo:
+        desde = _EPOCA
+
+    resto = current_app.json.dumps({
+        'entrenamientos': _entrenamientos_modificados(usuario_id, desde),
+        'ejercicios_usuario': _ejercicios_usuario_modificados(usuario_id, desde),
+        # En una sincronización completa el cliente descarta todo lo que no vuelva
+        'eliminados': {'rutinas': [], 'entrenamientos': [], 'ejercicios_usuario': []} if completo
+        else _eliminados(usuario_id, desde),
+        'completo': completo,
+        'cursor': codificar_cursor_sync(corte),
+    })
+    # Las rutinas llegan armadas desde la base (servicios/rutinas_json.py) y se insertan tal cual
+    return '{"rutinas":' + documento_rutinas_modificadas(usuario_id, desde) + ',' + resto[1:]
+
+
+def purgar_eliminaciones(antes_de):
+    """Borra las eliminaciones registradas antes de `antes_de`; devuelve cuántas."""
+    return db.session.execute(delete(Eliminacion).where(Eliminacion.eliminado_en < antes_de)).rowcount
+
+
+sincronizacion_cli = AppGroup('sync', help='Mantenimiento de la sincronización incremental.')
+
+
+@sincronizacion_cli.command('purgar')
+@click.option('--dias', type=int, default=None, help='Antigüedad mínima (por defecto SYNC_RETENCION_DIAS).')
+def purgar_command(dias):
+    """Borra las eliminaciones más viejas que la retención de la sincronización."""
+    dias = dias if dias is not None else current_app.config.get('SYNC_RETENCION_DIAS', 90)
+    filas = purgar_eliminaciones(datetime.utcnow() - timedelta(days=dias))
+    db.session.commit()
+    click.echo(f'Eliminaciones purgadas: {filas}.')
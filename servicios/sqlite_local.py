@@ -0,0 +1,37 @@
+"""
+Conexiones a un archivo SQLite local, compartido por los workers de un mismo host.
+
+Es la base de los almacenes 'sqlite' (tokens revocados, respuestas idempotentes, últimas
+escrituras). Cada hilo de cada proceso abre su propia conexión en el primer uso, en modo
+WAL y creando la tabla si no existe. Al importar no se abre nada, y un proceso creado
+con fork (gunicorn --preload) abre las suyas en lugar de usar las heredadas del padre.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+
+
+def ruta_sqlite(variable, archivo):
+    """Ruta indicada en la variable de entorno `variable` o, si no está, `archivo` en el directorio temporal."""
+    return os.getenv(variable, os.path.join(tempfile.gettempdir(), archivo))
+
+
+class ConexionSQLiteLocal:
+    """Devuelve (al llamarla) la conexión del hilo y proceso actuales al archivo `ruta`."""
+
+    def __init__(self, ruta, ddl):
+        self.ruta = ruta
+        self.ddl = ddl
+        self._local = threading.local()
+
+    def __call__(self):
+        # Tras un fork, el hilo que lo hizo conserva su threading.local: se compara el pid
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conexion = sqlite3.connect(self.ruta, timeout=5)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            with conexion:
+                conexion.execute(self.ddl)
+            self._local.conexion = conexion
+            self._local.pid = os.getpid()
+        return self._local.conexion
@@ -0,0 +1,26 @@
+from flask import Response, current_app, request, stream_with_context
+
+MIMETYPE_NDJSON = 'application/x-ndjson'
+
+# Filas leídas por lote desde el cursor del servidor al hacer streaming
+TAMANIO_LOTE = 100
+
+
+def quiere_ndjson():
+    """Indica si el cliente pidió explícitamente `Accept: application/x-ndjson`."""
+    return request.accept_mimetypes.best_match(['application/json', MIMETYPE_NDJSON]) == MIMETYPE_NDJSON
+
+
+def respuesta_ndjson(elementos):
+    """
+    Devuelve una respuesta en streaming con un documento JSON por línea.
+
+    `elementos` debe ser un iterable perezoso (por ejemplo, un generador que recorre
+    una consulta con `yield_per`) para que cada elemento se serialice y se envíe a
+    medida que se materializa, sin acumular la lista completa en memoria.
+    """
+    def generar():
+        for elemento in elementos:
+            yield current_app.json.dumps_bytes(elemento) + b'\n'
+
+    return Response(stream_with_context(generar()), mimetype=MIMETYPE_NDJSON)